@@ -2,7 +2,13 @@
 🔔 Broadcast System (Final Version)
 """
 
+import asyncio
 import logging
+import os
+import socket
+import time
+from typing import Any, Dict, Optional
+
 from telegram import Update
 from telegram.ext import (
     CommandHandler,
@@ -12,6 +18,9 @@ from telegram.ext import (
     ContextTypes,
 )
 
+from config import CONFIG
+from storage.user_storage_v2 import REACHABLE_STATES
+
 logger = logging.getLogger(__name__)
 BROADCAST_MESSAGE = range(1)
 
@@ -20,6 +29,12 @@ class BroadcastSystem:
     def __init__(self, bot):
         self.bot = bot
         self.user_storage = bot.user_storage
+        self.job_storage = getattr(bot, "broadcast_storage", None)
+        self.page_size = CONFIG.get("BROADCAST_PAGE_SIZE", 200)
+        self.progress_seconds = CONFIG.get("BROADCAST_PROGRESS_SECONDS", 10)
+        self.lease_seconds = CONFIG.get("BROADCAST_LEASE_SECONDS", 120)
+        self.worker_id = CONFIG.get("POLL_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self._wakeup: Optional[asyncio.Event] = None
 
     def get_conversation_handler(self):
         return ConversationHandler(
@@ -43,20 +58,119 @@ class BroadcastSystem:
         return BROADCAST_MESSAGE
 
     async def send_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        all_users = self.user_storage.get_all_users()
-        sent_count = 0
-        for user in all_users:
-            try:
-                await self.bot.app.bot.send_message(
-                    chat_id=user["telegram_id"], text=update.message.text
+        status = await update.message.reply_text("🚀 جاري إرسال الرسالة لجميع المستخدمين...")
+        await self.enqueue(update.message.text, admin_chat_id=status.chat_id, status_message_id=status.message_id)
+        return ConversationHandler.END
+
+    async def enqueue(
+        self,
+        message: str,
+        kind: str = "broadcast",
+        parse_mode: Optional[str] = None,
+        admin_chat_id: Optional[int] = None,
+        status_message_id: Optional[int] = None,
+        dedup_key: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Queue a message for every active user; run_jobs() sends it in the
+        background and edits the admin's status message with the progress.
+        A dedup_key already queued makes this a no-op returning None.
+        """
+        if self.job_storage is None:
+            # No job table: send inline
+            outcomes = await self.bot.send_dispatcher.send_many(
+                (u.get("telegram_id") for u in self.bot._get_users(REACHABLE_STATES)), message, parse_mode=parse_mode
+            )
+            if admin_chat_id and status_message_id:
+                await self.bot.send_dispatcher.edit(
+                    admin_chat_id, status_message_id, self._progress_text(self._outcome_counts(outcomes), done=True)
                 )
-                sent_count += 1
-            except Exception as e:
-                logger.error(f"Broadcast failed for {user['telegram_id']}: {e}")
-        await update.message.reply_text(
-            f"✅ تم الإرسال إلى {sent_count}/{len(all_users)} مستخدم."
+            return None
+        total = self.user_storage.count_users(REACHABLE_STATES)
+        job_id = self.job_storage.create_job(message, total, kind, parse_mode, admin_chat_id, status_message_id, dedup_key)
+        if job_id is not None and self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    @staticmethod
+    def _outcome_counts(outcomes) -> Dict[str, int]:
+        return {
+            "sent": outcomes.get("sent", 0),
+            "failed": outcomes.get("failed", 0) + outcomes.get("invalid", 0),
+            "blocked": outcomes.get("blocked", 0),
+        }
+
+    @staticmethod
+    def _progress_text(job: Dict[str, Any], done: bool = False) -> str:
+        reached = job["sent"] + job["failed"] + job["blocked"]
+        total = job.get("total") or reached
+        header = "✅ اكتمل البث" if done else "📢 جاري البث"
+        return (
+            f"{header}: {reached}/{total}\n"
+            f"✅ تم الإرسال: {job['sent']}\n"
+            f"❌ فشل: {job['failed']}\n"
+            f"🚫 حظروا البوت: {job['blocked']}"
         )
-        return ConversationHandler.END
+
+    async def run_jobs(self, is_running):
+        """
+        Send queued broadcasts one page at a time. Each job is claimed first, so
+        with several replicas only one sends it; interrupted jobs resume from
+        their cursor once their lease runs out.
+        """
+        self._wakeup = asyncio.Event()
+        while is_running():
+            try:
+                while is_running():
+                    job = self.job_storage.claim_job(self.worker_id, self.lease_seconds)
+                    if job is None or not await self._run_job(job, is_running):
+                        break
+            except Exception as e:
+                logger.error(f"❌ Error in broadcast runner: {e}", exc_info=True)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_job(self, job: Dict[str, Any], is_running) -> bool:
+        """True once the job reached every user"""
+        dispatcher = self.bot.send_dispatcher
+        if job["cursor"]:
+            logger.info(f"🔁 Resuming broadcast job {job['id']} after user row {job['cursor']}")
+        last_edit = 0.0
+        while True:
+            if not is_running():
+                return False
+            # Users who blocked the bot are parked and skipped
+            page = self.user_storage.get_users_after(job["cursor"], self.page_size, REACHABLE_STATES)
+            if page is None:
+                # Database unavailable: the job stays active for the next round
+                return False
+            if not page:
+                break
+            outcomes = await dispatcher.send_many(
+                (user.get("telegram_id") for user in page), job["message"], parse_mode=job["parse_mode"]
+            )
+            counts = self._outcome_counts(outcomes)
+            # Cursor and counts move together, so a restart resends at most this page;
+            # saving them also renews the lease
+            if not self.job_storage.record_progress(
+                job["id"], page[-1]["id"], worker_id=self.worker_id, lease_seconds=self.lease_seconds, **counts
+            ):
+                logger.warning(f"⚠️ Lost broadcast job {job['id']} (lease expired or database unavailable), stopping")
+                return False
+            job["cursor"] = page[-1]["id"]
+            for field, count in counts.items():
+                job[field] += count
+            if job["status_message_id"] and time.monotonic() - last_edit >= self.progress_seconds:
+                last_edit = time.monotonic()
+                await dispatcher.edit(job["admin_chat_id"], job["status_message_id"], self._progress_text(job))
+        self.job_storage.finish_job(job["id"])
+        logger.info(f"Broadcast job {job['id']} done: sent={job['sent']}, failed={job['failed']}, blocked={job['blocked']}")
+        if job["status_message_id"]:
+            await dispatcher.edit(job["admin_chat_id"], job["status_message_id"], self._progress_text(job, done=True))
+        return True
 
     async def cancel_broadcast(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -2,6 +2,7 @@
 🎛️ Harmonic Admin Dashboard System (Enhanced)
 """
 
+import asyncio
 import logging
 from telegram import (
     Update,
@@ -10,12 +11,12 @@ from telegram import (
 )
 from telegram.ext import ContextTypes
 from config import CONFIG
+from storage.user_storage_v2 import REACHABLE_STATES
 from utils.keyboards import (
     get_enhanced_admin_dashboard_keyboard,
     get_user_management_keyboard,
     get_broadcast_confirmation_keyboard,
 )
-import aiohttp
 
 logger = logging.getLogger(__name__)
 
@@ -202,8 +203,12 @@ class AdminDashboard:
                     text="🔄 جاري فحص الدرجات لجميع المستخدمين..."
                 )
                 count = await self.bot._notify_all_users_grades()
+                stats = self.bot.poll_cycle_stats
                 await query.edit_message_text(
-                    text=f"✅ تم فحص الدرجات وإشعار {count} مستخدم (إذا كان هناك تغيير).",
+                    text=(
+                        f"✅ تم فحص الدرجات وإشعار {count} مستخدم (إذا كان هناك تغيير).\n"
+                        f"🧮 صفحات بدون تغيير: {stats['unchanged']}/{stats['pages']}"
+                    ),
                     reply_markup=get_enhanced_admin_dashboard_keyboard(),
                 )
             elif action.startswith("force_grade_refresh_only:"):
@@ -333,9 +338,84 @@ class AdminDashboard:
             if total_users > 0
             else "0%\n"
         )
+        text += self._get_university_api_text()
+        text += self._get_poll_schedule_text(total_users)
         text += "\nللمزيد من التفاصيل استخدم الأزرار الأخرى."
         return text
 
+    def _get_university_api_text(self) -> str:
+        health = self.bot.university_api.get_health_stats()
+        limiter, breaker = health["limiter"], health["breaker"]
+        breaker_labels = {"closed": "🟢 يعمل", "half_open": "🟡 قيد الاختبار", "open": "🔴 متوقف مؤقتاً"}
+        text = "\n\n🌐 اتصال الجامعة:\n"
+        text += f"- الحالة: {breaker_labels.get(breaker['state'], breaker['state'])}"
+        if breaker["state"] == "open":
+            text += f" (إعادة المحاولة بعد {breaker['retry_in_seconds']:.0f} ث)"
+        text += f"\n- حد الطلبات المتزامنة: {limiter['limit']} (قيد التنفيذ {limiter['in_flight']}، بالانتظار {limiter['waiting']})\n"
+        text += f"- زمن الاستجابة p95: {limiter['p95_ms']:.0f} ms\n"
+        text += f"- زيادات/تخفيضات الحد: {limiter['increases']}/{limiter['decreases']}\n"
+        text += f"- مرات إيقاف الاتصال: {breaker['times_opened']}\n"
+        tokens = health["tokens"]
+        text += f"- فحوصات الجلسة: {tokens['probes']} (تم تجاوز {tokens['probes_skipped']})\n"
+        text += f"- طلبات مكررة تم دمجها: {health['single_flight']['saved']}\n"
+        return text
+
+    def _get_poll_schedule_text(self, total_users: int) -> str:
+        scheduler = self.bot.poll_scheduler
+        api = self.bot.university_api
+        stats = scheduler.get_stats()
+        # Measured SIS requests per user check (1 when the combined poll hits the term cache)
+        requests = sum(op["requests"] for op in api.get_transfer_stats().values())
+        requests_per_poll = requests / stats["checks"] if stats["checks"] else 1.0
+        plan = scheduler.capacity(total_users, requests_per_poll, latency=api.limiter.p95() or None)
+        text = "\n🗓️ جدولة فحص الدرجات:\n"
+        text += f"- الفاصل الحالي: {plan['interval_seconds'] / 60:.1f} دقيقة، الحد الأقصى {plan['max_rate']:g} فحص/ث\n"
+        text += f"- أقل فاصل ممكن لـ {total_users} مستخدم: {plan['min_interval_seconds'] / 60:.1f} دقيقة\n"
+        text += f"- نسبة الاستخدام: {plan['utilization'] * 100:.0f}%"
+        text += " ✅\n" if plan["fits"] else " ⚠️ الفاصل أقصر من الممكن\n"
+        text += f"- طلبات لكل فحص: {requests_per_poll:.2f}\n"
+        if stats["cycles"]:
+            text += (
+                f"- آخر دورة: {stats['last_users']} مستخدم خلال {stats['last_duration_seconds'] / 60:.1f} دقيقة، "
+                f"أقصى تأخير {stats['last_max_lag_seconds']:.1f} ث، تجاوزات {stats['overruns']}\n"
+            )
+        if self.bot.shard_coordinator is not None:
+            shards = self.bot.shard_coordinator.get_stats()
+            text += (
+                f"- التقسيم: {len(shards['owned'])}/{shards['shard_count']} أجزاء لهذه النسخة "
+                f"({shards['live_workers']} نسخ نشطة، إعادة توزيع {shards['rebalances']})\n"
+            )
+        if hasattr(self.user_storage, "count_users_by_state"):
+            states = self.user_storage.count_users_by_state()
+            text += (
+                f"- مستخدمون متوقفون: ⏰ جلسة منتهية {states.get('token_expired', 0)} | "
+                f"🚫 حظروا البوت {states.get('blocked', 0)} | ❓ محادثة غير موجودة {states.get('chat_not_found', 0)}\n"
+            )
+        pipeline = self.bot.poll_pipeline.get_stats()
+        if pipeline["runs"]:
+            depths = " | ".join(f"{name} {stage['max_depth']}" for name, stage in pipeline["stages"].items())
+            text += f"- أقصى طابور لكل مرحلة (آخر فحص شامل): {depths}\n"
+        if getattr(self.bot, "outbox_worker", None) is not None:
+            outbox = self.bot.outbox_worker.get_stats()["outbox"]
+            text += (
+                f"- صندوق الإشعارات: ⏳ بانتظار الإرسال {outbox.get('pending', 0) + outbox.get('sending', 0)} | ✅ أُرسل {outbox.get('sent', 0)} | "
+                f"🚫 تعذر التوصيل {outbox.get('undeliverable', 0)} | ❌ فشل {outbox.get('failed', 0)}\n"
+            )
+        if stats["bumped"]:
+            text += f"- فحوصات عاجلة بعد نشر مادة: {stats['bumped']} (متوسط الانتظار {stats['avg_bump_wait_seconds']:.1f} ث)\n"
+        # Users without a state yet are checked every cycle, like hot ones
+        states = self.bot._get_poll_states()
+        tiers = {"hot": max(0, total_users - len(states)), "idle": 0, "settled": 0, "dormant": 0}
+        for state in states.values():
+            tiers[state["tier"]] = tiers.get(state["tier"], 0) + 1
+        policy = self.bot.poll_policy
+        per_day = policy.checks_per_day(tiers)
+        baseline = policy.checks_per_day({"hot": total_users})
+        text += f"- تكرار الفحص: 🔥 {tiers['hot']} | 💤 {tiers['idle']} | ✅ {tiers['settled']} | 🌙 {tiers['dormant']}\n"
+        if baseline:
+            text += f"- فحوصات متوقعة يومياً: {per_day:.0f} بدلاً من {baseline:.0f} ({(1 - per_day / baseline) * 100:.0f}% أقل)\n"
+        return text
+
     # Add a user-friendly security info function for users (to be called from bot)
     @staticmethod
     def get_user_security_info() -> str:
@@ -432,17 +512,13 @@ class AdminDashboard:
             return True
         if context.user_data.get("awaiting_broadcast"):
             message = update.message.text
-            await update.message.reply_text("🚀 جاري إرسال الرسالة لجميع المستخدمين...")
-            sent, failed = await self.broadcast_to_all_users(message)
-            
-            # Create detailed feedback message
-            if failed == 0:
-                feedback = f"✅ تم إرسال الرسالة إلى {sent} مستخدم بنجاح."
-            else:
-                feedback = f"✅ تم إرسال الرسالة إلى {sent} مستخدم.\n❌ فشل الإرسال إلى {failed} مستخدم.\n\n💡 الأسباب المحتملة:\n• المستخدمون حظروا البوت\n• معرفات تليجرام غير صحيحة\n• مشاكل في الاتصال"
-            
+            # Sent in the background; this message is edited with the progress
+            status = await update.message.reply_text("🚀 جاري إرسال الرسالة لجميع المستخدمين...")
+            await self.bot.broadcast_system.enqueue(
+                message, admin_chat_id=status.chat_id, status_message_id=status.message_id
+            )
             await update.message.reply_text(
-                feedback,
+                "📋 يتم تحديث حالة البث في الرسالة السابقة، ويمكنك متابعة استخدام لوحة التحكم.",
                 reply_markup=get_enhanced_admin_dashboard_keyboard(),
             )
             context.user_data["awaiting_broadcast"] = False
@@ -450,70 +526,22 @@ class AdminDashboard:
         return False
 
     async def broadcast_to_all_users(self, message):
-        users = self.bot.user_storage.get_all_users()
-        sent = 0
-        failed = 0
-        blocked_users = 0
-        invalid_users = 0
-        other_errors = 0
-        
-        for user in users:
-            try:
-                await self.bot.app.bot.send_message(
-                    chat_id=user["telegram_id"], text=message
-                )
-                sent += 1
-            except Exception as e:
-                failed += 1
-                error_msg = str(e).lower()
-                if "blocked" in error_msg or "forbidden" in error_msg:
-                    blocked_users += 1
-                    logger.warning(f"User {user['telegram_id']} ({user.get('username', 'Unknown')}) blocked the bot")
-                elif "chat not found" in error_msg or "user not found" in error_msg:
-                    invalid_users += 1
-                    logger.warning(f"Invalid user ID {user['telegram_id']} ({user.get('username', 'Unknown')})")
-                else:
-                    other_errors += 1
-                    logger.error(f"Broadcast failed for {user['telegram_id']} ({user.get('username', 'Unknown')}): {e}")
-        
-        # Log detailed summary
-        logger.info(f"Broadcast summary: sent={sent}, failed={failed}, total={len(users)}")
-        if failed > 0:
-            logger.info(f"Failure breakdown: blocked={blocked_users}, invalid={invalid_users}, other={other_errors}")
-        
-        return sent, failed
+        return await self._send_to_all_users(message, "Broadcast")
 
     async def send_quote_to_all_users(self, message):
-        users = self.bot.user_storage.get_all_users()
-        sent = 0
-        failed = 0
-        blocked_users = 0
-        invalid_users = 0
-        other_errors = 0
-        
-        for user in users:
-            try:
-                await self.bot.app.bot.send_message(
-                    chat_id=user["telegram_id"], text=message
-                )
-                sent += 1
-            except Exception as e:
-                failed += 1
-                error_msg = str(e).lower()
-                if "blocked" in error_msg or "forbidden" in error_msg:
-                    blocked_users += 1
-                    logger.warning(f"User {user['telegram_id']} ({user.get('username', 'Unknown')}) blocked the bot")
-                elif "chat not found" in error_msg or "user not found" in error_msg:
-                    invalid_users += 1
-                    logger.warning(f"Invalid user ID {user['telegram_id']} ({user.get('username', 'Unknown')})")
-                else:
-                    other_errors += 1
-                    logger.error(f"Quote broadcast failed for {user['telegram_id']} ({user.get('username', 'Unknown')}): {e}")
+        return await self._send_to_all_users(message, "Quote broadcast")
+
+    async def _send_to_all_users(self, message, label):
+        """Through the shared send dispatcher; returns (sent, failed)"""
+        users = self.bot._get_users(REACHABLE_STATES)
+        outcomes = await self.bot.send_dispatcher.send_many((u.get("telegram_id") for u in users), message)
+        sent = outcomes["sent"]
+        failed = outcomes["blocked"] + outcomes["invalid"] + outcomes["failed"]
         
         # Log detailed summary
-        logger.info(f"Quote broadcast summary: sent={sent}, failed={failed}, total={len(users)}")
+        logger.info(f"{label} summary: sent={sent}, failed={failed}, total={len(users)}")
         if failed > 0:
-            logger.info(f"Failure breakdown: blocked={blocked_users}, invalid={invalid_users}, other={other_errors}")
+            logger.info(f"Failure breakdown: blocked={outcomes['blocked']}, invalid={outcomes['invalid']}, other={outcomes['failed']}")
         
         return sent, failed
 
@@ -612,27 +640,18 @@ class AdminDashboard:
             api = self.bot.university_api
             known_term_ids = ["10459"]
             raw_htmls = []
-            for term_id in known_term_ids:
-                headers = {**api.api_headers, "Authorization": f"Bearer {token}"}
-                payload = {
-                    "operationName": "getPage",
-                    "variables": {
-                        "name": "test_student_tracks",
-                        "params": [{"name": "t_grade_id", "value": term_id}],
-                    },
-                    "query": api.UNIVERSITY_QUERIES["GET_GRADES"] if hasattr(api, "UNIVERSITY_QUERIES") else api.api_queries["GET_GRADES"],
-                }
-                async with aiohttp.ClientSession(timeout=api.timeout) as session:
-                    async with session.post(api.api_url, headers=headers, json=payload) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            page = data.get("data", {}).get("getPage")
-                            if page and "panels" in page:
-                                for panel in page.get("panels", []):
-                                    for block in panel.get("blocks", []):
-                                        html_content = block.get("body", "")
-                                        if html_content:
-                                            raw_htmls.append(html_content)
+            # Prefer the last recorded page: no extra SIS call (read from disk off the event loop)
+            recorded = (
+                await asyncio.to_thread(api.cassette.latest, int(telegram_id)) if getattr(api, "cassette", None) else None
+            )
+            pages = [recorded] if recorded else [await api.fetch_term_page(token, term_id) for term_id in known_term_ids]
+            for page in pages:
+                if page and "panels" in page:
+                    for panel in page.get("panels", []):
+                        for block in panel.get("blocks", []):
+                            html_content = block.get("body", "")
+                            if html_content:
+                                raw_htmls.append(html_content)
             if raw_htmls:
                 for i, html in enumerate(raw_htmls):
                     html_preview = html[:1500] + ("..." if len(html) > 1500 else "")
@@ -2,6 +2,8 @@
 🎓 Telegram Bot Core - Main Bot Implementation
 """
 import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
@@ -15,40 +17,82 @@ import os
 
 from config import CONFIG
 from storage.models import DatabaseManager
-from storage.user_storage_v2 import UserStorageV2
+from storage.user_storage_v2 import POLLABLE_STATES, REACHABLE_STATES, UserStorageV2
 from storage.grade_storage_v2 import GradeStorageV2
+from storage.broadcast_storage import BroadcastStorage
+from storage.translation_storage import TranslationStorage
 from admin.dashboard import AdminDashboard
 from admin.broadcast import BroadcastSystem
 from utils.keyboards import (
     get_main_keyboard, get_admin_keyboard, get_cancel_keyboard, 
     get_unregistered_keyboard,
-    remove_keyboard, get_error_recovery_keyboard, get_settings_main_keyboard
+    remove_keyboard, get_error_recovery_keyboard, get_settings_main_keyboard, get_digest_settings_keyboard,
+    DIGEST_CHOICES
 )
 from utils.messages import get_welcome_message, get_help_message, get_simple_welcome_message, get_security_welcome_message, get_credentials_security_info_message
 from security.enhancements import security_manager, is_valid_length
 from security.headers import security_headers, security_policy
 from utils.analytics import GradeAnalytics
+from bot.outbox_worker import OutboxWorker, notification_key
+from bot.poll_pipeline import Pipeline, PollJob, Stage
+from bot.poll_policy import PollPolicy
+from bot.poll_scheduler import PollScheduler
+from bot.poll_shards import ShardCoordinator
+from bot.send_dispatcher import BLOCKED, SendDispatcher
 from university.api_client_v2 import UniversityAPIV2
+from university.grade_diff import GradeChange, change_entries, diff_grades, format_changes_message, grades_fingerprint
+from university.grade_record import Grade
 from utils.logger import get_bot_logger
+from utils.translation import translation_service
 
 # Get bot logger
 logger = get_bot_logger()
 ASK_USERNAME, ASK_PASSWORD = range(2)
+TOKEN_EXPIRED_MESSAGE = "⏰ انتهت صلاحية الجلسة\n\nيرجى تسجيل الدخول مرة أخرى من خلال زر '🚀 تسجيل الدخول للجامعة' ثم إدخال بياناتك من جديد. هذا طبيعي ويحدث كل فترة."
 
 class TelegramBot:
     """Main Telegram Bot Class"""
     
     def __init__(self):
         self.app, self.db_manager, self.user_storage, self.grade_storage = None, None, None, None
-        self.university_api = UniversityAPIV2()
+        self.broadcast_storage = None
         # Initialize storage before other components
         self._initialize_storage() 
+        self.university_api = UniversityAPIV2(self.grade_storage)
+        # Every fan-out (grade notices, broadcasts, quotes) shares Telegram's rate limits
+        self.send_dispatcher = SendDispatcher(lambda: self.app.bot, on_unreachable=self._park_unreachable)
+        # Polling only queues notifications; this worker delivers them
+        self.outbox_worker = OutboxWorker(
+            self.grade_storage, self.send_dispatcher, reply_markups={"token_expired": get_unregistered_keyboard()}
+        )
+        self.outbox_task = None
         # Initialize components that depend on storage
         self.grade_analytics = GradeAnalytics(self.user_storage)
         self.admin_dashboard = AdminDashboard(self)
         self.broadcast_system = BroadcastSystem(self)
         self.grade_check_task = None
         self.running = False
+        self.poll_cycle_stats = {"pages": 0, "unchanged": 0, "paused": 0}
+        self.poll_scheduler = PollScheduler(max_in_flight=self.university_api.limiter.maximum)
+        self.poll_policy = PollPolicy()
+        self._propagated_courses: Dict[str, float] = {}
+        self.poll_states = None
+        self.shard_coordinator = (
+            ShardCoordinator(self.grade_storage, on_acquire=self._drop_poll_states)
+            if CONFIG.get("POLL_SHARD_COUNT", 0) > 0 else None
+        )
+        self.shard_task = None
+        self.poll_pipeline = Pipeline(
+            [
+                Stage("fetch", self._poll_stage_fetch, CONFIG.get("POLL_FETCH_WORKERS", self.university_api.limiter.maximum)),
+                Stage("parse", self._poll_stage_parse, CONFIG.get("POLL_PARSE_WORKERS", 4)),
+                # Diff reads stored grades and formats text: worker threads keep that off the loop
+                Stage("diff", self._poll_stage_diff, CONFIG.get("POLL_DIFF_WORKERS", 2), threaded=True),
+                # Persist also wakes the outbox and the scheduler, so it stays on the loop
+                Stage("persist", self._poll_stage_persist),
+            ],
+            queue_size=CONFIG.get("POLL_QUEUE_SIZE", 100),
+        )
 
     def _initialize_storage(self):
         pg_initialized = False
@@ -57,6 +101,9 @@ class TelegramBot:
             logger.info("🗄️ Initializing new clean storage systems...")
             self.user_storage = UserStorageV2(CONFIG["DATABASE_URL"])
             self.grade_storage = GradeStorageV2(CONFIG["DATABASE_URL"])
+            self.broadcast_storage = BroadcastStorage(CONFIG["DATABASE_URL"])
+            # Translations survive restarts; the newest are loaded into memory for rendering
+            translation_service.cache.attach_storage(TranslationStorage(CONFIG["DATABASE_URL"]))
             logger.info("✅ New storage systems initialized successfully.")
         except Exception as e:
             logger.critical(f"❌ FATAL: Storage initialization failed. Bot cannot run: {e}", exc_info=True)
@@ -67,8 +114,19 @@ class TelegramBot:
         self.app = Application.builder().token(CONFIG["TELEGRAM_TOKEN"]).build()
         await self._update_bot_info()
         self._add_handlers()
+        await self.university_api.start()
+        if self.shard_coordinator is not None:
+            self.shard_coordinator.heartbeat()
+            self.shard_task = asyncio.create_task(self.shard_coordinator.run(lambda: self.running))
+        # Also delivers notifications left queued by the last restart
+        self.outbox_task = asyncio.create_task(self.outbox_worker.run(lambda: self.running))
         self.grade_check_task = asyncio.create_task(self._grade_checking_loop())
         self.daily_quote_task = asyncio.create_task(self.scheduled_daily_quote_broadcast())
+        # Grade messages read quotes from memory; only this task calls the quote APIs
+        self.quote_pool_task = asyncio.create_task(self.grade_analytics.quote_pool.run(lambda: self.running))
+        if self.broadcast_storage is not None:
+            # Also picks up broadcasts interrupted by the last restart
+            self.broadcast_task = asyncio.create_task(self.broadcast_system.run_jobs(lambda: self.running))
         await self.app.initialize()
         await self.app.start()
         port = int(os.environ.get("PORT", 8443))
@@ -124,8 +182,19 @@ class TelegramBot:
         self.running = False
         if self.grade_check_task:
             self.grade_check_task.cancel()
+        if self.shard_task:
+            self.shard_task.cancel()
+            self.shard_coordinator.release()
         if hasattr(self, 'daily_quote_task') and self.daily_quote_task:
             self.daily_quote_task.cancel()
+        if getattr(self, 'broadcast_task', None):
+            self.broadcast_task.cancel()
+        if getattr(self, 'outbox_task', None):
+            self.outbox_task.cancel()
+        if getattr(self, 'quote_pool_task', None):
+            self.quote_pool_task.cancel()
+        translation_service.worker.shutdown()
+        await self.university_api.close()
         if self.app: await self.app.shutdown()
         logger.info("🛑 Bot stopped.")
 
@@ -157,6 +226,7 @@ class TelegramBot:
         # Admin panel command
         self.app.add_handler(CommandHandler("admin", self._admin_command))
         self.app.add_handler(CommandHandler("notify_grades", self._admin_notify_grades))
+        self.app.add_handler(CallbackQueryHandler(self._digest_callback, pattern=r"^digest_\d+$"))
         self.app.add_handler(CallbackQueryHandler(self._handle_callback))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self._handle_message))
         self.app.add_handler(CallbackQueryHandler(self._settings_callback_handler, pattern="^(back_to_main|cancel_action)$"))
@@ -182,6 +252,9 @@ class TelegramBot:
     async def _start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = self.user_storage.get_user(update.effective_user.id)
         fullname = user.get('fullname') if user else None
+        if user and user.get("lifecycle_state") in ("blocked", "chat_not_found"):
+            # They can reach us again, so they can be sent to again
+            self._set_lifecycle_state(update.effective_user.id, "active")
         
         # Show user-friendly welcome message
         if user:
@@ -329,7 +402,7 @@ class TelegramBot:
                 await update.message.reply_text("❗️ يجب إعادة تسجيل الدخول.", reply_markup=get_unregistered_keyboard())
                 return
             logger.info(f"🌐 Calling get_user_data for user {telegram_id}")
-            user_data = await self.university_api.get_user_data(token)
+            user_data = await self.university_api.get_user_data(token, telegram_id)
             logger.info(f"📊 User data result: {user_data is not None}")
             grades = user_data.get("grades", []) if user_data else []
             logger.info(f"📈 Grades count: {len(grades) if grades else 0}")
@@ -360,7 +433,7 @@ class TelegramBot:
             if not token:
                 await update.message.reply_text("❗️ يجب إعادة تسجيل الدخول.", reply_markup=get_unregistered_keyboard())
                 return
-            old_grades = await self.university_api.get_old_grades(token)
+            old_grades = await self.university_api.get_old_grades(token, telegram_id)
             if old_grades is None:
                 await update.message.reply_text("❌ حدث خطأ في الاتصال أو جلب الدرجات. حاول لاحقاً أو تواصل مع الدعم.", reply_markup=get_main_keyboard())
                 return
@@ -410,6 +483,29 @@ class TelegramBot:
             "كل شيء في هذا البوت شفاف ويمكنك دائماً معرفة كيف يتم التعامل مع بياناتك.\n\n"
             "- يمكنك زيارة الكود البرمجي على GitHub."
         )
+        user = self.user_storage.get_user(update.effective_user.id)
+        if user and hasattr(self.user_storage, 'set_digest_minutes'):
+            await update.message.reply_text(
+                "🔔 إشعارات الدرجات\n\n"
+                "عند نشر الدرجات تصل التحديثات على دفعات (الأعمال ثم النظري ثم النهائي).\n"
+                "اختر مدة لجمع التحديثات في رسالة واحدة، أو فوري لاستلام كل تحديث مباشرة.",
+                reply_markup=get_digest_settings_keyboard(self._digest_minutes(user))
+            )
+
+    async def _digest_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        minutes = int(query.data.split("_", 1)[1])
+        if minutes not in dict(DIGEST_CHOICES):
+            await query.answer()
+            return
+        if not self.user_storage.set_digest_minutes(update.effective_user.id, minutes):
+            await query.answer("❌ تعذر حفظ الإعداد، حاول مرة أخرى.")
+            return
+        await query.answer("✅ تم حفظ الإعداد")
+        try:
+            await query.edit_message_reply_markup(reply_markup=get_digest_settings_keyboard(minutes))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to refresh digest keyboard: {e}")
 
     def _get_contact_support_keyboard(self):
         """Returns an inline keyboard with a Contact Support button."""
@@ -584,6 +680,23 @@ class TelegramBot:
 
     async def _grade_checking_loop(self):
         await asyncio.sleep(10)  # Wait a bit before starting grade check
+        if CONFIG.get("GRADE_CHECK_SCHEDULE", "spread") == "spread":
+            logger.info(
+                f"🗓️ Spreading grade checks over {self.poll_scheduler.interval / 60:.0f} min "
+                f"(max {self.poll_scheduler.max_rate:g} checks/s)"
+            )
+            # Users are streamed page by page into the plan, which keeps only their ids;
+            # each is read again just before its slot and checked through the pipeline
+            await self.poll_scheduler.run(
+                self._iter_poll_users,
+                None,
+                lambda: self.running,
+                on_cycle=self._finish_poll_cycle,
+                is_due=self._is_poll_due,
+                process=self._run_spread_cycle,
+                load=self._load_poll_users if hasattr(self.user_storage, 'get_users_by_telegram_ids') else None,
+            )
+            return
         while self.running:
             try:
                 logger.info("🔔 Running scheduled grade check for all users...")
@@ -593,128 +706,285 @@ class TelegramBot:
             interval = CONFIG.get('GRADE_CHECK_INTERVAL', 10) * 60
             await asyncio.sleep(interval)
 
+    def _get_poll_states(self) -> Dict:
+        """Per-user poll states, loaded from storage when first needed"""
+        if self.poll_states is None:
+            self.poll_states = self.grade_storage.get_poll_states() if hasattr(self.grade_storage, 'get_poll_states') else {}
+        return self.poll_states
+
+    def _drop_poll_states(self, shards=None):
+        """Reload states on next use: newly acquired shards were polled (and rescheduled) elsewhere"""
+        if shards:
+            logger.info(f"🧩 Acquired shards {sorted(shards)}, reloading poll states")
+        self.poll_states = None
+
+    def _is_poll_due(self, user, due: float) -> bool:
+        states = self._get_poll_states()
+        state = states.get(user.get("telegram_id"))
+        if state is not None and user.get("last_login") and state.get("last_checked_at"):
+            # A login on any replica resets the user's schedule; the user row read for this
+            # cycle shows it even when the reset happened elsewhere
+            if datetime.fromisoformat(user["last_login"]) > state["last_checked_at"]:
+                states.pop(user.get("telegram_id"), None)
+                state = None
+        return self.poll_policy.is_due(state, datetime.utcfromtimestamp(due))
+
+    def _record_poll(self, telegram_id, grades, changed: bool):
+        """Move the user's next check according to what this poll saw"""
+        states = self._get_poll_states()
+        state = self.poll_policy.next_state(states.get(telegram_id), grades, changed)
+        states[telegram_id] = state
+        if hasattr(self.grade_storage, 'save_poll_state'):
+            self.grade_storage.save_poll_state(telegram_id, state)
+
+    def _reset_poll_state(self, telegram_id):
+        self._get_poll_states().pop(telegram_id, None)
+        if hasattr(self.grade_storage, 'clear_poll_state'):
+            self.grade_storage.clear_poll_state(telegram_id)
+
+    def _set_lifecycle_state(self, telegram_id, state: str):
+        if hasattr(self.user_storage, 'set_lifecycle_state'):
+            self.user_storage.set_lifecycle_state(telegram_id, state)
+
+    def _park_unreachable(self, telegram_id, outcome: str):
+        """Stop polling and messaging users who blocked the bot or whose chat is gone"""
+        if telegram_id == CONFIG.get("ADMIN_ID"):
+            return
+        self._set_lifecycle_state(telegram_id, "blocked" if outcome == BLOCKED else "chat_not_found")
+
+    def _get_users(self, states):
+        """Active users in the given lifecycle states (all of them for older storages)"""
+        if hasattr(self.user_storage, 'set_lifecycle_state'):
+            return self.user_storage.get_all_users(states)
+        return self.user_storage.get_all_users()
+
+    def _owns_user(self, user) -> bool:
+        """Whether this process polls the user (always, unless polling is sharded)"""
+        return self.shard_coordinator is None or self.shard_coordinator.owns(user.get("telegram_id"))
+
+    def _load_poll_users(self, telegram_ids) -> List[Dict]:
+        """Pollable users among telegram_ids that this process polls"""
+        if hasattr(self.user_storage, 'get_users_by_telegram_ids'):
+            users = self.user_storage.get_users_by_telegram_ids(telegram_ids, POLLABLE_STATES)
+        else:
+            wanted = set(telegram_ids)
+            users = [user for user in self._get_users(POLLABLE_STATES) if user.get("telegram_id") in wanted]
+        return [user for user in users if self._owns_user(user)]
+
+    def _iter_poll_users(self):
+        """Users for a full cycle, streamed page by page when the storage supports it"""
+        if hasattr(self.user_storage, 'iter_users'):
+            users = self.user_storage.iter_users(CONFIG.get("POLL_USER_BATCH_SIZE", 500))
+        else:
+            users = iter(self.user_storage.get_all_users())
+        return (user for user in users if self._owns_user(user))
+
     async def _notify_all_users_grades(self):
-        users = self.user_storage.get_all_users()
-        notified_count = 0
-        semaphore = asyncio.Semaphore(CONFIG.get('MAX_CONCURRENT_REQUESTS', 5))
-        tasks = []
-        results = []
-
-        async def check_user(user):
-            async with semaphore:
-                try:
-                    return await self._check_and_notify_user_grades(user)
-                except Exception as e:
-                    logger.error(f"❌ Error in parallel grade check for user {user.get('username', 'Unknown')}: {e}", exc_info=True)
-                    return False
-
-        for user in users:
-            tasks.append(asyncio.create_task(check_user(user)))
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            notified_count = sum(1 for r in results if r is True)
+        self.poll_cycle_stats = {"pages": 0, "unchanged": 0, "paused": 0}
+        notified_count = await self.poll_pipeline.run(PollJob(user) for user in self._iter_poll_users())
+        self.poll_pipeline.log_stats()
+        return self._finish_poll_cycle(notified_count)
+
+    def _finish_poll_cycle(self, notified_count: int) -> int:
+        """Log one cycle's stats, reset the counters and return how many users were notified"""
+        pages = self.poll_cycle_stats["pages"]
+        unchanged = self.poll_cycle_stats["unchanged"]
+        hit_rate = (unchanged / pages * 100) if pages else 0.0
+        logger.info(f"🧮 Grade pages: {unchanged}/{pages} unchanged ({hit_rate:.1f}% skipped parse and diff)")
+        if self.poll_cycle_stats["paused"]:
+            logger.warning(f"🔌 University API unavailable, {self.poll_cycle_stats['paused']} users skipped this cycle")
+        limiter_stats = self.university_api.limiter.get_stats()
+        logger.info(f"🚦 API concurrency limit {limiter_stats['limit']}, p95 {limiter_stats['p95_ms']:.0f} ms")
+        parse_stats = self.university_api.parse_executor.get_stats()
+        logger.info(
+            f"🧵 Parse pool: {parse_stats['completed']} jobs, max queue {parse_stats['max_waiting']}, "
+            f"avg wait {parse_stats['avg_wait_ms']:.1f} ms, avg parse {parse_stats['avg_run_ms']:.1f} ms"
+        )
+        self.poll_cycle_stats = {"pages": 0, "unchanged": 0, "paused": 0}
         return notified_count
 
-    async def _check_and_notify_user_grades(self, user):
-        try:
-            telegram_id = user.get("telegram_id")
-            username = user.get("username")
-            token = user.get("token")
+    async def _run_spread_cycle(self, users) -> int:
+        """One spread cycle: users arrive at their slots and go through the same stages as a full cycle"""
+        async def jobs():
+            async for user in users:
+                yield PollJob(user)
+
+        notified_count = await self.poll_pipeline.run(jobs())
+        self.poll_pipeline.log_stats()
+        return notified_count
+
+    def _set_token_expired_notified(self, user, value: bool):
+        if hasattr(self.user_storage, 'update_token_expired_notified'):
+            self.user_storage.update_token_expired_notified(user.get("telegram_id"), value)
+        else:
+            # Update file storage
+            user["token_expired_notified"] = value
+            if hasattr(self.user_storage, '_save_users'):
+                self.user_storage._save_users()
+
+    async def _poll_stage_fetch(self, job: PollJob):
+        """Token check, identity and the raw grade page in one request"""
+        if self.university_api.breaker.is_open():
+            # Upstream is down: leave the rest of the cycle for later
+            self.poll_cycle_stats["paused"] += 1
+            return None
+        user = job.user
+        telegram_id = user.get("telegram_id")
+        token = user.get("token")
+        if not token or not self._owns_user(user):
+            # No token, or the shard moved to another worker since the cycle started
+            return None
+        # Page digest and grade fingerprint of every stored term in one read
+        job.snapshots = self.grade_storage.get_grade_snapshots(telegram_id)
+        page_digests = {term_id: snap["page_digest"] for term_id, snap in job.snapshots.items() if snap["page_digest"]}
+        job.result = await self.university_api.poll_user(token, telegram_id, page_digests, parse=False)
+        if job.result is None:
+            # Outage or unknown token state: skip this cycle, never park on it
+            logger.info(f"No grade data available for {user.get('username')} in this check.")
+            return None
+        if job.result.get("token_valid") is False:
+            # Parked until the next login: no more polls for a dead token
+            self._set_lifecycle_state(telegram_id, "token_expired")
             # Notify only once if token expired
-            if not token:
-                return False
-            is_pg = hasattr(self.user_storage, 'update_token_expired_notified')
-            notified = user.get("token_expired_notified", False)
-            if not await self.university_api.test_token(token):
-                if not notified:
-                    await self.app.bot.send_message(
-                        chat_id=telegram_id,
-                        text="⏰ انتهت صلاحية الجلسة\n\nيرجى تسجيل الدخول مرة أخرى من خلال زر '🚀 تسجيل الدخول للجامعة' ثم إدخال بياناتك من جديد. هذا طبيعي ويحدث كل فترة.",
-                        reply_markup=get_unregistered_keyboard()
-                    )
-                    # Mark as notified
-                    if is_pg:
-                        self.user_storage.update_token_expired_notified(telegram_id, True)
-                    else:
-                        # Update file storage
-                        user["token_expired_notified"] = True
-                        if hasattr(self.user_storage, '_save_users'):
-                            self.user_storage._save_users()
-                return False
-            # Reset notification flag if token is valid
-            if notified:
-                if is_pg:
-                    self.user_storage.update_token_expired_notified(telegram_id, False)
-                else:
-                    # Update file storage
-                    user["token_expired_notified"] = False
-                    if hasattr(self.user_storage, '_save_users'):
-                        self.user_storage._save_users()
-            user_data = await self.university_api.get_user_data(token)
-            if not user_data or "grades" not in user_data:
-                logger.info(f"No grade data available for {username} in this check.")
-                return False
-            new_grades = user_data.get("grades", [])
-            old_grades = self.grade_storage.get_user_grades(telegram_id)
-            changed_courses = self._compare_grades(old_grades, new_grades)
-            if changed_courses:
-                logger.warning(f"GRADE CHECK: Found {len(changed_courses)} grade changes for user {username}. Sending notification.")
-                display_name = user.get('fullname') or user.get('username', 'المستخدم')
-                message = f"🎓 تم تحديث درجاتك في المواد التالية:\n\n"
-                old_map = {g.get('code') or g.get('name'): g for g in old_grades if g.get('code') or g.get('name')}
-                for grade in changed_courses:
-                    name = grade.get('name', 'N/A')
-                    code = grade.get('code', '-')
-                    coursework = grade.get('coursework', 'لم يتم النشر')
-                    final_exam = grade.get('final_exam', 'لم يتم النشر')
-                    total = grade.get('total', 'لم يتم النشر')
-                    key = code if code != '-' else name
-                    old = old_map.get(key, {})
-                    def show_change(field, label):
-                        old_val = old.get(field, '—')
-                        new_val = grade.get(field, '—')
-                        if old_val != new_val and old_val != '—':
-                            return f"{label}: {old_val} → {new_val}"
-                        return None
-                    changes = [
-                        show_change('coursework', 'الأعمال'),
-                        show_change('final_exam', 'النظري'),
-                        show_change('total', 'النهائي'),
-                    ]
-                    changes = [c for c in changes if c]
-                    if changes:
-                        message += f"📚 {name} ({code})\n" + "\n".join(changes) + "\n\n"
-                now_utc3 = datetime.now(timezone.utc) + timedelta(hours=3)
-                message += f"🕒 وقت التحديث: {now_utc3.strftime('%Y-%m-%d %H:%M')} (UTC+3)"
-                await self.app.bot.send_message(chat_id=telegram_id, text=message)
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"❌ Error in _check_and_notify_user_grades for user {user.get('username', 'Unknown')}: {e}", exc_info=True)
-            return False
+            if user.get("token_expired_notified", False):
+                return None
+            job.expired = True
+            return job
+        # Reset notification flag if token is valid
+        if user.get("token_expired_notified", False):
+            self._set_token_expired_notified(user, False)
+        if job.result.get("page_digest"):
+            self.poll_cycle_stats["pages"] += 1
+        if job.result.get("unchanged"):
+            # Same bytes as the last processed page: nothing to parse or diff
+            self.poll_cycle_stats["unchanged"] += 1
+            self._record_poll(telegram_id, None, False)
+            return None
+        return job
+
+    async def _poll_stage_parse(self, job: PollJob):
+        if job.expired:
+            return job
+        job.result = await self.university_api.finish_poll(job.result, job.user.get("telegram_id"))
+        if job.result.get("grades") is None:
+            logger.info(f"No grade data available for {job.user.get('username')} in this check.")
+            return None
+        job.grades = job.result["grades"]
+        return job
+
+    def _poll_stage_diff(self, job: PollJob):
+        """Compare with the stored grades and build the notification text"""
+        if job.expired:
+            return job
+        user = job.user
+        job.term_id = job.result.get("term_id") or next((g.term_id for g in job.grades if g.term_id), None)
+        job.fingerprint = grades_fingerprint(job.grades)
+        snapshot = job.snapshots.get(job.term_id) or {}
+        if job.fingerprint == snapshot.get("fingerprint"):
+            # Same grades as the stored snapshot: no rows to read
+            return job
+        old_grades = self.grade_storage.get_user_grade_records(user.get("telegram_id"))
+        job.changes = diff_grades(old_grades, job.grades)
+        if not job.changes:
+            return job
+        job.entries = change_entries(job.changes)
+        if not job.entries:
+            # Only new courses, no field changed: stored, but nothing to tell the user
+            return job
+        logger.warning(f"GRADE CHECK: Found {len(job.changes)} grade changes for user {user.get('username')}. Sending notification.")
+        job.message = format_changes_message(job.entries, datetime.now(timezone.utc) + timedelta(hours=3))
+        return job
 
-    def _compare_grades(self, old_grades: List[Dict], new_grades: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _digest_minutes(user) -> float:
+        minutes = user.get("digest_minutes")
+        return CONFIG.get("NOTIFICATION_DIGEST_MINUTES", 0) if minutes is None else minutes
+
+    def _poll_stage_persist(self, job: PollJob):
         """
-        Return only courses where important fields (total, coursework, final_exam) changed.
+        Store what this poll saw and queue its notification for the outbox
+        worker; True when a grade notification was queued.
         """
-        def extract_relevant(grade):
-            return {
-                'code': grade.get('code') or grade.get('name'),
-                'total': grade.get('total'),
-                'coursework': grade.get('coursework'),
-                'final_exam': grade.get('final_exam'),
+        telegram_id = job.user.get("telegram_id")
+        if job.expired:
+            # One notice per expired token
+            key = notification_key("token_expired", telegram_id, hashlib.sha256(job.user.get("token", "").encode()).hexdigest())
+            if self.grade_storage.enqueue_notification(telegram_id, "token_expired", TOKEN_EXPIRED_MESSAGE, key):
+                self.outbox_worker.wake()
+            self._set_token_expired_notified(job.user, True)
+            return None
+        page_digest = job.result.get("page_digest")
+        snapshot = job.snapshots.get(job.term_id) or {}
+        notification = None
+        if job.message:
+            notification = {
+                "kind": "grades",
+                "message": job.message,
+                # Keyed on the snapshot version it replaces: a retry of this poll repeats
+                # the key, a later return to the same grades does not
+                "idempotency_key": notification_key("grades", telegram_id, job.term_id, snapshot.get("version", 0), job.fingerprint),
+                # Changes of the next polls within the user's window join this message
+                "changes": job.entries,
+                "hold_seconds": self._digest_minutes(job.user) * 60,
             }
-        old_map = {g.get('code') or g.get('name'): extract_relevant(g) for g in old_grades if g.get('code') or g.get('name')}
-        changed = []
-        for new_grade in new_grades:
-            key = new_grade.get('code') or new_grade.get('name')
-            if not key:
-                continue
-            relevant_new = extract_relevant(new_grade)
-            relevant_old = old_map.get(key)
-            if relevant_old is None or relevant_new != relevant_old:
-                changed.append(new_grade)
-        return changed
+        queued = False
+        if job.term_id is None:
+            if job.changes:
+                self.grade_storage.save_grades(telegram_id, job.grades)
+            if notification:
+                queued = self.grade_storage.enqueue_notification(telegram_id, **notification)
+        elif job.fingerprint != snapshot.get("fingerprint"):
+            # Grades, fingerprint, page digest and the notification together: a change is
+            # either stored and queued, or neither (and found again next poll)
+            stored = self.grade_storage.save_grade_snapshot(
+                telegram_id, job.term_id, job.grades, job.fingerprint, page_digest, notification=notification
+            )
+            if stored is None:
+                logger.info(f"🔁 Grade notice for user {telegram_id} was already queued by an earlier poll")
+            queued = bool(stored) and notification is not None
+        elif page_digest:
+            self.grade_storage.save_page_digest(telegram_id, job.term_id, page_digest)
+        if job.changes:
+            self._propagate_publications(telegram_id, job.changes)
+        self._record_poll(telegram_id, job.grades, bool(job.changes))
+        if queued:
+            self.outbox_worker.wake()
+            return True
+        return None
+
+    @staticmethod
+    def _newly_published(changes: List[GradeChange]) -> List[str]:
+        """Course codes that went from unpublished to published (not first sightings)"""
+        return [change.grade.code for change in changes if change.grade.code and change.newly_published]
+
+    def _propagate_publications(self, telegram_id, changes: List[GradeChange]):
+        """A course just published for one student is likely published for all: check classmates now"""
+        if CONFIG.get("GRADE_CHECK_SCHEDULE", "spread") != "spread":
+            return
+        now = time.monotonic()
+        cooldown = CONFIG.get("POLL_PROPAGATION_COOLDOWN_MINUTES", 60) * 60
+        codes = [
+            code for code in self._newly_published(changes)
+            if now - self._propagated_courses.get(code, -cooldown) >= cooldown
+        ]
+        if not codes:
+            return
+        for code in codes:
+            # Classmates' own checks will see the same release; bump once per course
+            self._propagated_courses[code] = now
+        waiting = set(self.grade_storage.get_course_waiters(codes, exclude_telegram_id=telegram_id))
+        if not waiting:
+            return
+        # Classmates in other workers' shards are seen at their own slot
+        users = [u for u in self._load_poll_users(waiting) if u.get("token")]
+        queued = self.poll_scheduler.bump(users)
+        logger.info(f"📣 {', '.join(codes)} published: checking {queued} classmates now")
+
+    def _compare_grades(self, old_grades: List[Grade], new_grades: List[Grade]) -> List[Grade]:
+        """
+        Return only courses where important fields (total, coursework, final_exam) changed.
+        """
+        return [change.grade for change in diff_grades(old_grades, new_grades)]
 
     async def _register_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
@@ -894,6 +1164,9 @@ class TelegramBot:
                 await update.message.reply_text("❌ حدث خطأ أثناء حفظ البيانات. يرجى المحاولة مرة أخرى.", reply_markup=get_unregistered_keyboard())
                 return
             logger.info(f"✅ User saved successfully")
+            # A new login may belong to a different student; drop the old term list
+            self.university_api.term_cache.invalidate(telegram_id)
+            self._reset_poll_state(telegram_id)
         except Exception as e:
             logger.error(f"❌ Error saving user: {e}", exc_info=True)
             raise
@@ -930,15 +1203,9 @@ class TelegramBot:
         return ConversationHandler.END
 
     async def send_quote_to_all_users(self, message):
-        users = self.user_storage.get_all_users()
-        sent = 0
-        for user in users:
-            try:
-                await self.app.bot.send_message(chat_id=user['telegram_id'], text=message)
-                sent += 1
-            except Exception:
-                continue
-        return sent
+        users = self._get_users(REACHABLE_STATES)
+        outcomes = await self.send_dispatcher.send_many((user['telegram_id'] for user in users), message)
+        return outcomes["sent"]
 
     async def scheduled_daily_quote_broadcast(self):
         """Send daily quote to all users at scheduled time"""
@@ -973,8 +1240,15 @@ class TelegramBot:
                 message = await self.grade_analytics.format_quote_dual_language(quote)
             else:
                 message = "💬 رسالة اليوم:\n\nلم تتوفر رسالة اليوم حالياً."
-            count = await self.send_quote_to_all_users(message)
-            logger.info(f"✅ تم إرسال رسالة اليوم إلى {count} مستخدم.")
+            # A background job, so a restart during the fan-out resumes instead of starting over
+            if self.broadcast_storage is not None:
+                # Every replica runs this loop: the date key keeps one job per day
+                job_id = await self.broadcast_system.enqueue(message, kind="quote", dedup_key=f"quote:{next_run.date().isoformat()}")
+                if job_id is not None:
+                    logger.info(f"✅ رسالة اليوم في طابور البث (job {job_id}).")
+            else:
+                count = await self.send_quote_to_all_users(message)
+                logger.info(f"✅ تم إرسال رسالة اليوم إلى {count} مستخدم.")
 
     async def _how_it_works_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
@@ -994,13 +1268,11 @@ class TelegramBot:
                 return
             # Format quote in two languages
             quote_text = await self.grade_analytics.format_quote_dual_language(quote)
-            for user in self.user_storage.get_all_users():
-                telegram_id = user.get("telegram_id")
-                if telegram_id:
-                    try:
-                        await context.bot.send_message(chat_id=telegram_id, text=quote_text, parse_mode=ParseMode.MARKDOWN)
-                    except Exception as e:
-                        logger.warning(f"Failed to send quote to {telegram_id}: {e}")
+            await self.send_dispatcher.send_many(
+                (user.get("telegram_id") for user in self._get_users(REACHABLE_STATES)),
+                quote_text,
+                parse_mode=ParseMode.MARKDOWN,
+            )
         except Exception as e:
             logger.error(f"Error in _broadcast_quote: {e}")
 
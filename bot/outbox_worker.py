@@ -0,0 +1,115 @@
+"""
+📬 Outbox Worker
+Delivers queued notifications from the outbox table, so polling never waits on Telegram
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from config import CONFIG
+from bot.send_dispatcher import BLOCKED, INVALID, SENT
+
+logger = logging.getLogger(__name__)
+
+
+def notification_key(kind: str, *parts: Any) -> str:
+    """Idempotency key: the same change (or the same expired token) always maps to the same key"""
+    raw = ":".join([kind, *(str(part) for part in parts)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class OutboxWorker:
+    """
+    Claims due notifications, sends them through the dispatcher and records
+    the outcome. Delivery is at-least-once: a crash between the send and the
+    status update resends that one message after its claim expires, but a
+    change is never lost and never queued twice.
+    """
+
+    def __init__(
+        self,
+        storage,
+        dispatcher,
+        reply_markups: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        lease_seconds: Optional[float] = None,
+        retention_days: Optional[float] = None,
+    ):
+        self.storage = storage
+        self.dispatcher = dispatcher
+        # Keyboard to attach per notification kind
+        self.reply_markups = reply_markups or {}
+        self.batch_size = batch_size or CONFIG.get("OUTBOX_BATCH_SIZE", 50)
+        self.max_attempts = max_attempts or CONFIG.get("OUTBOX_MAX_ATTEMPTS", 8)
+        self.lease_seconds = lease_seconds or CONFIG.get("OUTBOX_LEASE_SECONDS", 300)
+        self.retention_days = retention_days or CONFIG.get("OUTBOX_RETENTION_DAYS", 7)
+        self.stats = Counter()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self):
+        """New rows were queued: drain now instead of at the next tick"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(2 ** attempts * 30, 3600)
+
+    async def _deliver(self, item: Dict[str, Any]) -> str:
+        kwargs = {}
+        reply_markup = self.reply_markups.get(item["kind"])
+        if reply_markup is not None:
+            kwargs["reply_markup"] = reply_markup
+        outcome = await self.dispatcher.send(item["telegram_id"], item["message"], **kwargs)
+        attempts = item["attempts"] + 1
+        if outcome == SENT:
+            self.storage.finish_notification(item["id"], "sent")
+        elif outcome in (BLOCKED, INVALID):
+            # The dispatcher already parked the user; retrying would fail the same way
+            self.storage.finish_notification(item["id"], "undeliverable", outcome)
+        elif attempts >= self.max_attempts:
+            logger.error(f"❌ Giving up on notification {item['id']} for {item['telegram_id']} after {attempts} attempts")
+            self.storage.finish_notification(item["id"], "failed", outcome)
+        else:
+            self.storage.finish_notification(item["id"], "pending", outcome, retry_in=self._retry_delay(attempts))
+        self.stats[outcome] += 1
+        return outcome
+
+    async def drain_once(self) -> int:
+        """Send every due notification; returns how many were attempted"""
+        attempted = 0
+        while True:
+            batch = self.storage.claim_notifications(self.batch_size, self.lease_seconds)
+            if not batch:
+                return attempted
+            await asyncio.gather(*(self._deliver(item) for item in batch))
+            attempted += len(batch)
+
+    async def run(self, is_running):
+        self._wakeup = asyncio.Event()
+        purged_at = 0.0
+        loop = asyncio.get_running_loop()
+        while is_running():
+            try:
+                await self.drain_once()
+                if loop.time() - purged_at >= 3600:
+                    purged_at = loop.time()
+                    purged = self.storage.purge_notifications(self.retention_days)
+                    if purged:
+                        logger.info(f"🧹 Purged {purged} old outbox notifications")
+            except Exception as e:
+                logger.error(f"❌ Error in outbox worker: {e}", exc_info=True)
+            self._wakeup.clear()
+            try:
+                # Retries come due on their own: poll even without a wakeup
+                await asyncio.wait_for(self._wakeup.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"sent": self.stats[SENT], "attempts": sum(self.stats.values())}
+        stats["outbox"] = self.storage.get_outbox_stats()
+        return stats
@@ -0,0 +1,200 @@
+"""
+🏭 Poll Pipeline
+Staged producer/consumer flow for a grade check cycle over bounded queues
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Union
+
+from university.grade_diff import GradeChange
+from university.grade_record import Grade
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker, one per worker of the receiving stage
+_DONE = object()
+
+
+@dataclass(repr=False)
+class PollJob:
+    """One user's check as it moves through the stages"""
+
+    user: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    snapshots: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    grades: List[Grade] = field(default_factory=list)
+    term_id: Optional[str] = None
+    fingerprint: Optional[str] = None
+    changes: List[GradeChange] = field(default_factory=list)
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    message: Optional[str] = None
+    expired: bool = False
+
+    def __repr__(self) -> str:
+        # The user dict carries the token; keep it out of logs
+        return f"PollJob({self.user.get('username', 'Unknown')})"
+
+
+class Stage:
+    """
+    A step of the pipeline. func(item) may be sync or async; it returns the
+    item for the next stage, or None to drop it (nothing left to do).
+    A sync func runs on the event loop, one item at a time, unless threaded
+    is set: it then runs in worker threads, workers of them at once.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, threaded: bool = False):
+        self.name = name
+        self.func = func
+        self.threaded = threaded
+        # Extra workers of an inline sync stage would only take turns on the loop
+        self.workers = max(1, workers) if threaded or inspect.iscoroutinefunction(func) else 1
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.busy_seconds = 0.0
+        # Input queues of the runs in progress (each run() has its own)
+        self.queues: List[asyncio.Queue] = []
+
+    async def process(self, item: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            if self.threaded:
+                result = await asyncio.to_thread(self.func, item)
+            else:
+                result = self.func(item)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Poll {self.name} stage failed for {item!r}: {e}", exc_info=True)
+            return None
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+        self.processed += 1
+        if result is None:
+            self.dropped += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "depth": sum(queue.qsize() for queue in self.queues),
+            "max_depth": self.max_depth,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+class Pipeline:
+    """
+    Stages connected by bounded asyncio.Queues. A full queue blocks the stage
+    feeding it, so memory holds at most queue_size items per stage plus one per
+    worker, however many users the source yields.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 100):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.runs = 0
+        self.last_fed = 0
+        self.last_completed = 0
+        self.last_duration = 0.0
+
+    @staticmethod
+    async def _put(stage: Stage, queue: asyncio.Queue, item: Any):
+        await queue.put(item)
+        stage.max_depth = max(stage.max_depth, queue.qsize())
+
+    async def _feed(self, source: Union[Iterable[Any], AsyncIterable[Any]], queues: List[asyncio.Queue], fed: List[int]):
+        first = self.stages[0]
+        try:
+            if hasattr(source, "__aiter__"):
+                # A paced source (the spread scheduler) waits for room in the first queue
+                async for item in source:
+                    fed[0] += 1
+                    await self._put(first, queues[0], item)
+            else:
+                for item in source:
+                    fed[0] += 1
+                    await self._put(first, queues[0], item)
+        except Exception as e:
+            logger.error(f"❌ Poll pipeline source failed: {e}", exc_info=True)
+        finally:
+            for _ in range(first.workers):
+                await queues[0].put(_DONE)
+
+    async def _work(self, index: int, queues: List[asyncio.Queue], outputs: List[int]):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = await queues[index].get()
+            if item is _DONE:
+                return
+            result = await stage.process(item)
+            if result is None:
+                continue
+            if following is not None:
+                await self._put(following, queues[index + 1], result)
+            elif result:
+                outputs[0] += 1
+
+    async def _run_stage(self, index: int, queues: List[asyncio.Queue], outputs: List[int]):
+        stage = self.stages[index]
+        await asyncio.gather(*(self._work(index, queues, outputs) for _ in range(stage.workers)))
+        # Every worker of this stage is done: close the next one
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                await queues[index + 1].put(_DONE)
+
+    async def run(self, source: Union[Iterable[Any], AsyncIterable[Any]]) -> int:
+        """
+        Push every item of source through all stages; returns how many truthy
+        results came out. Each call has its own queues and workers, so a manual
+        check may run while a scheduled cycle is still going.
+        """
+        started = time.time()
+        outputs = [0]
+        fed = [0]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for stage, queue in zip(self.stages, queues):
+            stage.queues.append(queue)
+            stage.max_depth = 0
+        try:
+            await asyncio.gather(
+                self._feed(source, queues, fed),
+                *(self._run_stage(index, queues, outputs) for index in range(len(self.stages))),
+            )
+        finally:
+            for stage, queue in zip(self.stages, queues):
+                stage.queues.remove(queue)
+        self.runs += 1
+        self.last_fed = fed[0]
+        self.last_completed = outputs[0]
+        self.last_duration = time.time() - started
+        return outputs[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "queue_size": self.queue_size,
+            "last_fed": self.last_fed,
+            "last_completed": self.last_completed,
+            "last_duration_seconds": self.last_duration,
+            "stages": {stage.name: stage.get_stats() for stage in self.stages},
+        }
+
+    def log_stats(self):
+        for stage in self.stages:
+            stats = stage.get_stats()
+            logger.info(
+                f"🏭 {stage.name}: {stats['workers']} workers, {stats['processed']} done, "
+                f"{stats['dropped']} finished early, {stats['failed']} failed, max queue {stats['max_depth']}"
+            )
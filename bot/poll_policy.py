@@ -0,0 +1,94 @@
+"""
+🌡️ Poll Policy
+Per-user check frequency from the publication state of their current term
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import CONFIG
+from university.grade_record import Grade, GradeStatus
+
+logger = logging.getLogger(__name__)
+
+# hot: grades still unpublished or changed recently; idle: no courses on the page;
+# settled: everything published; dormant: settled for a long time (term over)
+TIERS = ("hot", "idle", "settled", "dormant")
+
+
+class PollPolicy:
+    """Decides the tier and next check time after each successful poll"""
+
+    def __init__(
+        self,
+        hot_minutes: Optional[float] = None,
+        idle_minutes: Optional[float] = None,
+        settled_minutes: Optional[float] = None,
+        dormant_minutes: Optional[float] = None,
+        hot_window_hours: Optional[float] = None,
+        dormant_after_days: Optional[float] = None,
+    ):
+        self.intervals = {
+            "hot": timedelta(minutes=hot_minutes or CONFIG.get("GRADE_CHECK_INTERVAL", 15)),
+            "idle": timedelta(minutes=idle_minutes or CONFIG.get("POLL_IDLE_MINUTES", 60)),
+            "settled": timedelta(minutes=settled_minutes or CONFIG.get("POLL_SETTLED_MINUTES", 360)),
+            "dormant": timedelta(minutes=dormant_minutes or CONFIG.get("POLL_DORMANT_MINUTES", 1440)),
+        }
+        self.hot_window = timedelta(hours=hot_window_hours or CONFIG.get("POLL_HOT_WINDOW_HOURS", 48))
+        self.dormant_after = timedelta(days=dormant_after_days or CONFIG.get("POLL_DORMANT_AFTER_DAYS", 14))
+
+    def next_state(
+        self,
+        previous: Optional[Dict[str, Any]],
+        grades: Optional[List[Grade]],
+        changed: bool,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        grades is the freshly parsed term, or None when the page was unchanged
+        (the previous snapshot counts are kept).
+        """
+        now = now or datetime.utcnow()
+        previous = previous or {}
+        if grades is None:
+            courses = previous.get("courses", 0)
+            pending = previous.get("pending_courses", 0)
+        else:
+            courses = len(grades)
+            pending = sum(1 for grade in grades if grade.grade_status != GradeStatus.PUBLISHED)
+
+        last_change_at = now if changed else previous.get("last_change_at")
+        settled_since = None
+        if courses and not pending:
+            settled_since = previous.get("settled_since") or now
+
+        if last_change_at is not None and now - last_change_at < self.hot_window:
+            tier = "hot"
+        elif not courses:
+            tier = "idle"
+        elif pending:
+            tier = "hot"
+        elif now - settled_since >= self.dormant_after:
+            tier = "dormant"
+        else:
+            tier = "settled"
+
+        return {
+            "tier": tier,
+            "next_check_at": now + self.intervals[tier],
+            "last_checked_at": now,
+            "last_change_at": last_change_at,
+            "courses": courses,
+            "pending_courses": pending,
+            "settled_since": settled_since,
+        }
+
+    @staticmethod
+    def is_due(state: Optional[Dict[str, Any]], at: datetime) -> bool:
+        return state is None or state["next_check_at"] <= at
+
+    def checks_per_day(self, tiers: Dict[str, int]) -> float:
+        """Expected checks per day for a {tier: users} breakdown"""
+        day = timedelta(days=1)
+        return sum(count * (day / self.intervals[tier]) for tier, count in tiers.items() if tier in self.intervals)
@@ -0,0 +1,315 @@
+"""
+🗓️ Poll Scheduler
+Spreads grade checks evenly over the check interval instead of firing them all at once
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def phase_offset(telegram_id: Any, interval: float) -> float:
+    """Stable position of a user inside the interval (same across restarts)"""
+    digest = hashlib.sha256(str(telegram_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 * interval
+
+
+def plan_capacity(
+    users: int,
+    max_rate: float,
+    interval: float,
+    requests_per_poll: float = 1.0,
+    latency: Optional[float] = None,
+    max_in_flight: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Shortest achievable check interval for `users` under a request rate cap.
+
+    The rate bound is users * requests_per_poll / max_rate; with a latency and
+    a concurrency cap, Little's law adds users * latency / max_in_flight.
+    """
+    requests = users * requests_per_poll
+    min_interval = requests / max_rate if max_rate > 0 else math.inf
+    if latency and max_in_flight:
+        min_interval = max(min_interval, users * latency / max_in_flight)
+    required_rate = requests / interval if interval > 0 else math.inf
+    return {
+        "users": users,
+        "interval_seconds": interval,
+        "max_rate": max_rate,
+        "requests_per_poll": requests_per_poll,
+        "required_rate": required_rate,
+        "min_interval_seconds": min_interval,
+        "utilization": required_rate / max_rate if max_rate > 0 else math.inf,
+        "fits": min_interval <= interval,
+    }
+
+
+class PollScheduler:
+    """
+    Each user is checked once per interval at start + phase_offset(telegram_id).
+    Dispatches are spaced at least 1/max_rate seconds apart, so collisions and
+    catch-up after a slow stretch become a steady stream rather than a burst.
+
+    bump() queues users ahead of the plan. They take the next free dispatch
+    slot and their regular slot in the same cycle is dropped, so the rate
+    stays the same.
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.interval = interval or CONFIG.get("GRADE_CHECK_INTERVAL", 15) * 60
+        self.max_rate = max_rate or CONFIG.get("POLL_MAX_RATE", 5.0)
+        self.max_in_flight = max_in_flight or CONFIG.get("UNIVERSITY_LIMIT_MAX", 50)
+        self.cycles = 0
+        self.checks = 0
+        self.overruns = 0
+        self.load_batch_size = CONFIG.get("POLL_USER_BATCH_SIZE", 500)
+        self.last_planned = 0
+        self.last_users = 0
+        self.last_dispatched = 0
+        self.last_skipped = 0
+        self.last_not_due = 0
+        self.last_max_lag = 0.0
+        self.last_duration = 0.0
+        self._urgent: deque = deque()
+        self._urgent_ids: Dict[Any, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self.bumped = 0
+        self.bump_wait_seconds = 0.0
+
+    def cycle_start(self, now: Optional[float] = None) -> float:
+        """Start of the interval-aligned cycle containing `now`"""
+        now = time.time() if now is None else now
+        return now - now % self.interval
+
+    def plan(
+        self,
+        users: Iterable[Dict[str, Any]],
+        start: float,
+        not_before: Optional[float] = None,
+        is_due: Optional[Callable[[Dict[str, Any], float], bool]] = None,
+        compact: bool = False,
+    ) -> List[Tuple[float, Any]]:
+        """
+        (due time, user) for one cycle in dispatch order. Slots before not_before
+        are left out, and so are users for whom is_due(user, slot) is false.
+        users may be a stream; with compact=True only telegram ids are kept
+        instead of the user dicts, so the plan stays small however many users
+        there are.
+        """
+        schedule = []
+        self.last_planned = 0
+        self.last_not_due = 0
+        for user in users:
+            self.last_planned += 1
+            due = start + phase_offset(user.get("telegram_id"), self.interval)
+            if not_before is not None and due < not_before:
+                continue
+            if is_due is not None and not is_due(user, due):
+                self.last_not_due += 1
+                continue
+            schedule.append((due, user.get("telegram_id") if compact else user))
+        schedule.sort(key=lambda item: item[0])
+        return schedule
+
+    def bump(self, users: List[Dict[str, Any]]) -> int:
+        """Check these users before anyone else in the plan; returns how many were queued"""
+        queued = 0
+        now = time.time()
+        for user in users:
+            telegram_id = user.get("telegram_id")
+            if telegram_id in self._urgent_ids:
+                continue
+            self._urgent_ids[telegram_id] = now
+            self._urgent.append(user)
+            queued += 1
+        if queued and self._wakeup is not None:
+            self._wakeup.set()
+        return queued
+
+    async def _sleep(self, delay: float, interruptible: bool) -> bool:
+        """Sleep for delay; True if bump() cut it short"""
+        if not interruptible:
+            await asyncio.sleep(delay)
+            return False
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def dispatch(
+        self,
+        users: Iterable[Dict[str, Any]],
+        start: float,
+        not_before: Optional[float] = None,
+        is_due: Optional[Callable[[Dict[str, Any], float], bool]] = None,
+        load: Optional[Callable[[List[Any]], List[Dict[str, Any]]]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield each planned user (and bumped ones first) at its slot. The next
+        slot is timed from when the consumer asks for it, so a consumer that is
+        backed up slows dispatching down instead of piling up work.
+
+        With load, the plan keeps only telegram ids and load(ids) reads the
+        users of the next few slots just before they are due; users it no
+        longer returns (parked, deleted, moved to another shard) are skipped.
+        """
+        schedule = self.plan(users, start, not_before, is_due, compact=load is not None)
+        self.last_users = len(schedule)
+        self.last_skipped = self.last_planned - len(schedule) - self.last_not_due
+        self.last_max_lag = 0.0
+        self.last_dispatched = 0
+        spacing = 1.0 / self.max_rate if self.max_rate > 0 else 0.0
+        self._wakeup = asyncio.Event()
+        next_slot = 0.0
+        started = time.time()
+        checked_early = set()
+        loaded: Dict[Any, Dict[str, Any]] = {}
+        index = 0
+
+        while self._urgent or index < len(schedule):
+            urgent = bool(self._urgent)
+            if urgent:
+                user = self._urgent[0]
+                due = self._urgent_ids.get(user.get("telegram_id"), started)
+            else:
+                due, user = schedule[index]
+                telegram_id = user if load is not None else user.get("telegram_id")
+                if telegram_id in checked_early:
+                    index += 1
+                    continue
+            delay = max(due, next_slot) - time.time()
+            # A bump during the wait for a planned slot goes first
+            if delay > 0 and await self._sleep(delay, interruptible=not urgent):
+                continue
+            if urgent:
+                self._urgent.popleft()
+                telegram_id = user.get("telegram_id")
+                bumped_at = self._urgent_ids.pop(telegram_id, started)
+                checked_early.add(telegram_id)
+                self.bumped += 1
+                self.bump_wait_seconds += time.time() - bumped_at
+            else:
+                index += 1
+                if load is not None:
+                    if telegram_id not in loaded:
+                        batch = [item for _, item in schedule[index - 1:index - 1 + self.load_batch_size]]
+                        loaded = {u.get("telegram_id"): u for u in load(batch)}
+                    user = loaded.pop(telegram_id, None)
+                    if user is None:
+                        self.last_skipped += 1
+                        continue
+                self.last_max_lag = max(self.last_max_lag, time.time() - due)
+            self.last_dispatched += 1
+            yield user
+            next_slot = time.time() + spacing
+
+    def _finish_cycle(self, started: float):
+        self.cycles += 1
+        self.checks += self.last_dispatched
+        self.last_duration = time.time() - started
+
+    async def run_cycle(
+        self,
+        users: Iterable[Dict[str, Any]],
+        check: Callable[[Dict[str, Any]], Awaitable[Any]],
+        start: float,
+        not_before: Optional[float] = None,
+        is_due: Optional[Callable[[Dict[str, Any], float], bool]] = None,
+    ) -> List[Any]:
+        """Run check(user) for every dispatched user, at most max_in_flight at once, and wait for all of them"""
+        started = time.time()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = []
+
+        async def run(user):
+            try:
+                return await check(user)
+            finally:
+                slots.release()
+
+        async for user in self.dispatch(users, start, not_before, is_due):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(run(user)))
+        results = await asyncio.gather(*tasks, return_exceptions=True) if tasks else []
+        self._finish_cycle(started)
+        return results
+
+    async def run(
+        self,
+        get_users: Callable[[], Iterable[Dict[str, Any]]],
+        check: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]],
+        is_running: Callable[[], bool],
+        on_cycle: Optional[Callable[[Any], None]] = None,
+        is_due: Optional[Callable[[Dict[str, Any], float], bool]] = None,
+        process: Optional[Callable[[AsyncIterator[Dict[str, Any]]], Awaitable[Any]]] = None,
+        load: Optional[Callable[[List[Any]], List[Dict[str, Any]]]] = None,
+    ):
+        """
+        Run cycles back to back until is_running() is false. Each cycle either
+        runs check(user) per user (run_cycle) or, with process, hands the whole
+        dispatch stream to process (a pipeline); on_cycle gets the cycle's result.
+        """
+        now = time.time()
+        start = self.cycle_start(now)
+        # After a restart, users whose slot already passed wait for the next cycle
+        not_before = now
+        while is_running():
+            try:
+                if process is not None:
+                    started = time.time()
+                    results = await process(self.dispatch(get_users(), start, not_before, is_due, load))
+                    self._finish_cycle(started)
+                else:
+                    results = await self.run_cycle(get_users(), check, start, not_before, is_due)
+                if on_cycle is not None:
+                    on_cycle(results)
+            except Exception as e:
+                logger.error(f"❌ Error in scheduled grade check: {e}", exc_info=True)
+            not_before = None
+            start += self.interval
+            now = time.time()
+            if now >= start + self.interval:
+                self.overruns += 1
+                logger.warning(
+                    f"⏱️ Grade check cycle overran the {self.interval / 60:.0f} min interval "
+                    f"({self.last_duration:.0f}s for {self.last_users} users), restarting at the current cycle"
+                )
+                start = self.cycle_start(now)
+                not_before = now
+
+    def capacity(self, users: int, requests_per_poll: float = 1.0, latency: Optional[float] = None) -> Dict[str, Any]:
+        """plan_capacity() for this scheduler's interval, rate and concurrency"""
+        return plan_capacity(users, self.max_rate, self.interval, requests_per_poll, latency, self.max_in_flight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "max_rate": self.max_rate,
+            "cycles": self.cycles,
+            "checks": self.checks,
+            "overruns": self.overruns,
+            "last_users": self.last_users,
+            "last_skipped": self.last_skipped,
+            "last_not_due": self.last_not_due,
+            "last_max_lag_seconds": self.last_max_lag,
+            "last_duration_seconds": self.last_duration,
+            "bumped": self.bumped,
+            "queued": len(self._urgent),
+            "avg_bump_wait_seconds": self.bump_wait_seconds / self.bumped if self.bumped else 0.0,
+        }
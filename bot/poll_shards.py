@@ -0,0 +1,123 @@
+"""
+🧩 Poll Shards
+Splits grade polling between bot processes through lease rows in the database
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(telegram_id: Any, shard_count: int) -> int:
+    """Stable shard of a user (independent of phase_offset, which uses the leading bytes)"""
+    digest = hashlib.sha256(str(telegram_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[8:16], "big") % shard_count
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardCoordinator:
+    """
+    Each worker heartbeats a row in poll_workers and holds about
+    shard_count / live workers shard leases, renewed on every heartbeat.
+
+    A new worker raises the live count, so the others give back their extras
+    on their next heartbeat. A dead worker stops renewing: its row and leases
+    expire and the rest take its shards over. A worker that cannot reach the
+    database stops polling once its own leases would have expired, so no user
+    is ever polled by two workers for longer than a clock skew.
+    """
+
+    def __init__(
+        self,
+        storage,
+        shard_count: Optional[int] = None,
+        worker_id: Optional[str] = None,
+        lease_seconds: Optional[float] = None,
+        on_acquire: Optional[Callable[[FrozenSet[int]], None]] = None,
+    ):
+        self.storage = storage
+        # Called with shards this worker did not hold (or whose lease had lapsed),
+        # whose users another worker may have polled meanwhile
+        self.on_acquire = on_acquire
+        self.shard_count = shard_count or CONFIG.get("POLL_SHARD_COUNT", 0)
+        self.worker_id = worker_id or CONFIG.get("POLL_WORKER_ID") or default_worker_id()
+        self.lease_seconds = lease_seconds or CONFIG.get("POLL_SHARD_LEASE_SECONDS", 60)
+        self.owned: FrozenSet[int] = frozenset()
+        self.live_workers = 0
+        self.valid_until = 0.0
+        self.heartbeats = 0
+        self.failed_heartbeats = 0
+        self.rebalances = 0
+
+    def heartbeat(self, now=None) -> FrozenSet[int]:
+        """Renew this worker and its leases; returns the shards it may poll"""
+        started = time.monotonic()
+        live = self.storage.heartbeat_poll_worker(self.worker_id, self.lease_seconds, now)
+        shards = None
+        if live is not None:
+            self.live_workers = live
+            target = math.ceil(self.shard_count / max(1, live))
+            shards = self.storage.claim_poll_shards(self.worker_id, self.shard_count, target, self.lease_seconds, now)
+        self.heartbeats += 1
+        if shards is None:
+            self.failed_heartbeats += 1
+            logger.warning(f"⚠️ Poll shard heartbeat failed for {self.worker_id}, keeping {len(self.owned)} shards until the lease runs out")
+            return self.owned
+        owned = frozenset(shards)
+        acquired = owned if started >= self.valid_until else owned - self.owned
+        if owned != self.owned:
+            self.rebalances += 1
+            logger.info(
+                f"🧩 {self.worker_id} polls {len(owned)}/{self.shard_count} shards "
+                f"({self.live_workers} workers): {sorted(owned)}"
+            )
+        self.owned = owned
+        self.valid_until = started + self.lease_seconds
+        if acquired and self.on_acquire is not None:
+            self.on_acquire(acquired)
+        return self.owned
+
+    def owns(self, telegram_id: Any) -> bool:
+        if time.monotonic() >= self.valid_until:
+            # Leases not renewed in time may already belong to another worker
+            return False
+        return shard_of(telegram_id, self.shard_count) in self.owned
+
+    async def run(self, is_running):
+        """Heartbeat three times per lease until is_running() is false"""
+        while is_running():
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"❌ Error in poll shard heartbeat: {e}", exc_info=True)
+
+    def release(self):
+        """Give the shards back right away on a clean shutdown"""
+        self.storage.release_poll_shards(self.worker_id)
+        self.owned = frozenset()
+        self.valid_until = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "shard_count": self.shard_count,
+            "owned": sorted(self.owned),
+            "live_workers": self.live_workers,
+            "lease_seconds": self.lease_seconds,
+            "heartbeats": self.heartbeats,
+            "failed_heartbeats": self.failed_heartbeats,
+            "rebalances": self.rebalances,
+        }
@@ -0,0 +1,191 @@
+"""
+📮 Send Dispatcher
+Every outgoing Telegram message goes through one rate-limited sender:
+a global token bucket, a per-chat gap, concurrent workers and RetryAfter handling
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of one delivery
+SENT, BLOCKED, INVALID, FAILED = "sent", "blocked", "invalid", "failed"
+
+
+class TokenBucket:
+    """rate tokens per second, bursts up to capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def drain(self):
+        """Empty the bucket (after flood control), so sending restarts slowly"""
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+class SendDispatcher:
+    """
+    deliver() waits for the chat's gap, a global token and any flood-control
+    pause, then makes the call. RetryAfter pauses every send for the time
+    Telegram asks and retries; timeouts are retried with backoff. Blocked and
+    unknown chats are reported, not raised.
+    """
+
+    def __init__(
+        self,
+        get_bot: Callable[[], Any],
+        rate: Optional[float] = None,
+        per_chat_interval: Optional[float] = None,
+        workers: Optional[int] = None,
+        retries: Optional[int] = None,
+        on_unreachable: Optional[Callable[[Any, str], None]] = None,
+    ):
+        self.get_bot = get_bot
+        # Called with (chat_id, BLOCKED or INVALID) so the user can be parked
+        self.on_unreachable = on_unreachable
+        self.bucket = TokenBucket(rate or CONFIG.get("TELEGRAM_GLOBAL_RATE", 25))
+        self.per_chat_interval = per_chat_interval if per_chat_interval is not None else CONFIG.get("TELEGRAM_PER_CHAT_INTERVAL_SECONDS", 1.0)
+        self.workers = workers or CONFIG.get("TELEGRAM_SEND_WORKERS", 16)
+        self.retries = retries if retries is not None else CONFIG.get("TELEGRAM_SEND_RETRIES", 3)
+        self._chat_next: Dict[Any, float] = {}
+        self._paused_until = 0.0
+        self.stats = Counter()
+        self.flood_wait_seconds = 0.0
+
+    async def _wait_for_chat(self, chat_id):
+        # Reserve the chat's next slot before sleeping so concurrent sends to one chat queue up
+        now = time.monotonic()
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.per_chat_interval
+        if len(self._chat_next) > 10000:
+            self._chat_next = {chat: at for chat, at in self._chat_next.items() if at > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _wait_for_flood_control(self):
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def deliver(self, chat_id, call: Callable[[Any], Awaitable[Any]]) -> str:
+        """Run call(bot) for chat_id under the limits; returns sent, blocked, invalid or failed"""
+        await self._wait_for_chat(chat_id)
+        for attempt in range(self.retries + 1):
+            await self._wait_for_flood_control()
+            await self.bucket.acquire()
+            try:
+                await call(self.get_bot())
+                self.stats[SENT] += 1
+                return SENT
+            except RetryAfter as e:
+                wait = float(e.retry_after)
+                self.stats["retry_after"] += 1
+                self.flood_wait_seconds += wait
+                self._paused_until = max(self._paused_until, time.monotonic() + wait)
+                self.bucket.drain()
+                logger.warning(f"🚦 Telegram flood control: pausing sends for {wait:.0f}s")
+            except Forbidden:
+                self.stats[BLOCKED] += 1
+                logger.warning(f"User {chat_id} blocked the bot")
+                return self._unreachable(chat_id, BLOCKED)
+            except BadRequest as e:
+                message = str(e).lower()
+                if "chat not found" in message or "user not found" in message:
+                    self.stats[INVALID] += 1
+                    logger.warning(f"Invalid user ID {chat_id}")
+                    return self._unreachable(chat_id, INVALID)
+                self.stats[FAILED] += 1
+                logger.error(f"❌ Send failed for {chat_id}: {e}")
+                return FAILED
+            except (TimedOut, NetworkError) as e:
+                self.stats["retried"] += 1
+                logger.warning(f"⚠️ Send to {chat_id} failed ({e}), retry {attempt + 1}/{self.retries}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                self.stats[FAILED] += 1
+                logger.error(f"❌ Send failed for {chat_id}: {e}")
+                return FAILED
+        self.stats[FAILED] += 1
+        return FAILED
+
+    def _unreachable(self, chat_id, outcome: str) -> str:
+        if self.on_unreachable is not None:
+            try:
+                self.on_unreachable(chat_id, outcome)
+            except Exception as e:
+                logger.error(f"❌ Error handling unreachable chat {chat_id}: {e}")
+        return outcome
+
+    async def send(self, chat_id, text: str, **kwargs) -> str:
+        return await self.deliver(chat_id, lambda bot: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+    async def edit(self, chat_id, message_id: int, text: str, **kwargs) -> str:
+        return await self.deliver(
+            chat_id, lambda bot: bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+        )
+
+    async def send_many(self, chat_ids: Iterable[Any], text: str, **kwargs) -> Counter:
+        """The same text to many chats with up to `workers` sends in flight; returns outcome counts"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        outcomes = Counter()
+
+        async def worker():
+            while True:
+                chat_id = await queue.get()
+                if chat_id is None:
+                    return
+                outcomes[await self.send(chat_id, text, **kwargs)] += 1
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            for chat_id in chat_ids:
+                if chat_id:
+                    await queue.put(chat_id)
+        finally:
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        return outcomes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.bucket.rate,
+            "per_chat_interval": self.per_chat_interval,
+            "workers": self.workers,
+            "sent": self.stats[SENT],
+            "blocked": self.stats[BLOCKED],
+            "invalid": self.stats[INVALID],
+            "failed": self.stats[FAILED],
+            "retried": self.stats["retried"],
+            "retry_after": self.stats["retry_after"],
+            "flood_wait_seconds": self.flood_wait_seconds,
+        }
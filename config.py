@@ -34,8 +34,9 @@ CONFIG = {
     "DATABASE_URL": os.getenv("DATABASE_URL", "sqlite:///./data/bot.db"),
     "USE_POSTGRESQL": bool(os.getenv("DATABASE_URL", "").startswith("postgresql")),
     # University API configuration
-    "UNIVERSITY_LOGIN_URL": "https://api.staging.sis.shamuniversity.com/portal",  # /portal for login
-    "UNIVERSITY_API_URL": "https://api.staging.sis.shamuniversity.com/graphql",  # /graphql for API
+    # Override both to point the bot at scripts/fake_university_server.py
+    "UNIVERSITY_LOGIN_URL": os.getenv("UNIVERSITY_LOGIN_URL", "https://api.staging.sis.shamuniversity.com/portal"),  # /portal for login
+    "UNIVERSITY_API_URL": os.getenv("UNIVERSITY_API_URL", "https://api.staging.sis.shamuniversity.com/graphql"),  # /graphql for API
     "UNIVERSITY_WEBSITE": "https://staging.sis.shamuniversity.com",
     "UNIVERSITY_NAME": "جامعة الشام",
     # Bot settings
@@ -46,7 +47,70 @@ CONFIG = {
     "GRADE_CHECK_INTERVAL": int(
         os.getenv("GRADE_CHECK_INTERVAL", "15")
     ),  # fallback if not set
+    # "spread": each user at a fixed offset inside the interval; "batch": everyone at once
+    "GRADE_CHECK_SCHEDULE": os.getenv("GRADE_CHECK_SCHEDULE", "spread"),
+    # Upper bound on grade checks started per second by the spread scheduler
+    "POLL_MAX_RATE": float(os.getenv("POLL_MAX_RATE", "5")),
+    # Adaptive per-user frequency: users waiting on grades use GRADE_CHECK_INTERVAL,
+    # these apply to users with no courses, a fully published term, or a long-settled one
+    "POLL_IDLE_MINUTES": float(os.getenv("POLL_IDLE_MINUTES", "60")),
+    "POLL_SETTLED_MINUTES": float(os.getenv("POLL_SETTLED_MINUTES", "360")),
+    "POLL_DORMANT_MINUTES": float(os.getenv("POLL_DORMANT_MINUTES", "1440")),
+    "POLL_HOT_WINDOW_HOURS": float(os.getenv("POLL_HOT_WINDOW_HOURS", "48")),
+    "POLL_DORMANT_AFTER_DAYS": float(os.getenv("POLL_DORMANT_AFTER_DAYS", "14")),
+    # A course published for one student bumps its other waiting students once per window
+    "POLL_PROPAGATION_COOLDOWN_MINUTES": float(os.getenv("POLL_PROPAGATION_COOLDOWN_MINUTES", "60")),
+    # Full-cycle poll pipeline (fetch -> parse -> diff -> persist): workers per stage (persist has one),
+    # items each stage queue may hold, and users read from the database per page
+    "POLL_FETCH_WORKERS": int(os.getenv("POLL_FETCH_WORKERS", os.getenv("UNIVERSITY_LIMIT_MAX", "50"))),
+    "POLL_PARSE_WORKERS": int(os.getenv("POLL_PARSE_WORKERS", "4")),
+    "POLL_DIFF_WORKERS": int(os.getenv("POLL_DIFF_WORKERS", "2")),
+    "POLL_QUEUE_SIZE": int(os.getenv("POLL_QUEUE_SIZE", "100")),
+    "POLL_USER_BATCH_SIZE": int(os.getenv("POLL_USER_BATCH_SIZE", "500")),
+    # Sharded polling across bot processes: 0 polls every user here; otherwise users are
+    # split into this many shards leased through the database (see bot.poll_shards)
+    "POLL_SHARD_COUNT": int(os.getenv("POLL_SHARD_COUNT", "0")),
+    "POLL_SHARD_LEASE_SECONDS": float(os.getenv("POLL_SHARD_LEASE_SECONDS", "60")),
+    "POLL_WORKER_ID": os.getenv("POLL_WORKER_ID"),  # defaults to hostname-pid
     # Notification settings
+    # Outgoing Telegram messages: global messages/s (Telegram allows about 30), minimum gap
+    # between messages to one chat, concurrent sends, and retries after timeouts
+    "TELEGRAM_GLOBAL_RATE": float(os.getenv("TELEGRAM_GLOBAL_RATE", "25")),
+    "TELEGRAM_PER_CHAT_INTERVAL_SECONDS": float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL_SECONDS", "1")),
+    "TELEGRAM_SEND_WORKERS": int(os.getenv("TELEGRAM_SEND_WORKERS", "16")),
+    "TELEGRAM_SEND_RETRIES": int(os.getenv("TELEGRAM_SEND_RETRIES", "3")),
+    # Background broadcast jobs: users per persisted page, seconds between admin progress edits
+    "BROADCAST_PAGE_SIZE": int(os.getenv("BROADCAST_PAGE_SIZE", "200")),
+    "BROADCAST_PROGRESS_SECONDS": float(os.getenv("BROADCAST_PROGRESS_SECONDS", "10")),
+    # How long a replica holds a broadcast job without saving progress before another takes it over
+    "BROADCAST_LEASE_SECONDS": float(os.getenv("BROADCAST_LEASE_SECONDS", "120")),
+    # Notification outbox: rows claimed per round, sends before giving up, seconds a claimed
+    # row stays hidden from other workers, and days delivered rows are kept
+    "OUTBOX_BATCH_SIZE": int(os.getenv("OUTBOX_BATCH_SIZE", "50")),
+    "OUTBOX_MAX_ATTEMPTS": int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+    "OUTBOX_LEASE_SECONDS": float(os.getenv("OUTBOX_LEASE_SECONDS", "300")),
+    "OUTBOX_RETENTION_DAYS": float(os.getenv("OUTBOX_RETENTION_DAYS", "7")),
+    # Default window (minutes) in which a user's grade changes are merged into one message; 0 sends at once
+    "NOTIFICATION_DIGEST_MINUTES": float(os.getenv("NOTIFICATION_DIGEST_MINUTES", "0")),
+    # Quote pool (data/quote_pool.json): hours between refreshes, quotes kept per category,
+    # fetch timeout, and the API Ninjas key for categorized quotes (empty: ZenQuotes only)
+    "QUOTE_POOL_REFRESH_HOURS": float(os.getenv("QUOTE_POOL_REFRESH_HOURS", "6")),
+    "QUOTE_POOL_PER_CATEGORY": int(os.getenv("QUOTE_POOL_PER_CATEGORY", "50")),
+    "QUOTE_POOL_FETCH_TIMEOUT_SECONDS": float(os.getenv("QUOTE_POOL_FETCH_TIMEOUT_SECONDS", "15")),
+    "QUOTES_API_NINJAS_KEY": os.getenv("QUOTES_API_NINJAS_KEY", ""),
+    # Arabic for pooled quotes: translations at once, total seconds per refresh,
+    # and hours before a quote whose translation failed is tried again
+    "QUOTE_POOL_TRANSLATE_CONCURRENCY": int(os.getenv("QUOTE_POOL_TRANSLATE_CONCURRENCY", "4")),
+    "QUOTE_POOL_TRANSLATE_BUDGET_SECONDS": float(os.getenv("QUOTE_POOL_TRANSLATE_BUDGET_SECONDS", "120")),
+    "QUOTE_POOL_TRANSLATE_RETRY_HOURS": float(os.getenv("QUOTE_POOL_TRANSLATE_RETRY_HOURS", "24")),
+    # Translations: cached entries kept in memory, worker threads, translations in flight,
+    # total seconds per translation, attempts within that budget, first retry delay (doubles, jittered)
+    "TRANSLATION_CACHE_SIZE": int(os.getenv("TRANSLATION_CACHE_SIZE", "2000")),
+    "TRANSLATION_WORKERS": int(os.getenv("TRANSLATION_WORKERS", "2")),
+    "TRANSLATION_MAX_PENDING": int(os.getenv("TRANSLATION_MAX_PENDING", "8")),
+    "TRANSLATION_BUDGET_SECONDS": float(os.getenv("TRANSLATION_BUDGET_SECONDS", "20")),
+    "TRANSLATION_MAX_ATTEMPTS": int(os.getenv("TRANSLATION_MAX_ATTEMPTS", "4")),
+    "TRANSLATION_BACKOFF_SECONDS": float(os.getenv("TRANSLATION_BACKOFF_SECONDS", "0.5")),
     # User experience settings
     "SHOW_LOADING_MESSAGES": True,
     "ENABLE_TYPING_INDICATOR": True,
@@ -88,7 +152,46 @@ CONFIG = {
     # Performance
     "MAX_CONCURRENT_REQUESTS": 10,
     "REQUEST_TIMEOUT_SECONDS": 30,
+    # Shared HTTP session for the university API (keep-alive pool)
+    "HTTP_POOL_SIZE": int(os.getenv("HTTP_POOL_SIZE", "100")),
+    "HTTP_POOL_PER_HOST": int(os.getenv("HTTP_POOL_PER_HOST", "20")),
+    "HTTP_KEEPALIVE_SECONDS": int(os.getenv("HTTP_KEEPALIVE_SECONDS", "30")),
+    "HTTP_DNS_CACHE_SECONDS": int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300")),
+    "HTTP_CONNECT_TIMEOUT_SECONDS": int(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10")),
     "CACHE_DURATION_MINUTES": 5,
+    # Adaptive concurrency (AIMD) and circuit breaker for the university API
+    "UNIVERSITY_LIMIT_MIN": int(os.getenv("UNIVERSITY_LIMIT_MIN", "2")),
+    "UNIVERSITY_LIMIT_MAX": int(os.getenv("UNIVERSITY_LIMIT_MAX", "50")),
+    "UNIVERSITY_LATENCY_TARGET_MS": int(os.getenv("UNIVERSITY_LATENCY_TARGET_MS", "2000")),
+    "UNIVERSITY_BREAKER_FAILURES": int(os.getenv("UNIVERSITY_BREAKER_FAILURES", "10")),
+    "UNIVERSITY_BREAKER_COOLDOWN_SECONDS": int(os.getenv("UNIVERSITY_BREAKER_COOLDOWN_SECONDS", "60")),
+    "UNIVERSITY_RETRIES": int(os.getenv("UNIVERSITY_RETRIES", "2")),
+    "UNIVERSITY_RETRY_BACKOFF_SECONDS": float(os.getenv("UNIVERSITY_RETRY_BACKOFF_SECONDS", "0.5")),
+    # A token seen working this recently is not re-checked with test_token
+    "TOKEN_VERIFY_STALE_MINUTES": float(os.getenv("TOKEN_VERIFY_STALE_MINUTES", "60")),
+    # Hours a rejected token is remembered, and responses in a row without a user
+    # (no auth error) before a token counts as rejected
+    "TOKEN_INVALID_TTL_HOURS": float(os.getenv("TOKEN_INVALID_TTL_HOURS", "24")),
+    "TOKEN_MISSING_USER_LIMIT": int(os.getenv("TOKEN_MISSING_USER_LIMIT", "3")),
+    # Grade HTML parsing off the event loop: "thread", "process" or "inline"
+    "PARSE_EXECUTOR": os.getenv("PARSE_EXECUTOR", "thread"),
+    "PARSE_WORKERS": int(os.getenv("PARSE_WORKERS", "2")),
+    "PARSE_MAX_PENDING": int(os.getenv("PARSE_MAX_PENDING", "32")),
+    # GraphQL query set: "minimal" (only parsed fields) or "full" (original documents)
+    "UNIVERSITY_QUERY_SET": os.getenv("UNIVERSITY_QUERY_SET", "minimal"),
+    # Automatic persisted queries: send a sha256 hash, full document only on a miss
+    "UNIVERSITY_APQ_ENABLED": os.getenv("UNIVERSITY_APQ_ENABLED", "false").lower() == "true",
+    # Grade polling: "combined" (one aliased request per user) or "legacy" (separate calls)
+    "UNIVERSITY_POLL_MODE": os.getenv("UNIVERSITY_POLL_MODE", "combined"),
+    # How long a user's term list is trusted before the homepage is refetched
+    "TERM_CACHE_TTL_HOURS": float(os.getenv("TERM_CACHE_TTL_HOURS", "24")),
+    # An empty current term page rechecks the term list (a new term may have opened) at most this often
+    "TERM_EMPTY_RECHECK_MINUTES": float(os.getenv("TERM_EMPTY_RECHECK_MINUTES", "60")),
+    # Cassettes: record anonymized raw grade pages, or serve them instead of the network
+    "CASSETTE_CAPTURE": os.getenv("CASSETTE_CAPTURE", "false").lower() == "true",
+    "CASSETTE_REPLAY": os.getenv("CASSETTE_REPLAY", "false").lower() == "true",
+    "CASSETTE_DIR": os.getenv("CASSETTE_DIR", os.path.join("data", "cassettes")),
+    "CASSETTE_SALT": os.getenv("CASSETTE_SALT", ""),
     # Development
     "DEBUG_MODE": False,
     "TEST_MODE": False,
@@ -1200,7 +1303,106 @@ query getPage($name: String!, $params: [PageParam!]) {
     __typename
   }
 }
-"""
+""",
+    # Minimal-field variants: extract_terms_from_homepage reads only
+    # panels.blocks.type and the nested config name/value/array tree
+    "GET_HOMEPAGE_MIN": """
+query getPage($name: String!, $params: [PageParam!]) {
+  getPage(name: $name, params: $params) {
+    panels {
+      blocks {
+        type
+        config {
+          name
+          array {
+            name
+            value
+            array {
+              name
+              value
+              array {
+                name
+                value
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+""",
+    # parse_grades_from_response reads only panels[0].blocks[].body
+    "GET_GRADES_MIN": """
+query getPage($name: String!, $params: [PageParam!]) {
+  getPage(name: $name, params: $params) {
+    panels {
+      blocks {
+        body
+      }
+    }
+  }
+}
+""",
+    # Combined poll: token check, identity and one term's grade page in one round-trip
+    "POLL_USER": """
+query pollUser($params: [PageParam!]) {
+  getGUI {
+    user {
+      id
+      username
+      fullname
+      firstname
+      lastname
+      email
+    }
+  }
+  grades: getPage(name: "test_student_tracks", params: $params) {
+    panels {
+      blocks {
+        body
+      }
+    }
+  }
+}
+""",
+    # Combined poll for users without a cached term list: identity plus homepage
+    "POLL_USER_HOMEPAGE": """
+query pollUserHomepage {
+  getGUI {
+    user {
+      id
+      username
+      fullname
+      firstname
+      lastname
+      email
+    }
+  }
+  homepage: getPage(name: "homepage", params: []) {
+    panels {
+      blocks {
+        type
+        config {
+          name
+          array {
+            name
+            value
+            array {
+              name
+              value
+              array {
+                name
+                value
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+""",
 }
 
 # Message templates
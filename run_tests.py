@@ -30,7 +30,7 @@ def run_pytest_tests():
     env["BOT_VERSION"] = validated_version
 
     # Run pytest on all test directories
-    test_dirs = ["tests/storage", "tests/security", "tests/api"]
+    test_dirs = ["tests/storage", "tests/security", "tests/api", "tests/bot"]
 
     all_passed = True
     for test_dir in test_dirs:
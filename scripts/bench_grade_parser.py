@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Grade Parser Benchmark
+Compares the BeautifulSoup html.parser table extraction against the single-pass
+GradeTableParser on generated Arabic grade pages shaped like the SIS output.
+
+Reports rows/sec and peak allocated memory (tracemalloc) per backend.
+
+With --cassette the pages come from a recorded cassette directory (see
+CASSETTE_CAPTURE) instead of the generator.
+
+Usage:
+    python scripts/bench_grade_parser.py [--pages 300] [--courses 8] [--cassette data/cassettes]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from university.cassette import CassetteStore
+from university.grade_parser import extract_tables, extract_tables_bs4
+
+COURSES = [
+    ("الرياضيات المتقطعة", "MATH201"), ("البرمجة المتقدمة", "CS202"), ("قواعد البيانات", "CS305"),
+    ("اللغة العربية (1)", "ARAB101"), ("الفيزياء العامة", "PHYS101"), ("الشبكات الحاسوبية", "CS310"),
+    ("نظم التشغيل", "CS320"), ("الإحصاء والاحتمالات", "STAT201"), ("اللغة الإنجليزية", "ENG102"),
+]
+HEADER = "<thead><tr><th>المقرر</th><th>الرمز</th><th>رصيد ECTS</th><th>الأعمال</th><th>النظري</th><th>الدرجة</th></tr></thead>"
+
+
+def make_page(rng: random.Random, courses: int) -> str:
+    rows = []
+    for name, code in rng.sample(COURSES * 3, courses):
+        published = rng.random() < 0.6
+        coursework = f"{rng.randint(10, 30)} / 30" if published else "<span>لم يتم النشر</span>"
+        final_exam = f"{rng.randint(20, 70)} / 70" if published else ""
+        total = f"{rng.randint(50, 100)} %" if published else "لم يتم النشر"
+        rows.append(
+            f'<tr class="course-row"><td class="text-right">{name}</td><td>{code}</td><td>{rng.randint(2, 6)}</td>'
+            f"<td>{coursework}</td><td>{final_exam}</td><td><b>{total}</b></td></tr>"
+        )
+    rows.append("<tr><td>Term summary</td><td>2</td><td>30</td><td></td><td></td><td></td></tr>")
+    return (
+        '<div class="table-responsive"><table class="table table-bordered table-striped">'
+        f"{HEADER}<tbody>{''.join(rows)}</tbody></table></div>"
+    )
+
+
+def recorded_pages(directory: str):
+    """Grade HTML bodies from a cassette store"""
+    return [
+        block["body"]
+        for payload in CassetteStore(directory).iter_payloads("term_page")
+        for panel in payload.get("panels") or []
+        for block in panel.get("blocks") or []
+        if block.get("body")
+    ]
+
+
+def measure(extract, pages):
+    start = time.perf_counter()
+    rows = sum(len(table) for page in pages for table in extract(page))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for page in pages[:50]:
+        extract(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--courses", type=int, default=8)
+    parser.add_argument("--cassette", help="benchmark recorded pages from this cassette directory")
+    args = parser.parse_args()
+
+    if args.cassette:
+        pages = recorded_pages(args.cassette)
+        if not pages:
+            sys.exit(f"❌ No recorded grade pages in {args.cassette}")
+    else:
+        rng = random.Random(42)
+        pages = [make_page(rng, args.courses) for _ in range(args.pages)]
+    assert all(extract_tables(page) == extract_tables_bs4(page) for page in pages)
+
+    print("🏁 Grade parser benchmark")
+    print("=" * 50)
+    if args.cassette:
+        print(f"Pages: {len(pages)} recorded in {args.cassette}")
+    else:
+        print(f"Pages: {args.pages}, courses per page: {args.courses}")
+    results = {}
+    for label, extract in (("BeautifulSoup", extract_tables_bs4), ("GradeTableParser", extract_tables)):
+        rows, elapsed, peak = measure(extract, pages)
+        results[label] = elapsed
+        print(f"{label:<17} {rows / elapsed:10.0f} rows/s   peak {peak / 1024:8.1f} KiB")
+    print(f"📈 Speed-up: x{results['BeautifulSoup'] / results['GradeTableParser']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Grade Record Benchmark
+Compares the typed Grade record with the dict rows it replaced: memory held
+by N grades (tracemalloc) and the cost of diffing a poll against stored rows.
+
+The dict diff is the previous bot flow: map storage keys onto parser keys,
+then rebuild the relevant fields of both sides for every comparison.
+
+Usage:
+    python scripts/bench_grade_record.py [--grades 10000] [--rounds 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from university.grade_parser import get_grade_status
+from university.grade_record import Grade
+
+
+def make_cells(rng: random.Random, index: int):
+    published = rng.random() < 0.7
+    return {
+        "name": f"مقرر {index}",
+        "code": f"C{index:05d}",
+        "ects": str(rng.randint(2, 6)),
+        "coursework": str(rng.randint(10, 30)) if published else "لم يتم النشر",
+        "final_exam": str(rng.randint(20, 70)) if published else "لم يتم النشر",
+        "total": f"{rng.randint(50, 100)} %" if published else "لم يتم النشر",
+        "term_name": "الفصل الثاني 2024-2025",
+        "term_id": "10459",
+    }
+
+
+def as_dict(cells, index):
+    return {"block": 1, "table": 1, "row": index, **cells, "grade_status": get_grade_status(cells["total"])}
+
+
+def as_stored_dict(cells):
+    return {
+        "course_name": cells["name"], "course_code": cells["code"], "ects_credits": float(cells["ects"]),
+        "coursework_grade": cells["coursework"], "final_exam_grade": cells["final_exam"],
+        "total_grade_value": cells["total"], "numeric_grade": None, "grade_status": get_grade_status(cells["total"]),
+        "term_name": cells["term_name"], "created_at": None,
+    }
+
+
+def diff_dicts(stored, fresh):
+    def relevant(grade):
+        return {
+            "code": grade.get("code") or grade.get("name"),
+            "total": grade.get("total"),
+            "coursework": grade.get("coursework"),
+            "final_exam": grade.get("final_exam"),
+        }
+    old = [
+        {"name": g.get("course_name"), "code": g.get("course_code"), "coursework": g.get("coursework_grade"),
+         "final_exam": g.get("final_exam_grade"), "total": g.get("total_grade_value")}
+        for g in stored
+    ]
+    old_map = {g.get("code") or g.get("name"): relevant(g) for g in old if g.get("code") or g.get("name")}
+    return [g for g in fresh if (g.get("code") or g.get("name")) and old_map.get(g.get("code") or g.get("name")) != relevant(g)]
+
+
+def diff_records(stored, fresh):
+    old_keys = {g.key: g.compare_key for g in stored if g.key}
+    return [g for g in fresh if g.key and old_keys.get(g.key) != g.compare_key]
+
+
+def held_bytes(build):
+    tracemalloc.start()
+    items = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grades", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    cells = [make_cells(rng, i) for i in range(args.grades)]
+    changed = set(rng.sample(range(args.grades), args.grades // 20))
+    fresh_cells = [{**c, "total": "101 %"} if i in changed else c for i, c in enumerate(cells)]
+
+    dict_bytes = held_bytes(lambda: [as_dict(c, i) for i, c in enumerate(cells)])
+    record_bytes = held_bytes(lambda: [Grade(**c, block=1, table=1, row=i) for i, c in enumerate(cells)])
+
+    stored_dicts = [as_stored_dict(c) for c in cells]
+    fresh_dicts = [as_dict(c, i) for i, c in enumerate(fresh_cells)]
+    stored_records = [Grade(**c) for c in cells]
+    fresh_records = [Grade(**c) for c in fresh_cells]
+    dict_time, dict_changed = timed(lambda: diff_dicts(stored_dicts, fresh_dicts), args.rounds)
+    record_time, record_changed = timed(lambda: diff_records(stored_records, fresh_records), args.rounds)
+    assert len(dict_changed) == len(record_changed) == len(changed)
+
+    print("🏁 Grade record benchmark")
+    print("=" * 50)
+    print(f"Grades: {args.grades}, changed in poll: {len(changed)}")
+    print(f"{'dict':<8} {dict_bytes / 1024:10.1f} KiB held   diff {dict_time * 1000:8.2f} ms")
+    print(f"{'Grade':<8} {record_bytes / 1024:10.1f} KiB held   diff {record_time * 1000:8.2f} ms")
+    print(f"📉 Memory x{dict_bytes / record_bytes:.2f} smaller, diff x{dict_time / record_time:.2f} faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+HTTP Session Benchmark
+Compares a new aiohttp.ClientSession per request (old behaviour) against the
+shared, pooled session of UniversityAPIV2, using a local stand-in GraphQL server.
+
+The stand-in server speaks plain HTTP on localhost, so the numbers only show
+the TCP/session setup saved per call; against the real SIS every avoided
+connection also saves a TLS handshake and a DNS lookup.
+
+Usage:
+    python scripts/bench_http_session.py [--requests 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import UNIVERSITY_QUERIES
+from university.api_client_v2 import UniversityAPIV2
+
+GUI_RESPONSE = {"data": {"getGUI": {"user": {"id": "1", "username": "ENG2425041", "name": "طالب"}}}}
+
+
+async def handle_graphql(request):
+    await request.json()
+    return web.json_response(GUI_RESPONSE)
+
+
+async def start_server(port: int):
+    app = web.Application()
+    app.router.add_post("/graphql", handle_graphql)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    return runner
+
+
+async def run_per_call_sessions(url: str, total: int, concurrency: int) -> float:
+    """Old behaviour: open and tear down a ClientSession for every request"""
+    api = UniversityAPIV2()
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = {"query": UNIVERSITY_QUERIES["TEST_TOKEN"]}
+    headers = {**api.api_headers, "Authorization": "Bearer bench"}
+
+    async def one():
+        async with semaphore:
+            async with aiohttp.ClientSession(timeout=api.timeout) as session:
+                async with session.post(url, headers=headers, json=payload) as response:
+                    await response.json()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_shared_session(url: str, total: int, concurrency: int) -> float:
+    """New behaviour: every call reuses the pooled session"""
+    api = UniversityAPIV2()
+    api.api_url = url
+    await api.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await api.test_token("bench")
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+    finally:
+        await api.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}/graphql"
+    runner = await start_server(args.port)
+    try:
+        print("🏁 HTTP session benchmark")
+        print("=" * 50)
+        print(f"Requests: {args.requests}, concurrency: {args.concurrency}")
+        before = await run_per_call_sessions(url, args.requests, args.concurrency)
+        after = await run_shared_session(url, args.requests, args.concurrency)
+        print(f"❌ Session per call: {args.requests / before:8.1f} req/s ({before:.2f}s)")
+        print(f"✅ Shared session:   {args.requests / after:8.1f} req/s ({after:.2f}s)")
+        print(f"📈 Speed-up: x{before / after:.2f}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
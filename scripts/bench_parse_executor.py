@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Parse Executor Benchmark
+Parses a batch of grade pages concurrently, the way a poll cycle does, while a
+ticker task measures event-loop lag (a stand-in for webhook latency).
+
+Usage:
+    python scripts/bench_parse_executor.py [--pages 400] [--workers 2]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scripts.bench_grade_parser import make_page
+from university.grade_parser import parse_grade_page
+from university.parse_executor import ParseExecutor
+
+TICK_SECONDS = 0.005
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def run(kind: str, pages, workers: int):
+    executor = ParseExecutor(kind=kind, workers=workers, max_pending=workers * 2)
+    # Warm the pool so process start-up is not counted
+    await executor.run(parse_grade_page, pages[0])
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(executor.run(parse_grade_page, page) for page in pages))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    executor.shutdown()
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    return elapsed, statistics.median(lags) if lags else 0.0, p99, max(lags, default=0.0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--courses", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pages = [{"panels": [{"blocks": [{"body": make_page(rng, args.courses)}]}]} for _ in range(args.pages)]
+
+    print("🏁 Parse executor benchmark")
+    print("=" * 50)
+    print(f"Pages: {args.pages}, workers: {args.workers}")
+    for kind in ("inline", "thread", "process"):
+        elapsed, median, p99, worst = await run(kind, pages, args.workers)
+        print(
+            f"{kind:<8} total {elapsed:6.2f}s   loop lag median {median * 1000:6.1f} ms"
+            f"   p99 {p99 * 1000:6.1f} ms   max {worst * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    # Per-block parse logs would dominate the timings
+    logging.disable(logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Poll Throughput Benchmark
+Runs full poll cycles of UniversityAPIV2.poll_user for N synthetic students
+against the in-process fake university server, with no network access needed.
+
+The first cycle is cold (term lists unknown); later cycles are the steady state
+with cached term lists and page digests.
+
+Usage:
+    python scripts/bench_poll_throughput.py [--users 10000] [--cycles 3]
+        [--latency-ms 20] [--error-rate 0] [--change-rate 0.01]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scripts.fake_university_server import UNIVERSITY_KEY, create_app, token_for
+from university.api_client_v2 import UniversityAPIV2
+
+
+async def poll_cycle(api: UniversityAPIV2, users: int, digests: dict, max_tasks: int):
+    semaphore = asyncio.Semaphore(max_tasks)
+    counts = {"ok": 0, "unchanged": 0, "failed": 0}
+
+    async def poll(index: int):
+        async with semaphore:
+            result = await api.poll_user(token_for(index), index, digests.get(index))
+        if not result or not result.get("token_valid"):
+            counts["failed"] += 1
+            return
+        if result.get("unchanged"):
+            counts["unchanged"] += 1
+        elif result.get("page_digest"):
+            digests[index] = {result["term_id"]: result["page_digest"]}
+        counts["ok"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(poll(index) for index in range(users)))
+    return time.perf_counter() - start, counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    app = create_app(
+        students=args.users, latency_ms=args.latency_ms,
+        error_rate=args.error_rate, change_rate=args.change_rate,
+    )
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    api = UniversityAPIV2()
+    api.api_url = f"http://127.0.0.1:{args.port}/graphql"
+    api.login_url = f"http://127.0.0.1:{args.port}/portal"
+    api.retry_backoff = 0.05
+    digests: dict = {}
+    try:
+        print("🏁 Poll throughput benchmark (fake university)")
+        print("=" * 60)
+        print(f"Users: {args.users}, server latency: {args.latency_ms} ms, change rate: {args.change_rate}")
+        for cycle in range(1, args.cycles + 1):
+            before = sum(app[UNIVERSITY_KEY].requests.values())
+            elapsed, counts = await poll_cycle(api, args.users, digests, api.limiter.maximum)
+            requests = sum(app[UNIVERSITY_KEY].requests.values()) - before
+            limiter = api.limiter.get_stats()
+            print(
+                f"cycle {cycle}: {args.users / elapsed:8.1f} users/s  {elapsed:6.2f}s  "
+                f"{requests / args.users:4.2f} req/user  unchanged {counts['unchanged']:>6}  "
+                f"failed {counts['failed']:>4}  limit {limiter['limit']}"
+            )
+    finally:
+        await api.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    # Per-user parse logs would dominate the timings
+    logging.disable(logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+GraphQL Query Size Measurement
+Shows request body sizes for the full, minimal and persisted-query (APQ)
+documents, and the bytes one poll cycle sends at a given user count.
+
+With --token the script also runs one real poll against the SIS with each
+query set and reports the response sizes and time spent per operation.
+
+Usage:
+    python scripts/bench_query_sizes.py [--users 500] [--terms 1]
+    python scripts/bench_query_sizes.py --token <university token>
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import UNIVERSITY_QUERIES
+from university.api_client_v2 import MINIMAL_QUERIES, UniversityAPIV2
+
+GRADES_VARIABLES = {"name": "test_student_tracks", "params": [{"name": "t_grade_id", "value": "10459"}]}
+HOMEPAGE_VARIABLES = {"name": "homepage", "params": []}
+
+
+def body_size(payload: dict) -> int:
+    return len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+def request_sizes(name: str, variables: dict) -> dict:
+    """Request body bytes for one operation in every mode"""
+    full = UNIVERSITY_QUERIES[name]
+    minimal = UNIVERSITY_QUERIES[MINIMAL_QUERIES[name]]
+    query_hash = hashlib.sha256(minimal.encode("utf-8")).hexdigest()
+    persisted = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+    return {
+        "full": body_size({"operationName": "getPage", "variables": variables, "query": full}),
+        "minimal": body_size({"operationName": "getPage", "variables": variables, "query": minimal}),
+        "apq": body_size({"operationName": "getPage", "variables": variables, "extensions": persisted}),
+    }
+
+
+def print_offline(users: int, terms: int):
+    homepage = request_sizes("GET_HOMEPAGE", HOMEPAGE_VARIABLES)
+    grades = request_sizes("GET_GRADES", GRADES_VARIABLES)
+    print("📦 Request body sizes (bytes)")
+    print("=" * 50)
+    print(f"{'operation':<12}{'full':>10}{'minimal':>10}{'apq':>10}")
+    print(f"{'homepage':<12}{homepage['full']:>10}{homepage['minimal']:>10}{homepage['apq']:>10}")
+    print(f"{'term_page':<12}{grades['full']:>10}{grades['minimal']:>10}{grades['apq']:>10}")
+    print()
+    # A steady-state poll reads only term pages (the term catalog is cached)
+    print(f"📤 Sent per poll cycle: {users} users x {terms} term page(s)")
+    for mode in ("full", "minimal", "apq"):
+        total = grades[mode] * users * terms
+        print(f"   {mode:<8} {total / 1024:10.1f} KiB")
+
+
+async def live_poll(token: str, query_set: str) -> dict:
+    api = UniversityAPIV2()
+    api.query_set = query_set
+    try:
+        terms = await api.get_terms(token)
+        if terms:
+            await api.get_term_grades(token, terms[0][1])
+        return api.get_transfer_stats()
+    finally:
+        await api.close()
+
+
+async def print_live(token: str):
+    print()
+    print("🌐 Live poll against the SIS")
+    print("=" * 50)
+    for query_set in ("full", "minimal"):
+        stats = await live_poll(token, query_set)
+        for operation, numbers in stats.items():
+            print(
+                f"{query_set:<8}{operation:<12}"
+                f"sent {numbers['bytes_sent']:>7} B  "
+                f"received {numbers['bytes_received']:>8} B  "
+                f"{numbers['seconds'] * 1000:7.0f} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--terms", type=int, default=1)
+    parser.add_argument("--token", help="university token for a live measurement")
+    args = parser.parse_args()
+
+    print_offline(args.users, args.terms)
+    if args.token:
+        asyncio.run(print_live(args.token))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Fake University GraphQL Server
+aiohttp stand-in for the SIS API: signinUser on /portal, getGUI and
+getPage(homepage | test_student_tracks) on /graphql, including the combined
+pollUser documents and automatic persisted queries.
+
+Students are synthetic: username ENG<n> (n zero-padded to 8 digits), password
+"password", token "fake-token-<n>". Grade pages are deterministic per student,
+so repeated polls return byte-identical HTML unless --change-rate flips a grade.
+
+Point the bot or a benchmark at it with:
+    UNIVERSITY_LOGIN_URL=http://127.0.0.1:8080/portal
+    UNIVERSITY_API_URL=http://127.0.0.1:8080/graphql
+
+Usage:
+    python scripts/fake_university_server.py [--port 8080] [--students 10000]
+        [--latency-ms 50] [--jitter-ms 20] [--error-rate 0.01] [--change-rate 0]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from typing import Any, Dict, Optional, Tuple
+
+from aiohttp import web
+
+PASSWORD = "password"
+TERMS = [("الفصل الثاني 2024-2025", "10459"), ("الفصل الأول 2024-2025", "10458")]
+COURSES = [
+    ("الرياضيات المتقطعة", "MATH201"), ("البرمجة المتقدمة", "CS202"), ("قواعد البيانات", "CS305"),
+    ("اللغة العربية (1)", "ARAB101"), ("الفيزياء العامة", "PHYS101"), ("الشبكات الحاسوبية", "CS310"),
+    ("نظم التشغيل", "CS320"), ("الإحصاء والاحتمالات", "STAT201"), ("اللغة الإنجليزية", "ENG102"),
+    ("هندسة البرمجيات", "CS330"), ("الذكاء الاصطناعي", "CS340"), ("التحليل العددي", "MATH310"),
+]
+HEADER = (
+    "<thead><tr><th>المقرر</th><th>الرمز</th><th>رصيد ECTS</th>"
+    "<th>الأعمال</th><th>النظري</th><th>الدرجة</th></tr></thead>"
+)
+
+
+UNIVERSITY_KEY = web.AppKey("university", object)
+
+
+def username_for(index: int) -> str:
+    return f"ENG{index:08d}"
+
+
+def token_for(index: int) -> str:
+    return f"fake-token-{index}"
+
+
+class FakeUniversity:
+    """Synthetic students, their grade pages and the fault-injection knobs"""
+
+    def __init__(
+        self,
+        students: int = 1000,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        change_rate: float = 0.0,
+        courses_per_term: int = 6,
+        seed: int = 0,
+    ):
+        self.students = students
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.change_rate = change_rate
+        self.courses_per_term = courses_per_term
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.revoked: set = set()
+        self.persisted: Dict[str, str] = {}
+        # Grade revisions bumped by change_rate, so changes persist across polls
+        self.revisions: Dict[Tuple[int, str], int] = {}
+        self.requests: Dict[str, int] = {}
+
+    # ----- students -------------------------------------------------------
+
+    def student_for_token(self, header: Optional[str]) -> Optional[int]:
+        if not header or not header.startswith("Bearer fake-token-"):
+            return None
+        try:
+            index = int(header[len("Bearer fake-token-"):])
+        except ValueError:
+            return None
+        if not 0 <= index < self.students or index in self.revoked:
+            return None
+        return index
+
+    def user_info(self, index: int) -> Dict[str, Any]:
+        return {
+            "id": str(index),
+            "username": username_for(index),
+            "name": f"طالب {index}",
+            "fullname": f"طالب تجريبي {index}",
+            "firstname": "طالب",
+            "lastname": str(index),
+            "email": f"{username_for(index).lower()}@example.edu",
+        }
+
+    def grades_html(self, index: int, term_id: str) -> str:
+        revision = self.revisions.get((index, term_id), 0)
+        rng = random.Random(f"{self.seed}:{index}:{term_id}:{revision}")
+        rows = []
+        for name, code in rng.sample(COURSES, self.courses_per_term):
+            published = rng.random() < 0.7
+            coursework = f"{rng.randint(10, 30)}" if published else "لم يتم النشر"
+            final_exam = f"{rng.randint(20, 70)}" if published else "لم يتم النشر"
+            total = f"{rng.randint(50, 100)} %" if published else "لم يتم النشر"
+            rows.append(
+                f"<tr><td>{name}</td><td>{code}</td><td>{rng.randint(2, 6)}</td>"
+                f"<td>{coursework}</td><td>{final_exam}</td><td>{total}</td></tr>"
+            )
+        return (
+            '<div class="table-responsive"><table class="table table-bordered">'
+            f"{HEADER}<tbody>{''.join(rows)}</tbody></table></div>"
+        )
+
+    def homepage(self) -> Dict[str, Any]:
+        tabs = [
+            {"name": None, "value": None, "array": [
+                {"name": "label", "value": term_name, "array": None},
+                {"name": "page_params", "value": None, "array": [{"name": "t_grade_id", "value": term_id}]},
+            ]}
+            for term_name, term_id in TERMS
+        ]
+        return {"panels": [{"blocks": [{"type": "tabs", "config": [{"name": "tabs", "value": None, "array": tabs}]}]}]}
+
+    def grades_page(self, index: int, term_id: str) -> Dict[str, Any]:
+        if self.change_rate and self.rng.random() < self.change_rate:
+            self.revisions[(index, term_id)] = self.revisions.get((index, term_id), 0) + 1
+        return {"panels": [{"blocks": [{"body": self.grades_html(index, term_id)}]}]}
+
+    # ----- request handling -----------------------------------------------
+
+    async def _delay(self):
+        delay = self.latency_ms + (self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _count(self, operation: str):
+        self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def _resolve_query(self, payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return (query, error_response) honouring automatic persisted queries"""
+        query = payload.get("query")
+        persisted = (payload.get("extensions") or {}).get("persistedQuery")
+        if not persisted:
+            return query, None
+        query_hash = persisted.get("sha256Hash")
+        if query:
+            if hashlib.sha256(query.encode("utf-8")).hexdigest() != query_hash:
+                return None, {"errors": [{"message": "provided sha does not match query"}]}
+            self.persisted[query_hash] = query
+            return query, None
+        if query_hash not in self.persisted:
+            return None, {"errors": [{"message": "PersistedQueryNotFound"}]}
+        return self.persisted[query_hash], None
+
+    async def handle_portal(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payload = await request.json()
+        self._count("login")
+        variables = payload.get("variables") or {}
+        username = str(variables.get("username", ""))
+        if variables.get("password") == PASSWORD and username.startswith("ENG"):
+            try:
+                index = int(username[3:])
+            except ValueError:
+                index = -1
+            if 0 <= index < self.students:
+                self.revoked.discard(index)
+                return web.json_response({"data": {"login": token_for(index)}})
+        return web.json_response({"data": {"login": None}, "errors": [{"message": "Invalid credentials"}]})
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        await self._delay()
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self._count("error")
+            return web.Response(status=503, text="Service Unavailable")
+
+        payload = await request.json()
+        query, error = self._resolve_query(payload)
+        if error:
+            return web.json_response(error)
+
+        index = self.student_for_token(request.headers.get("Authorization"))
+        operation = payload.get("operationName") or ("getGUI" if "getGUI" in (query or "") else "unknown")
+        self._count(operation)
+        if index is None:
+            return web.json_response(
+                {"data": {"getGUI": None}, "errors": [{"message": "Unauthorized", "extensions": {"code": "UNAUTHENTICATED"}}]}
+            )
+
+        data: Dict[str, Any] = {}
+        variables = payload.get("variables") or {}
+        if "getGUI" in (query or ""):
+            data["getGUI"] = {"user": self.user_info(index)}
+        if operation == "pollUser":
+            data["grades"] = self.grades_page(index, self._term_param(variables))
+        elif operation == "pollUserHomepage":
+            data["homepage"] = self.homepage()
+        elif operation == "getPage":
+            if variables.get("name") == "homepage":
+                data["getPage"] = self.homepage()
+            else:
+                data["getPage"] = self.grades_page(index, self._term_param(variables))
+        return web.json_response(data={"data": data}, dumps=lambda obj: json.dumps(obj, ensure_ascii=False))
+
+    @staticmethod
+    def _term_param(variables: Dict[str, Any]) -> str:
+        for param in variables.get("params") or []:
+            if param.get("name") == "t_grade_id":
+                return str(param.get("value"))
+        return TERMS[0][1]
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"students": self.students, "requests": self.requests})
+
+
+def create_app(university: Optional[FakeUniversity] = None, **options) -> web.Application:
+    """Build the aiohttp app; options are passed to FakeUniversity"""
+    university = university or FakeUniversity(**options)
+    app = web.Application()
+    app[UNIVERSITY_KEY] = university
+    app.router.add_post("/portal", university.handle_portal)
+    app.router.add_post("/graphql", university.handle_graphql)
+    app.router.add_get("/stats", university.handle_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--change-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(
+        students=args.students,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        change_rate=args.change_rate,
+        seed=args.seed,
+    )
+    print(f"🎓 Fake university on http://{args.host}:{args.port} ({args.students} students)")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
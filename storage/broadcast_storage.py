@@ -0,0 +1,232 @@
+"""
+📢 Broadcast Job Storage
+Persisted fan-out jobs, so a broadcast survives restarts and resumes from its cursor
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, Index, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from storage.user_storage_v2 import Base
+from storage.grade_storage_v2 import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# pending -> running -> done (or cancelled)
+ACTIVE_STATES = ("pending", "running")
+JOB_FIELDS = (
+    "id", "kind", "message", "parse_mode", "status", "cursor", "total", "sent", "failed", "blocked",
+    "admin_chat_id", "status_message_id", "owner", "lease_expires_at", "dedup_key", "created_at", "updated_at",
+    "finished_at",
+)
+
+
+class BroadcastJob(Base):
+    """
+    One message to every active user; cursor is the last users.id handled.
+    The process sending it holds a lease (owner, lease_expires_at), renewed
+    with every page, so replicas never send the same job at once. Jobs that
+    every replica queues on a schedule carry a dedup_key, so only one is kept.
+    """
+
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False, default="broadcast")
+    message = Column(Text, nullable=False)
+    parse_mode = Column(String(20), nullable=True)
+    status = Column(String(20), nullable=False, default="pending")
+    cursor = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    blocked = Column(Integer, nullable=False, default=0)
+    admin_chat_id = Column(BigInteger, nullable=True)
+    status_message_id = Column(BigInteger, nullable=True)
+    owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    dedup_key = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_broadcast_job_status', 'status'),
+        Index('idx_broadcast_job_dedup', 'dedup_key', unique=True),
+    )
+
+
+def _job_dict(job: BroadcastJob) -> Dict[str, Any]:
+    return {field: getattr(job, field) for field in JOB_FIELDS}
+
+
+class BroadcastStorage:
+    """Broadcast jobs and their progress"""
+
+    def __init__(self, database_url: str):
+        self.db_manager = DatabaseManager(database_url)
+        self.db_manager.create_tables()
+        logger.info("✅ BroadcastStorage initialized")
+
+    def create_job(
+        self,
+        message: str,
+        total: int,
+        kind: str = "broadcast",
+        parse_mode: Optional[str] = None,
+        admin_chat_id: Optional[int] = None,
+        status_message_id: Optional[int] = None,
+        dedup_key: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Queue a broadcast; returns its id. With a dedup_key, a job already queued
+        under that key (by this or another replica) wins and None is returned.
+        """
+        try:
+            with self.db_manager.get_session() as session:
+                if dedup_key is not None and session.query(BroadcastJob.id).filter_by(dedup_key=dedup_key).first():
+                    logger.info(f"📢 Broadcast {dedup_key} already queued")
+                    return None
+                job = BroadcastJob(
+                    kind=kind,
+                    message=message,
+                    parse_mode=parse_mode,
+                    total=total,
+                    admin_chat_id=admin_chat_id,
+                    status_message_id=status_message_id,
+                    dedup_key=dedup_key,
+                )
+                session.add(job)
+                session.flush()
+                logger.info(f"✅ Broadcast job {job.id} queued for {total} users")
+                return job.id
+        except IntegrityError:
+            # Another replica inserted the same key between the check and the insert
+            logger.info(f"📢 Broadcast {dedup_key} already queued")
+            return None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error creating broadcast job: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error creating broadcast job: {e}")
+            return None
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            with self.db_manager.get_session() as session:
+                job = session.get(BroadcastJob, job_id)
+                return _job_dict(job) if job else None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting broadcast job {job_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error getting broadcast job {job_id}: {e}")
+            return None
+
+    def get_active_jobs(self) -> List[Dict[str, Any]]:
+        """Pending and interrupted jobs, oldest first"""
+        try:
+            with self.db_manager.get_session() as session:
+                jobs = (
+                    session.query(BroadcastJob)
+                    .filter(BroadcastJob.status.in_(ACTIVE_STATES))
+                    .order_by(BroadcastJob.id)
+                    .all()
+                )
+                return [_job_dict(job) for job in jobs]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting active broadcast jobs: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error getting active broadcast jobs: {e}")
+            return []
+
+    def claim_job(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        The oldest active job that is free, or whose lease ran out (its sender
+        died), leased to worker_id. The claim is a conditional UPDATE, so two
+        workers never win the same job. None when there is nothing to send.
+        """
+        now = datetime.utcnow()
+        claimable = or_(
+            BroadcastJob.owner.is_(None), BroadcastJob.owner == worker_id, BroadcastJob.lease_expires_at < now
+        )
+        try:
+            with self.db_manager.get_session() as session:
+                candidates = [
+                    job_id for (job_id,) in session.query(BroadcastJob.id)
+                    .filter(BroadcastJob.status.in_(ACTIVE_STATES), claimable)
+                    .order_by(BroadcastJob.id)
+                ]
+                for job_id in candidates:
+                    claimed = session.query(BroadcastJob).filter(
+                        BroadcastJob.id == job_id, BroadcastJob.status.in_(ACTIVE_STATES), claimable
+                    ).update({
+                        "owner": worker_id,
+                        "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                        "status": "running",
+                        "updated_at": now,
+                    }, synchronize_session=False)
+                    if claimed:
+                        return _job_dict(session.get(BroadcastJob, job_id))
+                return None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error claiming a broadcast job for {worker_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error claiming a broadcast job for {worker_id}: {e}")
+            return None
+
+    def record_progress(
+        self, job_id: int, cursor: int, sent: int, failed: int, blocked: int,
+        worker_id: Optional[str] = None, lease_seconds: Optional[float] = None,
+    ) -> bool:
+        """
+        Advance the cursor past a finished page and add its counts, in one
+        transaction. With worker_id, only while that worker holds the job; its
+        lease is renewed for lease_seconds. False when the lease was lost.
+        """
+        now = datetime.utcnow()
+        try:
+            with self.db_manager.get_session() as session:
+                query = session.query(BroadcastJob).filter(BroadcastJob.id == job_id)
+                if worker_id is not None:
+                    query = query.filter(BroadcastJob.owner == worker_id)
+                values = {
+                    "status": "running",
+                    "cursor": cursor,
+                    "sent": BroadcastJob.sent + sent,
+                    "failed": BroadcastJob.failed + failed,
+                    "blocked": BroadcastJob.blocked + blocked,
+                    "updated_at": now,
+                }
+                if lease_seconds is not None:
+                    values["lease_expires_at"] = now + timedelta(seconds=lease_seconds)
+                return bool(query.update(values, synchronize_session=False))
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving broadcast job {job_id} progress: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving broadcast job {job_id} progress: {e}")
+            return False
+
+    def finish_job(self, job_id: int, status: str = "done") -> bool:
+        try:
+            with self.db_manager.get_session() as session:
+                job = session.get(BroadcastJob, job_id)
+                if job is None:
+                    return False
+                job.status = status
+                job.owner = job.lease_expires_at = None
+                job.updated_at = job.finished_at = datetime.utcnow()
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error finishing broadcast job {job_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error finishing broadcast job {job_id}: {e}")
+            return False
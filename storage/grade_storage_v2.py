@@ -3,23 +3,25 @@
 Handles grade data storage with PostgreSQL
 """
 
+import json
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
 from decimal import Decimal
-import re
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Index, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Index, ForeignKey, Numeric, UniqueConstraint, Text, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import create_engine, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
 # Import User model from user_storage_v2 to use the same Base
-from storage.user_storage_v2 import Base, User
+from storage.user_storage_v2 import Base, User, add_missing_columns
+from university.grade_diff import format_changes_message, merge_change_entries
+from university.grade_record import Grade as GradeRecord, as_grade
 
 
 class Term(Base):
@@ -84,6 +86,101 @@ class Grade(Base):
     )
 
 
+class TermPageDigest(Base):
+    """
+    Snapshot of a user's term: digest of the raw grade page last processed and
+    fingerprint of the grades stored from it (see university.grade_diff)
+    """
+    
+    __tablename__ = "term_page_digests"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    term_id = Column(String(50), nullable=False)
+    digest = Column(String(64), nullable=False)
+    fingerprint = Column(String(64), nullable=True)
+    courses = Column(Integer, nullable=True)
+    # Bumped on every grade change, so notification keys never repeat
+    version = Column(Integer, nullable=True)
+    checked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        UniqueConstraint('user_id', 'term_id', name='uq_page_digest_user_term'),
+    )
+
+
+class UserPollState(Base):
+    """When a user's grades are next due for a check, and why (see bot.poll_policy)"""
+    
+    __tablename__ = "user_poll_states"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True)
+    tier = Column(String(20), nullable=False)
+    next_check_at = Column(DateTime, nullable=False)
+    last_checked_at = Column(DateTime, nullable=True)
+    last_change_at = Column(DateTime, nullable=True)
+    courses = Column(Integer, nullable=False, default=0)
+    pending_courses = Column(Integer, nullable=False, default=0)
+    settled_since = Column(DateTime, nullable=True)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_poll_state_next_check', 'next_check_at'),
+    )
+
+
+class NotificationOutbox(Base):
+    """A message waiting for delivery, written in the same transaction as the change it reports"""
+    
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    telegram_id = Column(BigInteger, nullable=False)
+    kind = Column(String(20), nullable=False)
+    message = Column(Text, nullable=False)
+    # Field-level grade changes as JSON, so later changes can be merged into an unsent row
+    changes = Column(Text, nullable=True)
+    # Same change detected twice (e.g. a retried transaction) maps to one row
+    idempotency_key = Column(String(64), nullable=False, unique=True)
+    # pending -> sending -> sent, or undeliverable (blocked / no chat), or failed after the last retry;
+    # a send that fails goes back to pending
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String(200), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+
+class PollWorker(Base):
+    """A bot process taking part in sharded grade polling (see bot.poll_shards)"""
+    
+    __tablename__ = "poll_workers"
+    
+    worker_id = Column(String(128), primary_key=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class PollShardLease(Base):
+    """Which worker polls the users of a shard, until expires_at unless renewed"""
+    
+    __tablename__ = "poll_shard_leases"
+    
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(128), nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    acquired_at = Column(DateTime, nullable=True)
+
+
 class DatabaseManager:
     """Database connection and session management"""
     
@@ -119,6 +216,7 @@ class DatabaseManager:
         """Create all tables"""
         try:
             Base.metadata.create_all(bind=self.engine)
+            add_missing_columns(self.engine)
             logger.info("✅ Grade database tables created successfully")
         except Exception as e:
             logger.error(f"❌ Error creating grade tables: {e}")
@@ -133,7 +231,92 @@ class GradeStorageV2:
         self.db_manager.create_tables()
         logger.info("✅ GradeStorageV2 initialized")
     
-    def save_grades(self, telegram_id: int, grades_data: List[Dict[str, Any]]) -> bool:
+    def _write_grades(self, session, user_id: int, grades_data: List[Any]) -> Tuple[int, int]:
+        """Insert or update grade rows inside the caller's session; returns (saved, skipped)"""
+        saved_count = 0
+        skipped_count = 0
+        
+        for grade_data in grades_data:
+            # Grade records from the parser; legacy dicts are converted once
+            record = as_grade(grade_data)
+            course_name = record.name
+            course_code = record.code
+            ects = record.ects
+            coursework = record.coursework
+            final_exam = record.final_exam
+            total = record.total
+            term_name = record.term_name
+            term_id_str = record.term_id
+            
+            # Skip if no course name
+            if not course_name:
+                logger.warning(f"⏭️ Skipping grade due to missing course name")
+                skipped_count += 1
+                continue
+            
+            # Handle term
+            term_obj = None
+            if term_id_str:
+                term_obj = session.query(Term).filter_by(term_id=term_id_str).first()
+                if not term_obj:
+                    # Create term if not exists
+                    term_obj = Term(
+                        term_id=term_id_str,
+                        name=term_name or term_id_str,
+                        is_current=True  # Assume current for now
+                    )
+                    session.add(term_obj)
+                    session.flush()  # Get term_obj.id
+            
+            term_db_id = term_obj.id if term_obj else None
+            
+            # Normalize ECTS
+            try:
+                ects_val = float(ects) if ects else None
+            except Exception:
+                ects_val = None
+            
+            # Numeric total and status were derived when the record was built
+            numeric_grade = record.numeric_total
+            grade_status = record.grade_status.value
+            
+            # Create or update grade
+            existing_grade = session.query(Grade).filter_by(
+                user_id=user_id,
+                course_code=course_code,
+                term_id=term_db_id
+            ).first()
+            
+            if existing_grade:
+                # Update existing grade
+                existing_grade.course_name = course_name
+                existing_grade.ects_credits = ects_val
+                existing_grade.coursework_grade = coursework
+                existing_grade.final_exam_grade = final_exam
+                existing_grade.total_grade_value = total
+                existing_grade.numeric_grade = numeric_grade
+                existing_grade.grade_status = grade_status
+                existing_grade.updated_at = datetime.utcnow()
+            else:
+                # Create new grade
+                grade = Grade(
+                    user_id=user_id,
+                    term_id=term_db_id,
+                    course_name=course_name,
+                    course_code=course_code,
+                    ects_credits=ects_val,
+                    coursework_grade=coursework,
+                    final_exam_grade=final_exam,
+                    total_grade_value=total,
+                    numeric_grade=numeric_grade,
+                    grade_status=grade_status,
+                )
+                session.add(grade)
+            
+            saved_count += 1
+        return saved_count, skipped_count
+    
+    def save_grades(self, telegram_id: int, grades_data: List[Any]) -> bool:
         """Save grades for a user"""
         try:
             with self.db_manager.get_session() as session:
@@ -143,98 +326,7 @@ class GradeStorageV2:
                     logger.error(f"❌ User not found for telegram_id: {telegram_id}")
                     return False
                 
-                user_id = user.id
-                saved_count = 0
-                skipped_count = 0
-                
-                for grade_data in grades_data:
-                    # Extract grade information
-                    course_name = grade_data.get("name", "")
-                    course_code = grade_data.get("code", "")
-                    ects = grade_data.get("ects", "")
-                    coursework = grade_data.get("coursework", "")
-                    final_exam = grade_data.get("final_exam", "")
-                    total = grade_data.get("total", "")
-                    term_name = grade_data.get("term_name", "")
-                    term_id_str = grade_data.get("term_id", "")
-                    
-                    # Skip if no course name
-                    if not course_name:
-                        logger.warning(f"⏭️ Skipping grade due to missing course name")
-                        skipped_count += 1
-                        continue
-                    
-                    # Handle term
-                    term_obj = None
-                    if term_id_str:
-                        term_obj = session.query(Term).filter_by(term_id=term_id_str).first()
-                        if not term_obj:
-                            # Create term if not exists
-                            term_obj = Term(
-                                term_id=term_id_str,
-                                name=term_name or term_id_str,
-                                is_current=True  # Assume current for now
-                            )
-                            session.add(term_obj)
-                            session.flush()  # Get term_obj.id
-                    
-                    term_db_id = term_obj.id if term_obj else None
-                    
-                    # Normalize ECTS
-                    try:
-                        ects_val = float(ects) if ects else None
-                    except Exception:
-                        ects_val = None
-                    
-                    # Extract numeric grade
-                    numeric_grade = None
-                    if total:
-                        match = re.search(r"(\d+)", total)
-                        if match:
-                            numeric_grade = float(match.group(1))
-                    
-                    # Determine grade status
-                    if not total or "لم يتم النشر" in total:
-                        grade_status = "Not Published"
-                    elif "%" in total or (numeric_grade is not None):
-                        grade_status = "Published"
-                    else:
-                        grade_status = "Unknown"
-                    
-                    # Create or update grade
-                    existing_grade = session.query(Grade).filter_by(
-                        user_id=user_id,
-                        course_code=course_code,
-                        term_id=term_db_id
-                    ).first()
-                    
-                    if existing_grade:
-                        # Update existing grade
-                        existing_grade.course_name = course_name
-                        existing_grade.ects_credits = ects_val
-                        existing_grade.coursework_grade = coursework
-                        existing_grade.final_exam_grade = final_exam
-                        existing_grade.total_grade_value = total
-                        existing_grade.numeric_grade = numeric_grade
-                        existing_grade.grade_status = grade_status
-                        existing_grade.updated_at = datetime.utcnow()
-                    else:
-                        # Create new grade
-                        grade = Grade(
-                            user_id=user_id,
-                            term_id=term_db_id,
-                            course_name=course_name,
-                            course_code=course_code,
-                            ects_credits=ects_val,
-                            coursework_grade=coursework,
-                            final_exam_grade=final_exam,
-                            total_grade_value=total,
-                            numeric_grade=numeric_grade,
-                            grade_status=grade_status,
-                        )
-                        session.add(grade)
-                    
-                    saved_count += 1
+                saved_count, skipped_count = self._write_grades(session, user.id, grades_data)
                 
                 logger.info(f"✅ Grades saved for user {telegram_id}: {saved_count} saved, {skipped_count} skipped")
                 return True
@@ -277,6 +369,56 @@ class GradeStorageV2:
             logger.error(f"❌ Error getting grades for user {telegram_id}: {e}")
             return []
     
+    def get_course_waiters(self, course_codes: List[str], exclude_telegram_id: Optional[int] = None) -> List[int]:
+        """Telegram ids of active users whose stored grade for any of these courses is still unpublished"""
+        try:
+            with self.db_manager.get_session() as session:
+                query = (
+                    session.query(User.telegram_id)
+                    .join(Grade, Grade.user_id == User.id)
+                    .filter(Grade.course_code.in_(course_codes))
+                    .filter(Grade.grade_status != "Published")
+                    .filter(User.is_active.is_(True))
+                )
+                if exclude_telegram_id is not None:
+                    query = query.filter(User.telegram_id != exclude_telegram_id)
+                return [telegram_id for (telegram_id,) in query.distinct().all()]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting waiters for courses {course_codes}: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error getting waiters for courses {course_codes}: {e}")
+            return []
+    
+    def get_user_grade_records(self, telegram_id: int) -> List[GradeRecord]:
+        """Stored grades as Grade records, for diffing against a fresh poll"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return []
+                
+                grades = session.query(Grade).filter_by(user_id=user.id).all()
+                return [
+                    GradeRecord(
+                        name=grade.course_name or "",
+                        code=grade.course_code or "",
+                        ects=f"{float(grade.ects_credits):g}" if grade.ects_credits is not None else "",
+                        coursework=grade.coursework_grade or "",
+                        final_exam=grade.final_exam_grade or "",
+                        total=grade.total_grade_value or "",
+                        term_name=grade.term.name if grade.term else "",
+                        term_id=grade.term.term_id if grade.term else "",
+                    )
+                    for grade in grades
+                ]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting grade records for user {telegram_id}: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error getting grade records for user {telegram_id}: {e}")
+            return []
+    
     def delete_grades(self, telegram_id: int) -> bool:
         """Delete all grades for a user"""
         try:
@@ -288,6 +430,11 @@ class GradeStorageV2:
                 grades = session.query(Grade).filter_by(user_id=user.id).all()
                 for grade in grades:
                     session.delete(grade)
+                # Without stored grades the next poll must diff again
+                session.query(TermPageDigest).filter_by(user_id=user.id).delete()
+                session.query(UserPollState).filter_by(user_id=user.id).delete()
+                # Undelivered notices about those grades go with them
+                session.query(NotificationOutbox).filter_by(user_id=user.id, status="pending").delete()
                 
                 logger.info(f"✅ Deleted {len(grades)} grades for user {telegram_id}")
                 return True
@@ -298,6 +445,544 @@ class GradeStorageV2:
             logger.error(f"❌ Error deleting grades for user {telegram_id}: {e}")
             return False
     
+    def save_term_catalog(self, telegram_id: int, terms: List[Tuple[str, str]]) -> bool:
+        """Persist a user's ordered term list (names go to the terms table)"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                
+                for position, (term_name, term_id) in enumerate(terms):
+                    term_obj = session.query(Term).filter_by(term_id=term_id).first()
+                    if term_obj:
+                        term_obj.name = term_name
+                        # Only the first listed term is current; an older one loses the flag
+                        term_obj.is_current = position == 0
+                    else:
+                        session.add(Term(term_id=term_id, name=term_name, is_current=(position == 0)))
+                
+                user.term_catalog = ",".join(term_id for _, term_id in terms)
+                user.term_catalog_updated_at = datetime.utcnow()
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving term catalog for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving term catalog for user {telegram_id}: {e}")
+            return False
+    
+    def get_term_catalog(self, telegram_id: int) -> Optional[Tuple[List[Tuple[str, str]], datetime]]:
+        """Get a user's persisted term list and when it was fetched"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user or not user.term_catalog or not user.term_catalog_updated_at:
+                    return None
+                
+                term_ids = user.term_catalog.split(",")
+                names = {
+                    t.term_id: t.name
+                    for t in session.query(Term).filter(Term.term_id.in_(term_ids)).all()
+                }
+                terms = [(names.get(term_id, term_id), term_id) for term_id in term_ids]
+                return terms, user.term_catalog_updated_at
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting term catalog for user {telegram_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error getting term catalog for user {telegram_id}: {e}")
+            return None
+    
+    def clear_term_catalog(self, telegram_id: int) -> bool:
+        """Forget a user's persisted term list"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                user.term_catalog = None
+                user.term_catalog_updated_at = None
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error clearing term catalog for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error clearing term catalog for user {telegram_id}: {e}")
+            return False
+    
     def get_grades(self, telegram_id: int) -> List[Dict[str, Any]]:
         """Compatibility method - alias for get_user_grades"""
-        return self.get_user_grades(telegram_id) 
\ No newline at end of file
+        return self.get_user_grades(telegram_id)
+    
+    def get_page_digests(self, telegram_id: int) -> Dict[str, str]:
+        """Get {term_id: digest} of the grade pages last processed for a user"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = (
+                    session.query(TermPageDigest.term_id, TermPageDigest.digest)
+                    .join(User, User.id == TermPageDigest.user_id)
+                    .filter(User.telegram_id == telegram_id)
+                    .all()
+                )
+                return {term_id: digest for term_id, digest in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting page digests for user {telegram_id}: {e}")
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error getting page digests for user {telegram_id}: {e}")
+            return {}
+    
+    def get_grade_snapshots(self, telegram_id: int) -> Dict[str, Dict[str, Any]]:
+        """Get {term_id: {"page_digest", "fingerprint", "courses", "version"}} for a user in one indexed read"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = (
+                    session.query(
+                        TermPageDigest.term_id, TermPageDigest.digest, TermPageDigest.fingerprint,
+                        TermPageDigest.courses, TermPageDigest.version,
+                    )
+                    .join(User, User.id == TermPageDigest.user_id)
+                    .filter(User.telegram_id == telegram_id)
+                    .all()
+                )
+                return {
+                    term_id: {"page_digest": digest or None, "fingerprint": fingerprint, "courses": courses, "version": version or 0}
+                    for term_id, digest, fingerprint, courses, version in rows
+                }
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting grade snapshots for user {telegram_id}: {e}")
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error getting grade snapshots for user {telegram_id}: {e}")
+            return {}
+    
+    def save_grade_snapshot(
+        self,
+        telegram_id: int,
+        term_id: str,
+        grades_data: List[Any],
+        fingerprint: str,
+        page_digest: Optional[str] = None,
+        notification: Optional[Dict[str, str]] = None,
+    ) -> Optional[bool]:
+        """
+        Store a term's grades and their fingerprint (and page digest) in one
+        transaction, together with the outbox row for the notification
+        ({"kind", "message", "idempotency_key"}) if there is one.
+        Returns True when stored, False when nothing was stored, and None when
+        the grades were stored but the notification's key was already queued.
+        """
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    logger.error(f"❌ User not found for telegram_id: {telegram_id}")
+                    return False
+                
+                saved_count, skipped_count = self._write_grades(session, user.id, grades_data)
+                row = session.query(TermPageDigest).filter_by(user_id=user.id, term_id=term_id).first()
+                if row is None:
+                    row = TermPageDigest(user_id=user.id, term_id=term_id)
+                    session.add(row)
+                # Legacy polls have no page digest; "" never matches a real one
+                row.digest = page_digest or row.digest or ""
+                row.fingerprint = fingerprint
+                row.courses = saved_count
+                row.version = (row.version or 0) + 1
+                row.checked_at = datetime.utcnow()
+                queued = self._add_notification(session, user, **notification) if notification else True
+                logger.info(f"✅ Grade snapshot saved for user {telegram_id}: {saved_count} saved, {skipped_count} skipped")
+                return True if queued else None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving grade snapshot for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving grade snapshot for user {telegram_id}: {e}")
+            return False
+    
+    def save_page_digest(self, telegram_id: int, term_id: str, digest: str) -> bool:
+        """Remember the digest of a grade page once its grades are stored"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                
+                row = session.query(TermPageDigest).filter_by(user_id=user.id, term_id=term_id).first()
+                if row:
+                    row.digest = digest
+                    row.checked_at = datetime.utcnow()
+                else:
+                    session.add(TermPageDigest(user_id=user.id, term_id=term_id, digest=digest))
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving page digest for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving page digest for user {telegram_id}: {e}")
+            return False
+    
+    def get_poll_states(self) -> Dict[int, Dict[str, Any]]:
+        """Get {telegram_id: poll state} for every user that has one"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = (
+                    session.query(User.telegram_id, UserPollState)
+                    .join(UserPollState, UserPollState.user_id == User.id)
+                    .all()
+                )
+                return {
+                    telegram_id: {
+                        "tier": state.tier,
+                        "next_check_at": state.next_check_at,
+                        "last_checked_at": state.last_checked_at,
+                        "last_change_at": state.last_change_at,
+                        "courses": state.courses,
+                        "pending_courses": state.pending_courses,
+                        "settled_since": state.settled_since,
+                    }
+                    for telegram_id, state in rows
+                }
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting poll states: {e}")
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error getting poll states: {e}")
+            return {}
+    
+    def save_poll_state(self, telegram_id: int, state: Dict[str, Any]) -> bool:
+        """Insert or update a user's poll state"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                
+                row = session.query(UserPollState).filter_by(user_id=user.id).first()
+                if row is None:
+                    row = UserPollState(user_id=user.id)
+                    session.add(row)
+                for field in ("tier", "next_check_at", "last_checked_at", "last_change_at",
+                              "courses", "pending_courses", "settled_since"):
+                    setattr(row, field, state.get(field))
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving poll state for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving poll state for user {telegram_id}: {e}")
+            return False
+    
+    def clear_poll_state(self, telegram_id: int) -> bool:
+        """Forget a user's poll state so the next cycle checks them"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                session.query(UserPollState).filter_by(user_id=user.id).delete()
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error clearing poll state for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error clearing poll state for user {telegram_id}: {e}")
+            return False
+    
+    def heartbeat_poll_worker(self, worker_id: str, ttl_seconds: float, now: Optional[datetime] = None) -> Optional[int]:
+        """Mark a polling worker alive for ttl_seconds; returns how many workers are alive"""
+        now = now or datetime.utcnow()
+        try:
+            with self.db_manager.get_session() as session:
+                row = session.get(PollWorker, worker_id)
+                if row is None:
+                    row = PollWorker(worker_id=worker_id)
+                    session.add(row)
+                row.heartbeat_at = now
+                row.expires_at = now + timedelta(seconds=ttl_seconds)
+                session.flush()
+                session.query(PollWorker).filter(PollWorker.expires_at < now).delete(synchronize_session=False)
+                return session.query(PollWorker).count()
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error in poll worker heartbeat: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error in poll worker heartbeat: {e}")
+            return None
+    
+    def _ensure_shard_rows(self, shard_count: int):
+        with self.db_manager.get_session() as session:
+            existing = {shard for (shard,) in session.query(PollShardLease.shard)}
+            missing = [shard for shard in range(shard_count) if shard not in existing]
+        if not missing:
+            return
+        try:
+            with self.db_manager.get_session() as session:
+                session.add_all(PollShardLease(shard=shard) for shard in missing)
+        except IntegrityError:
+            # Another worker created them first
+            pass
+    
+    def claim_poll_shards(
+        self, worker_id: str, shard_count: int, target: int, ttl_seconds: float, now: Optional[datetime] = None
+    ) -> Optional[List[int]]:
+        """
+        Renew this worker's leases, give back any above target, then take free
+        or expired shards until it holds target. Each claim is a conditional
+        UPDATE, so two workers never win the same shard. Returns the shards held.
+        """
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            self._ensure_shard_rows(shard_count)
+            with self.db_manager.get_session() as session:
+                held = sorted(
+                    shard for (shard,) in session.query(PollShardLease.shard).filter(
+                        PollShardLease.owner == worker_id,
+                        PollShardLease.expires_at >= now,
+                        PollShardLease.shard < shard_count,
+                    )
+                )
+                # Extras go back so a worker that just joined can take them
+                keep = held[:target]
+                session.query(PollShardLease).filter(
+                    PollShardLease.owner == worker_id, ~PollShardLease.shard.in_(keep)
+                ).update({"owner": None, "expires_at": None}, synchronize_session=False)
+                if keep:
+                    session.query(PollShardLease).filter(
+                        PollShardLease.shard.in_(keep), PollShardLease.owner == worker_id
+                    ).update({"expires_at": expires_at}, synchronize_session=False)
+                
+                free = [
+                    shard for (shard,) in session.query(PollShardLease.shard).filter(
+                        PollShardLease.shard < shard_count,
+                        or_(PollShardLease.owner.is_(None), PollShardLease.expires_at < now),
+                    ).order_by(PollShardLease.shard)
+                ]
+                for shard in free:
+                    if len(keep) >= target:
+                        break
+                    claimed = session.query(PollShardLease).filter(
+                        PollShardLease.shard == shard,
+                        or_(PollShardLease.owner.is_(None), PollShardLease.expires_at < now),
+                    ).update(
+                        {"owner": worker_id, "expires_at": expires_at, "acquired_at": now},
+                        synchronize_session=False,
+                    )
+                    if claimed:
+                        keep.append(shard)
+                return sorted(keep)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error claiming poll shards for {worker_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error claiming poll shards for {worker_id}: {e}")
+            return None
+    
+    def release_poll_shards(self, worker_id: str) -> bool:
+        """Give back every lease of a worker that is shutting down"""
+        try:
+            with self.db_manager.get_session() as session:
+                session.query(PollShardLease).filter(PollShardLease.owner == worker_id).update(
+                    {"owner": None, "expires_at": None}, synchronize_session=False
+                )
+                session.query(PollWorker).filter(PollWorker.worker_id == worker_id).delete(synchronize_session=False)
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error releasing poll shards for {worker_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error releasing poll shards for {worker_id}: {e}")
+            return False
+    
+    def get_poll_shard_leases(self) -> List[Dict[str, Any]]:
+        """Every shard with its current owner and lease expiry"""
+        try:
+            with self.db_manager.get_session() as session:
+                return [
+                    {"shard": row.shard, "owner": row.owner, "expires_at": row.expires_at, "acquired_at": row.acquired_at}
+                    for row in session.query(PollShardLease).order_by(PollShardLease.shard)
+                ]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting poll shard leases: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error getting poll shard leases: {e}")
+            return []
+    
+    @staticmethod
+    def _add_notification(
+        session,
+        user: User,
+        kind: str,
+        message: str,
+        idempotency_key: str,
+        changes: Optional[List[Dict[str, Any]]] = None,
+        hold_seconds: float = 0,
+    ) -> bool:
+        """
+        Queue a notification. Grade changes (with their change entries) are
+        merged into the user's grade notice that is still waiting to be sent,
+        if any; otherwise a new row is held for hold_seconds so changes of the
+        next polls can join it. When the merged changes cancel out (a grade
+        changed and changed back), the waiting notice is dropped instead.
+        """
+        if session.query(NotificationOutbox.id).filter_by(idempotency_key=idempotency_key).first():
+            return False
+        now = datetime.utcnow()
+        if changes is not None:
+            waiting = (
+                session.query(NotificationOutbox)
+                .filter_by(user_id=user.id, kind=kind, status="pending")
+                .filter(NotificationOutbox.changes.isnot(None))
+                .order_by(NotificationOutbox.id.desc())
+                .first()
+            )
+            if waiting is not None:
+                merged = merge_change_entries(json.loads(waiting.changes), changes)
+                # Only while nobody has claimed it for sending
+                still_waiting = session.query(NotificationOutbox).filter(
+                    NotificationOutbox.id == waiting.id, NotificationOutbox.status == "pending"
+                )
+                if not merged:
+                    if still_waiting.delete(synchronize_session=False):
+                        logger.info(f"📦 Grade changes for user {user.telegram_id} cancelled out, dropped notification {waiting.id}")
+                        return True
+                elif still_waiting.update({
+                    "changes": json.dumps(merged, ensure_ascii=False),
+                    "message": format_changes_message(merged, now + timedelta(hours=3)),
+                }, synchronize_session=False):
+                    logger.info(f"📦 Merged grade changes for user {user.telegram_id} into notification {waiting.id}")
+                    return True
+        session.add(NotificationOutbox(
+            user_id=user.id,
+            telegram_id=user.telegram_id,
+            kind=kind,
+            message=message,
+            changes=json.dumps(changes, ensure_ascii=False) if changes is not None else None,
+            idempotency_key=idempotency_key,
+            next_attempt_at=now + timedelta(seconds=hold_seconds),
+        ))
+        return True
+    
+    def enqueue_notification(
+        self,
+        telegram_id: int,
+        kind: str,
+        message: str,
+        idempotency_key: str,
+        changes: Optional[List[Dict[str, Any]]] = None,
+        hold_seconds: float = 0,
+    ) -> bool:
+        """Queue a notification on its own; returns False if the key was already queued"""
+        try:
+            with self.db_manager.get_session() as session:
+                user = session.query(User).filter_by(telegram_id=telegram_id).first()
+                if not user:
+                    return False
+                return self._add_notification(session, user, kind, message, idempotency_key, changes, hold_seconds)
+        except IntegrityError:
+            # Queued concurrently under the same key
+            return False
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error queueing notification for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error queueing notification for user {telegram_id}: {e}")
+            return False
+    
+    def claim_notifications(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Due pending notifications, each marked sending for lease_seconds. A
+        conditional UPDATE per row means two workers never claim the same one
+        (and no grade changes are merged into it any more); a worker that dies
+        mid-send leaves it to be retried when the lease runs out.
+        """
+        now = datetime.utcnow()
+        try:
+            with self.db_manager.get_session() as session:
+                due = (
+                    session.query(NotificationOutbox)
+                    .filter(NotificationOutbox.status.in_(("pending", "sending")), NotificationOutbox.next_attempt_at <= now)
+                    .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                    .limit(limit)
+                    .all()
+                )
+                claimed = []
+                for row in due:
+                    updated = session.query(NotificationOutbox).filter(
+                        NotificationOutbox.id == row.id,
+                        NotificationOutbox.status == row.status,
+                        NotificationOutbox.next_attempt_at == row.next_attempt_at,
+                    ).update(
+                        {"status": "sending", "next_attempt_at": now + timedelta(seconds=lease_seconds)},
+                        synchronize_session=False,
+                    )
+                    if updated:
+                        # Changes merged in since the select are part of what gets sent
+                        session.refresh(row)
+                        claimed.append({
+                            "id": row.id, "telegram_id": row.telegram_id, "kind": row.kind,
+                            "message": row.message, "attempts": row.attempts,
+                        })
+                return claimed
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error claiming notifications: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error claiming notifications: {e}")
+            return []
+    
+    def finish_notification(
+        self, notification_id: int, status: str, error: Optional[str] = None, retry_in: Optional[float] = None
+    ) -> bool:
+        """Record a delivery attempt: sent, undeliverable, failed, or pending again after retry_in seconds"""
+        now = datetime.utcnow()
+        try:
+            with self.db_manager.get_session() as session:
+                row = session.get(NotificationOutbox, notification_id)
+                if row is None:
+                    return False
+                row.status = status
+                row.attempts += 1
+                row.last_error = error[:200] if error else None
+                if status == "sent":
+                    row.sent_at = now
+                if retry_in is not None:
+                    row.next_attempt_at = now + timedelta(seconds=retry_in)
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error updating notification {notification_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error updating notification {notification_id}: {e}")
+            return False
+    
+    def get_outbox_stats(self) -> Dict[str, int]:
+        """{status: notifications}"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = session.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(NotificationOutbox.status)
+                return {status: count for status, count in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting outbox stats: {e}")
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error getting outbox stats: {e}")
+            return {}
+    
+    def purge_notifications(self, older_than_days: float) -> int:
+        """Delete delivered or given-up notifications older than the retention window"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        try:
+            with self.db_manager.get_session() as session:
+                return session.query(NotificationOutbox).filter(
+                    NotificationOutbox.status.in_(("sent", "undeliverable", "failed")), NotificationOutbox.created_at < cutoff
+                ).delete(synchronize_session=False)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error purging notifications: {e}")
+            return 0
+        except Exception as e:
+            logger.error(f"❌ Error purging notifications: {e}")
+            return 0
@@ -0,0 +1,90 @@
+"""
+🌐 Translation Storage
+Persisted translations keyed by a hash of the target language and source text
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, String, DateTime, Text, Index
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from storage.user_storage_v2 import Base
+from storage.grade_storage_v2 import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class Translation(Base):
+    """One translated text; key is translation_key(text, target_lang)"""
+
+    __tablename__ = "translations"
+
+    key = Column(String(64), primary_key=True)
+    target_lang = Column(String(10), nullable=False)
+    source_text = Column(Text, nullable=False)
+    translated = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_translation_created', 'created_at'),
+    )
+
+
+class TranslationStorage:
+    """Translation rows for the translation cache"""
+
+    def __init__(self, database_url: str):
+        self.db_manager = DatabaseManager(database_url)
+        self.db_manager.create_tables()
+        logger.info("✅ TranslationStorage initialized")
+
+    def get_translation(self, key: str) -> Optional[str]:
+        try:
+            with self.db_manager.get_session() as session:
+                row = session.get(Translation, key)
+                return row.translated if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting translation {key[:12]}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error getting translation {key[:12]}: {e}")
+            return None
+
+    def save_translation(self, key: str, target_lang: str, source_text: str, translated: str) -> bool:
+        try:
+            with self.db_manager.get_session() as session:
+                if session.get(Translation, key) is None:
+                    session.add(Translation(
+                        key=key, target_lang=target_lang, source_text=source_text, translated=translated,
+                    ))
+                return True
+        except IntegrityError:
+            # Saved concurrently by another process
+            return True
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error saving translation {key[:12]}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error saving translation {key[:12]}: {e}")
+            return False
+
+    def get_recent_translations(self, limit: int) -> List[Tuple[str, str]]:
+        """(key, translated) of the newest rows, oldest first, to warm the in-memory cache"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = (
+                    session.query(Translation.key, Translation.translated)
+                    .order_by(Translation.created_at.desc())
+                    .limit(limit)
+                    .all()
+                )
+                return [(key, translated) for key, translated in reversed(rows)]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error loading translations: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error loading translations: {e}")
+            return []
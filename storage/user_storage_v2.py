@@ -5,13 +5,13 @@ Handles user data storage with PostgreSQL
 
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from contextlib import contextmanager
 
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
@@ -19,6 +19,13 @@ logger = logging.getLogger(__name__)
 Base = declarative_base()
 
 
+# Lifecycle states: parked users (anything but "active") are not polled;
+# blocked and chat_not_found users are not sent to either
+LIFECYCLE_STATES = ("active", "token_expired", "blocked", "chat_not_found")
+POLLABLE_STATES = ("active",)
+REACHABLE_STATES = ("active", "token_expired")
+
+
 class User(Base):
     """User model for database storage"""
     
@@ -36,15 +43,52 @@ class User(Base):
     last_login = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True, nullable=False)
     token_expired_notified = Column(Boolean, default=False, nullable=False)
+    # Ordered term IDs from the homepage tabs (names live in the terms table)
+    term_catalog = Column(String(500), nullable=True)
+    term_catalog_updated_at = Column(DateTime, nullable=True)
+    lifecycle_state = Column(String(20), nullable=False, default="active", server_default="active")
+    lifecycle_changed_at = Column(DateTime, nullable=True)
+    # Grade changes within this many minutes go out as one message (None: NOTIFICATION_DIGEST_MINUTES)
+    digest_minutes = Column(Integer, nullable=True)
     
     # Indexes
     __table_args__ = (
         Index('idx_user_telegram_id', 'telegram_id'),
         Index('idx_user_username', 'username'),
         Index('idx_user_active', 'is_active'),
+        # Poll and fan-out pages: WHERE lifecycle_state IN (...) AND id > ? ORDER BY id
+        Index('idx_user_lifecycle', 'lifecycle_state', 'id'),
     )
 
 
+def add_missing_columns(engine):
+    """
+    Add columns and indexes declared on the models but missing in the database.
+    create_all() only creates missing tables, so existing deployments get new
+    nullable columns through a plain ALTER TABLE.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                conn.execute(text(ddl))
+                logger.info(f"✅ Added column {table.name}.{column.name}")
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info(f"✅ Added index {index.name}")
+
+
 class DatabaseManager:
     """Database connection and session management"""
     
@@ -80,6 +124,7 @@ class DatabaseManager:
         """Create all tables"""
         try:
             Base.metadata.create_all(bind=self.engine)
+            add_missing_columns(self.engine)
             logger.info("✅ Database tables created successfully")
         except Exception as e:
             logger.error(f"❌ Error creating tables: {e}")
@@ -117,6 +162,10 @@ class UserStorageV2:
                     user.email = email
                     user.last_login = datetime.utcnow()
                     user.is_active = True
+                    # A new login brings a new token: poll again
+                    if user.lifecycle_state != "active":
+                        user.lifecycle_state = "active"
+                        user.lifecycle_changed_at = datetime.utcnow()
                     logger.info(f"✅ User {username} (ID: {telegram_id}) updated")
                 else:
                     # Create new user
@@ -150,19 +199,7 @@ class UserStorageV2:
             with self.db_manager.get_session() as session:
                 user = session.query(User).filter_by(telegram_id=telegram_id).first()
                 if user:
-                    return {
-                        "telegram_id": user.telegram_id,
-                        "username": user.username,
-                        "token": user.token,
-                        "firstname": user.firstname,
-                        "lastname": user.lastname,
-                        "fullname": user.fullname,
-                        "email": user.email,
-                        "registration_date": user.registration_date.isoformat() if user.registration_date else None,
-                        "last_login": user.last_login.isoformat() if user.last_login else None,
-                        "is_active": user.is_active,
-                        "token_expired_notified": user.token_expired_notified,
-                    }
+                    return self._user_dict(user)
                 return None
         except SQLAlchemyError as e:
             logger.error(f"❌ Database error getting user {telegram_id}: {e}")
@@ -171,34 +208,150 @@ class UserStorageV2:
             logger.error(f"❌ Error getting user {telegram_id}: {e}")
             return None
     
-    def get_all_users(self) -> List[Dict[str, Any]]:
-        """Get all active users"""
+    @staticmethod
+    def _user_dict(user: User) -> Dict[str, Any]:
+        return {
+            "telegram_id": user.telegram_id,
+            "username": user.username,
+            "token": user.token,
+            "firstname": user.firstname,
+            "lastname": user.lastname,
+            "fullname": user.fullname,
+            "email": user.email,
+            "registration_date": user.registration_date.isoformat() if user.registration_date else None,
+            "last_login": user.last_login.isoformat() if user.last_login else None,
+            "is_active": user.is_active,
+            "token_expired_notified": user.token_expired_notified,
+            "lifecycle_state": user.lifecycle_state,
+            "digest_minutes": user.digest_minutes,
+        }
+
+    @staticmethod
+    def _active_users(session, states: Optional[Tuple[str, ...]] = None):
+        query = session.query(User).filter(User.is_active.is_(True))
+        if states is not None:
+            query = query.filter(User.lifecycle_state.in_(states))
+        return query
+
+    def get_all_users(self, states: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """Get all active users, optionally only those in the given lifecycle states"""
         try:
             with self.db_manager.get_session() as session:
-                users = session.query(User).filter_by(is_active=True).all()
-                return [
-                    {
-                        "telegram_id": user.telegram_id,
-                        "username": user.username,
-                        "token": user.token,
-                        "firstname": user.firstname,
-                        "lastname": user.lastname,
-                        "fullname": user.fullname,
-                        "email": user.email,
-                        "registration_date": user.registration_date.isoformat() if user.registration_date else None,
-                        "last_login": user.last_login.isoformat() if user.last_login else None,
-                        "is_active": user.is_active,
-                        "token_expired_notified": user.token_expired_notified,
-                    }
-                    for user in users
-                ]
+                users = self._active_users(session, states).all()
+                return [self._user_dict(user) for user in users]
         except SQLAlchemyError as e:
             logger.error(f"❌ Database error getting all users: {e}")
             return []
         except Exception as e:
             logger.error(f"❌ Error getting all users: {e}")
             return []
+
+    def get_users_by_telegram_ids(
+        self, telegram_ids: Iterable[int], states: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        """Active users among telegram_ids (optionally only in the given lifecycle states), in no particular order"""
+        telegram_ids = list(telegram_ids)
+        if not telegram_ids:
+            return []
+        try:
+            with self.db_manager.get_session() as session:
+                users = self._active_users(session, states).filter(User.telegram_id.in_(telegram_ids)).all()
+                return [self._user_dict(user) for user in users]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error getting {len(telegram_ids)} users: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error getting {len(telegram_ids)} users: {e}")
+            return []
+
+    def count_users(self, states: Optional[Tuple[str, ...]] = None) -> int:
+        """Number of active users, optionally only those in the given lifecycle states"""
+        try:
+            with self.db_manager.get_session() as session:
+                return self._active_users(session, states).count()
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error counting users: {e}")
+            return 0
+        except Exception as e:
+            logger.error(f"❌ Error counting users: {e}")
+            return 0
+
+    def get_users_after(
+        self, after_id: int, limit: int, states: Optional[Tuple[str, ...]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Up to limit active users with a row id above after_id, in id order,
+        each with its "id". Keyset pagination: every page is a short indexed query.
+        Returns None on a database error.
+        """
+        try:
+            with self.db_manager.get_session() as session:
+                users = (
+                    self._active_users(session, states)
+                    .filter(User.id > after_id)
+                    .order_by(User.id)
+                    .limit(limit)
+                    .all()
+                )
+                return [{"id": user.id, **self._user_dict(user)} for user in users]
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error paging users: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error paging users: {e}")
+            return None
+
+    def iter_users(self, batch_size: int = 500, states: Optional[Tuple[str, ...]] = POLLABLE_STATES) -> Iterator[Dict[str, Any]]:
+        """Active users in id order (by default only pollable ones), one page of batch_size in memory at a time"""
+        last_id = 0
+        while True:
+            page = self.get_users_after(last_id, batch_size, states)
+            if not page:
+                return
+            yield from page
+            if len(page) < batch_size:
+                return
+            last_id = page[-1]["id"]
     
+    def set_lifecycle_state(self, telegram_id: int, state: str) -> bool:
+        """Park a user (or reactivate with "active"); returns True if the state changed"""
+        if state not in LIFECYCLE_STATES:
+            raise ValueError(f"Unknown lifecycle state: {state}")
+        try:
+            with self.db_manager.get_session() as session:
+                updated = (
+                    session.query(User)
+                    .filter(User.telegram_id == telegram_id, User.lifecycle_state != state)
+                    .update({"lifecycle_state": state, "lifecycle_changed_at": datetime.utcnow()}, synchronize_session=False)
+                )
+                if updated:
+                    logger.info(f"🅿️ User {telegram_id} lifecycle state: {state}")
+                return bool(updated)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error setting lifecycle state for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error setting lifecycle state for user {telegram_id}: {e}")
+            return False
+
+    def count_users_by_state(self) -> Dict[str, int]:
+        """{lifecycle_state: active users}"""
+        try:
+            with self.db_manager.get_session() as session:
+                rows = (
+                    session.query(User.lifecycle_state, func.count(User.id))
+                    .filter(User.is_active.is_(True))
+                    .group_by(User.lifecycle_state)
+                    .all()
+                )
+                return {state or "active": count for state, count in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error counting users by state: {e}")
+            return {}
+        except Exception as e:
+            logger.error(f"❌ Error counting users by state: {e}")
+            return {}
+
     def is_user_registered(self, telegram_id: int) -> bool:
         """Check if user is registered"""
         return self.get_user(telegram_id) is not None
@@ -238,6 +391,23 @@ class UserStorageV2:
             logger.error(f"❌ Error clearing token for user {telegram_id}: {e}")
             return False
     
+    def set_digest_minutes(self, telegram_id: int, minutes: Optional[int]) -> bool:
+        """Set the user's grade notification window (0 sends every change at once)"""
+        try:
+            with self.db_manager.get_session() as session:
+                updated = (
+                    session.query(User)
+                    .filter(User.telegram_id == telegram_id)
+                    .update({"digest_minutes": minutes}, synchronize_session=False)
+                )
+                return bool(updated)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Database error setting digest window for user {telegram_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Error setting digest window for user {telegram_id}: {e}")
+            return False
+    
     def update_token_expired_notified(self, telegram_id: int, notified: bool) -> bool:
         """Update token expired notification status"""
         try:
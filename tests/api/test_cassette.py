@@ -0,0 +1,107 @@
+"""
+Test Cassette Capture and Replay
+"""
+
+import os
+import sys
+import asyncio
+import threading
+
+from aiohttp.test_utils import TestServer
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from scripts.fake_university_server import create_app, username_for
+from university.api_client_v2 import UniversityAPIV2
+from university.cassette import CassetteReplay, CassetteStore, anonymize, user_secrets
+
+PAGE = {"panels": [{"blocks": [{"body": "<table><tr><td>ENG2425041</td><td>85 %</td></tr></table>"}]}]}
+
+
+def test_anonymize_redacts_personal_strings():
+    secrets = user_secrets({"username": "ENG2425041", "fullname": "أحمد محمد", "lastname": "12"})
+    clean = anonymize(
+        {"body": "أحمد محمد ENG2425041 ahmad@uni.edu 0912345678 85 %"}, secrets
+    )
+    assert clean == {"body": "«redacted» «redacted» «email» «id» 85 %"}
+
+
+def test_capture_deduplicates_and_tracks_latest(tmp_path):
+    store = CassetteStore(str(tmp_path), salt="s")
+    first = store.capture("term_page", PAGE, term_id="10459", telegram_id=7)
+    assert store.capture("term_page", PAGE, term_id="10459", telegram_id=7) == first
+    # Same content for another user is stored once but indexed for both
+    assert store.capture("term_page", PAGE, term_id="10459", telegram_id=8) == first
+    changed = {"panels": [{"blocks": [{"body": "<table><tr><td>90 %</td></tr></table>"}]}]}
+    store.capture("term_page", changed, term_id="10459", telegram_id=7)
+
+    assert store.get_stats()["captured"] == 2
+    assert len(os.listdir(tmp_path / "pages")) == 2
+    assert len(list(store.entries())) == 3
+    assert store.latest(7) == changed
+    assert "ENG2425041" not in str(CassetteStore(str(tmp_path), salt="s").latest(8))
+    # A reloaded store sees the same history
+    assert CassetteStore(str(tmp_path), salt="s").latest(7) == changed
+    assert CassetteStore(str(tmp_path), salt="other").latest(7) is None
+
+
+def test_capture_runs_off_the_event_loop(tmp_path):
+    api = UniversityAPIV2()
+    api.cassette = CassetteStore(str(tmp_path))
+    capture = api.cassette.capture
+    threads = []
+
+    def recording_capture(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return capture(*args, **kwargs)
+
+    api.cassette.capture = recording_capture
+
+    async def capture_many():
+        pages = [{"panels": [{"blocks": [{"body": f"<td>{i} %</td>"}]}]} for i in range(10)]
+        await asyncio.gather(*(api._capture("term_page", page, "10459", i) for i, page in enumerate(pages)))
+
+    asyncio.run(capture_many())
+    assert threads and threading.main_thread() not in threads
+    # Concurrent captures from worker threads keep the index consistent
+    assert len(list(api.cassette.entries())) == 10
+    assert len(os.listdir(tmp_path / "pages")) == 10
+
+
+def test_capture_from_fake_server_then_replay_offline(tmp_path):
+    async def capture():
+        server = TestServer(create_app(students=3))
+        await server.start_server()
+        api = UniversityAPIV2()
+        api.api_url = str(server.make_url("/graphql"))
+        api.login_url = str(server.make_url("/portal"))
+        api.cassette = CassetteStore(str(tmp_path))
+        try:
+            token = await api.login(username_for(1), "password")
+            first = await api.poll_user(token, 1)
+            second = await api.poll_user(token, 1)
+            return first, second
+        finally:
+            await api.close()
+            await server.close()
+
+    async def replay():
+        api = UniversityAPIV2()
+        api.api_url = api.login_url = "http://127.0.0.1:9/unreachable"
+        api.replay = CassetteReplay(CassetteStore(str(tmp_path)))
+        try:
+            token = await api.login("anyone", "secret")
+            return await api.poll_user(token, 1), await api.get_current_grades(token)
+        finally:
+            await api.close()
+
+    first, second = asyncio.run(capture())
+    store = CassetteStore(str(tmp_path))
+    assert store.digests("term_page") and store.digests("homepage")
+    assert username_for(1) not in str(store.latest(1))
+
+    replayed, grades = asyncio.run(replay())
+    assert replayed["token_valid"]
+    assert [g["code"] for g in replayed["grades"]] == [g["code"] for g in first["grades"]]
+    assert [g["total"] for g in grades] == [g["total"] for g in second["grades"]]
@@ -0,0 +1,67 @@
+"""
+Test UniversityAPIV2 Against the Fake University Server
+"""
+
+import os
+import sys
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from scripts.fake_university_server import UNIVERSITY_KEY, create_app, username_for
+from university.api_client_v2 import UniversityAPIV2
+
+
+async def with_fake_university(scenario, **options):
+    app = create_app(students=5, **options)
+    server = TestServer(app)
+    await server.start_server()
+    api = UniversityAPIV2()
+    api.api_url = str(server.make_url("/graphql"))
+    api.login_url = str(server.make_url("/portal"))
+    try:
+        return await scenario(api, app[UNIVERSITY_KEY])
+    finally:
+        await api.close()
+        await server.close()
+
+
+def test_login_and_poll_round_trip():
+    async def scenario(api, university):
+        token = await api.login(username_for(2), "password")
+        assert token
+        assert await api.login(username_for(2), "wrong") is None
+        first = await api.poll_user(token, 2)
+        second = await api.poll_user(token, 2, {first["term_id"]: first["page_digest"]})
+        data = await api.get_user_data(token)
+        return first, second, data
+
+    first, second, data = asyncio.run(with_fake_university(scenario))
+    assert first["token_valid"] and first["username"] == username_for(2)
+    assert len(first["grades"]) == 6
+    assert second["unchanged"]
+    assert data["grades"] == first["grades"]
+
+
+def test_revoked_token_is_reported_invalid():
+    async def scenario(api, university):
+        token = await api.login(username_for(1), "password")
+        university.revoked.add(1)
+        return await api.poll_user(token, 1)
+
+    assert asyncio.run(with_fake_university(scenario)) == {"token_valid": False}
+
+
+def test_persisted_queries_against_fake_server():
+    async def scenario(api, university):
+        api.apq_enabled = True
+        token = await api.login(username_for(0), "password")
+        await api.get_homepage_data(token)
+        await api.get_homepage_data(token)
+        return api.get_transfer_stats()["homepage"]
+
+    stats = asyncio.run(with_fake_university(scenario))
+    assert stats["requests"] == 2 and stats["apq_misses"] == 0
@@ -0,0 +1,74 @@
+"""
+Test Grade Fingerprints and Field-Level Diff
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.core import TelegramBot
+from bot.poll_pipeline import PollJob
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.grade_diff import FieldChange, change_entries, diff_grades, grades_fingerprint, merge_change_entries
+from university.grade_record import Grade
+
+MATH = Grade(name="رياضيات", code="MATH101", coursework="28", total="لم يتم النشر", term_id="10459")
+CS = Grade(name="برمجة", code="CS202", total="90 %", term_id="10459")
+
+
+def test_fingerprint_ignores_order_and_layout():
+    moved = Grade(name="رياضيات", code="MATH101", coursework="28", total="لم يتم النشر", row=7, term_id="10459")
+    assert grades_fingerprint([MATH, CS]) == grades_fingerprint([CS, moved])
+    published = Grade(name="رياضيات", code="MATH101", coursework="28", total="80 %")
+    assert grades_fingerprint([MATH, CS]) != grades_fingerprint([published, CS])
+
+
+def test_diff_reports_changed_fields():
+    published = Grade(name="رياضيات", code="MATH101", coursework="28", final_exam="52", total="80 %")
+    changes = diff_grades([MATH], [published, CS])
+    math, cs = changes
+    assert math.fields == (FieldChange("final_exam", "", "52"), FieldChange("total", "لم يتم النشر", "80 %"))
+    assert math.newly_published and not math.is_new
+    assert cs.is_new and cs.fields == () and not cs.newly_published
+    assert diff_grades([MATH, CS], [MATH, CS]) == []
+
+
+def test_unchanged_grades_skip_row_reads(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'snapshots.db'}"
+    UserStorageV2(url).save_user(1, "ENG2425041", "token-1", {})
+    storage = GradeStorageV2(url)
+    assert storage.save_grade_snapshot(1, "10459", [MATH, CS], grades_fingerprint([MATH, CS]), "d" * 64)
+    snapshots = storage.get_grade_snapshots(1)
+    assert snapshots["10459"]["page_digest"] == "d" * 64 and snapshots["10459"]["courses"] == 2
+    assert storage.get_page_digests(1) == {"10459": "d" * 64}
+
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.grade_storage = storage
+    reads = []
+    monkeypatch.setattr(storage, "get_user_grade_records", lambda telegram_id: reads.append(telegram_id) or [])
+    job = PollJob({"telegram_id": 1}, result={"term_id": "10459"}, snapshots=snapshots, grades=[CS, MATH])
+    assert bot._poll_stage_diff(job) is job
+    assert reads == [] and job.changes == [] and job.message is None
+
+    # A changed grade misses the fingerprint and is diffed against the stored rows
+    monkeypatch.undo()
+    job = PollJob({"telegram_id": 1}, result={"term_id": "10459"}, snapshots=snapshots,
+                  grades=[CS, Grade(name="رياضيات", code="MATH101", coursework="28", total="80 %", term_id="10459")])
+    bot._poll_stage_diff(job)
+    assert [change.grade.code for change in job.changes] == ["MATH101"]
+    assert "لم يتم النشر → 80 %" in job.message
+
+
+def test_merged_changes_keep_first_old_and_latest_new():
+    coursework = Grade(name="رياضيات", code="MATH101", coursework="28", final_exam="52", total="لم يتم النشر")
+    total = Grade(name="رياضيات", code="MATH101", coursework="28", final_exam="52", total="80 %")
+    first = change_entries(diff_grades([MATH], [coursework]))
+    second = change_entries(diff_grades([coursework], [total]))
+    merged = merge_change_entries(first, second)
+    assert merged == [{"key": "MATH101", "name": "رياضيات", "code": "MATH101",
+                       "fields": {"final_exam": ["", "52"], "total": ["لم يتم النشر", "80 %"]}}]
+    # A value changed back drops out
+    assert merge_change_entries(second, change_entries(diff_grades([total], [coursework]))) == []
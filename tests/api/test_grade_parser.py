@@ -0,0 +1,66 @@
+"""
+Test Grade Table Parser Equivalence
+"""
+
+import os
+import sys
+import random
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.grade_parser import extract_tables, extract_tables_bs4
+from university.api_client_v2 import UniversityAPIV2
+
+GRADES_HTML = """
+<div class="table-responsive">
+<table class="table table-bordered">
+  <thead><tr><th>المقرر</th><th>الرمز</th><th>رصيد ECTS</th><th>الأعمال</th><th>النظري</th><th>الدرجة</th></tr></thead>
+  <tbody>
+    <tr><td>الرياضيات المتقطعة</td><td>MATH201</td><td>6</td><td>28 / 30</td><td>55 / 70</td><td>83&nbsp;%</td></tr>
+    <tr><td> البرمجة <b>المتقدمة</b> </td><td>CS202</td><td>5</td><td><span>لم يتم النشر</span></td><td></td><td>لم يتم النشر</td></tr>
+    <tr><td>Term 1 summary</td><td>2</td><td>11</td><td></td><td></td><td></td></tr>
+    <tr><td>اللغة العربية<br/>(1)</td><td>ARAB101</td><td>2</td><td>20</td><td>40</td><td>60 %</td></tr>
+    <tr><td colspan="6"><!-- ملاحظة --></td></tr>
+  </tbody>
+</table>
+</div>
+"""
+
+
+def test_real_shaped_html_matches_bs4():
+    assert extract_tables(GRADES_HTML) == extract_tables_bs4(GRADES_HTML)
+
+
+def test_grade_dicts_from_real_shaped_html():
+    api = UniversityAPIV2()
+    grades = api.parse_grades_from_html(GRADES_HTML, 1)
+    assert [g["code"] for g in grades] == ["MATH201", "CS202", "ARAB101"]
+    assert grades[0]["total"] == "83\xa0%"
+    assert grades[0]["grade_status"] == "Published"
+    assert grades[1]["name"] == "البرمجةالمتقدمة"
+    assert grades[1]["grade_status"] == "Not Published"
+    assert grades[2]["row"] == 4
+
+
+def test_malformed_html_matches_bs4():
+    tags = ["table", "tr", "td", "th", "b", "span", "div", "br", "script", "p", "tbody", "img"]
+    texts = [" 80 % ", "لم يتم النشر", "&nbsp;", "x&amp;y", " \n ", "MATH101", "&#1604;"]
+    rng = random.Random(7)
+    for _ in range(2000):
+        parts = []
+        for _ in range(rng.randint(1, 40)):
+            roll = rng.random()
+            tag = rng.choice(tags)
+            if roll < 0.35:
+                parts.append(f"<{tag}>")
+            elif roll < 0.6:
+                parts.append(f"</{tag}>")
+            elif roll < 0.65:
+                parts.append(f"<{tag}/>")
+            elif roll < 0.7:
+                parts.append("<!-- c -->")
+            else:
+                parts.append(rng.choice(texts))
+        html = "".join(parts)
+        assert extract_tables(html) == extract_tables_bs4(html), html
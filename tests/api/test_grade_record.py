@@ -0,0 +1,71 @@
+"""
+Test Typed Grade Records
+"""
+
+import os
+import sys
+import pickle
+import dataclasses
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.grade_parser import parse_grade_html
+from university.grade_record import Grade, GradeStatus, as_grade
+from utils.analytics import GradeAnalytics
+
+HTML = (
+    "<table><tr><th>المقرر</th><th>الرمز</th></tr>"
+    "<tr><td>رياضيات</td><td>MATH101</td><td>6</td><td>28 / 30</td><td>55</td><td>83.5 %</td></tr>"
+    "<tr><td>برمجة</td><td>CS202</td><td>5</td><td>لم يتم النشر</td><td></td><td>لم يتم النشر</td></tr></table>"
+)
+
+
+def test_parser_builds_typed_records():
+    math, cs = parse_grade_html(HTML, 1)
+    assert isinstance(math, Grade)
+    assert math.numeric_total == 83.5 and math.grade_status is GradeStatus.PUBLISHED
+    assert cs.numeric_total is None and cs.grade_status == "Not Published"
+    assert math.compare_key == ("MATH101", "83.5 %", "28 / 30", "55")
+    # Dict-style access still works for older call sites
+    assert math["code"] == math.get("code") == "MATH101"
+    assert math.get("missing", "-") == "-"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        math.total = "90 %"
+    # Process-pool parse workers send records back pickled
+    assert pickle.loads(pickle.dumps(math)) == math
+
+
+def test_with_term_and_legacy_dicts():
+    grade = Grade(name="رياضيات", code="MATH101", total="80 %").with_term("الفصل الثاني", "10459")
+    assert (grade.term_name, grade.term_id, grade.numeric_total) == ("الفصل الثاني", "10459", 80.0)
+    stored = as_grade({"course_name": "رياضيات", "course_code": "MATH101", "total_grade_value": "80 %",
+                       "coursework_grade": None, "final_exam_grade": None})
+    assert stored.compare_key == Grade(name="x", code="MATH101", total="80 %").compare_key
+    assert as_grade({"code": "ENG202", "name": "English", "total": 85}).numeric_total == 85.0
+
+
+def test_storage_round_trip_diffs_clean(tmp_path):
+    url = f"sqlite:///{tmp_path / 'records.db'}"
+    UserStorageV2(url).save_user(1, "ENG2425041", "token-1", {"fullname": "طالب"})
+    storage = GradeStorageV2(url)
+    fresh = [grade.with_term("الفصل الثاني", "10459") for grade in parse_grade_html(HTML, 1)]
+    assert storage.save_grades(1, fresh)
+
+    stored = storage.get_user_grade_records(1)
+    assert {g.key: g.compare_key for g in stored} == {g.key: g.compare_key for g in fresh}
+    assert stored[0].term_id == "10459"
+    assert storage.get_user_grades(1)[0]["numeric_grade"] == 83.5
+
+
+def test_analytics_average_uses_numeric_total(tmp_path, monkeypatch):
+    # GradeAnalytics creates its data files relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    analytics = GradeAnalytics(None)
+    grades = parse_grade_html(HTML, 1) + [{"total": "90"}]
+    assert analytics._calculate_average_grade(grades) == pytest.approx((83.5 + 90) / 2)
+    assert analytics.get_quote_category_for_grades(grades) == ["achievement"]
@@ -0,0 +1,134 @@
+"""
+Test Adaptive Limiter and Circuit Breaker
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.limiter import AdaptiveLimiter, CircuitBreaker, UpstreamUnavailable
+from university.api_client_v2 import UniversityAPIV2
+
+
+def test_limit_grows_when_healthy_and_halves_on_overload():
+    limiter = AdaptiveLimiter(initial=10, minimum=2, maximum=12, latency_target=1.0, window=5)
+    for _ in range(5):
+        limiter.record(0.1, ok=True)
+    assert limiter.get_stats()["limit"] == 11
+    limiter.record(0.1, ok=False, overloaded=True)
+    assert limiter.get_stats()["limit"] == 5
+    # A burst of failures in the same window counts once
+    limiter.record(0.1, ok=False, overloaded=True)
+    assert limiter.get_stats()["limit"] == 5
+
+
+def test_slow_responses_do_not_grow_limit():
+    limiter = AdaptiveLimiter(initial=4, minimum=2, maximum=12, latency_target=0.5, window=5)
+    for _ in range(5):
+        limiter.record(2.0, ok=True)
+    assert limiter.get_stats()["limit"] == 4
+
+
+def test_limiter_caps_in_flight():
+    limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=4, window=100)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(worker() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+def test_breaker_opens_and_probes():
+    breaker = CircuitBreaker(failures=3, cooldown=0.05)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.is_open() and not breaker.allow()
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow()       # single half-open probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_send_retries_server_errors_then_opens_breaker():
+    calls = {"count": 0}
+
+    async def handler(request):
+        calls["count"] += 1
+        if calls["count"] <= 2:
+            return web.Response(status=503)
+        return web.json_response({"data": {"getGUI": {"user": {"id": "1"}}}})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/graphql", handler)
+        server = TestServer(app)
+        await server.start_server()
+        api = UniversityAPIV2()
+        api.api_url = str(server.make_url("/graphql"))
+        api.retry_backoff = 0
+        api.breaker = CircuitBreaker(failures=2, cooldown=60)
+        try:
+            # Two 503s open the breaker, so the last retry is not sent
+            assert await api._post_json(api.api_url, {"query": "query { ok }"}, operation="test") == (503, None)
+            assert calls["count"] == 2
+            with pytest.raises(UpstreamUnavailable):
+                await api._post_json(api.api_url, {"query": "query { ok }"}, operation="test")
+            api.breaker = CircuitBreaker(failures=5, cooldown=60)
+            calls["count"] = 0
+            return await api._post_json(api.api_url, {"query": "query { ok }"}, operation="test")
+        finally:
+            await api.close()
+            await server.close()
+
+    status, data = asyncio.run(run())
+    assert status == 200 and data["data"]["getGUI"]["user"]["id"] == "1"
+    assert calls["count"] == 3
+
+
+def test_half_open_probe_is_released_and_skips_legacy_fallback():
+    api = UniversityAPIV2()
+    api.breaker = CircuitBreaker(failures=1, cooldown=0.01)
+    api.breaker.record_failure()
+    calls = []
+
+    async def cancelled_attempts(url, payload, token, operation):
+        calls.append(operation)
+        raise asyncio.CancelledError()
+
+    async def run():
+        await asyncio.sleep(0.02)
+        # The probe is cancelled before any outcome is recorded
+        with pytest.raises(asyncio.CancelledError):
+            await api._send(api.api_url, {"query": "q"}, "token", "poll")
+        assert api.breaker.state == "half_open" and api.breaker.allow()
+        api.breaker.release_probe()
+
+        async def failed_attempts(url, payload, token, operation):
+            calls.append(operation)
+            return 503, None
+
+        api._send_attempts = failed_attempts
+        # A failed combined probe does not fan out into the separate legacy calls
+        return await api.poll_user("token", 1)
+
+    api._send_attempts = cancelled_attempts
+    assert asyncio.run(run()) is None
+    assert calls == ["poll", "poll"]
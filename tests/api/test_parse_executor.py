@@ -0,0 +1,69 @@
+"""
+Test Parse Executor
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.grade_parser import parse_grade_page
+from university.api_client_v2 import UniversityAPIV2
+from university.parse_executor import ParseExecutor
+
+PAGE = {"panels": [{"blocks": [{"body": (
+    "<table><tr><th>المقرر</th><th>الرمز</th></tr>"
+    "<tr><td>رياضيات</td><td>MATH101</td><td>6</td><td>30</td><td>50</td><td>80 %</td></tr></table>"
+)}]}]}
+
+
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+def test_executor_kinds_return_same_grades(kind):
+    executor = ParseExecutor(kind=kind, workers=1, max_pending=2)
+    try:
+        grades = asyncio.run(executor.run(parse_grade_page, PAGE))
+    finally:
+        executor.shutdown()
+    assert grades == parse_grade_page(PAGE)
+    assert executor.get_stats()["completed"] == 1
+
+
+def test_pending_limit_queues_callers():
+    executor = ParseExecutor(kind="thread", workers=2, max_pending=2)
+
+    async def run_many():
+        return await asyncio.gather(*(executor.run(parse_grade_page, PAGE) for _ in range(8)))
+
+    try:
+        results = asyncio.run(run_many())
+    finally:
+        executor.shutdown()
+    stats = executor.get_stats()
+    assert len(results) == 8
+    assert stats["completed"] == 8
+    assert stats["max_waiting"] >= 6
+    assert stats["waiting"] == 0 and stats["running"] == 0
+
+
+def test_close_does_not_block_the_loop():
+    api = UniversityAPIV2()
+    api.parse_executor = ParseExecutor(kind="thread", workers=1, max_pending=1)
+
+    async def close_during_parse():
+        job = asyncio.ensure_future(api.parse_executor.run(time.sleep, 0.3))
+        await asyncio.sleep(0.05)
+        closing = asyncio.ensure_future(api.close())
+        started = time.monotonic()
+        await asyncio.sleep(0.01)
+        lag = time.monotonic() - started
+        await closing
+        await job
+        return lag
+
+    # The running parse job still finishes, but the loop keeps serving meanwhile
+    assert asyncio.run(close_during_parse()) < 0.1
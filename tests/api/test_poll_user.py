@@ -0,0 +1,108 @@
+"""
+Test Combined Poll Request
+"""
+
+import os
+import sys
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.api_client_v2 import UniversityAPIV2
+
+USER = {"id": "1", "username": "ENG2425041", "fullname": "طالب", "firstname": "", "lastname": "", "email": ""}
+GRADES_HTML = (
+    "<table><tr><th>المقرر</th><th>الرمز</th></tr>"
+    "<tr><td>رياضيات</td><td>MATH101</td><td>6</td><td>30</td><td>50</td><td>80 %</td></tr></table>"
+)
+HOMEPAGE = {"panels": [{"blocks": [{"type": "tabs", "config": [{"name": "tabs", "array": [
+    {"array": [
+        {"name": "label", "value": "الفصل الثاني"},
+        {"name": "page_params", "array": [{"name": "t_grade_id", "value": "10459"}]},
+    ]},
+]}]}]}]}
+
+
+def make_api(gui_user=USER):
+    api = UniversityAPIV2()
+    operations = []
+
+    async def fake_send(url, payload, token, operation):
+        operations.append(payload.get("operationName", operation))
+        data = {"getGUI": {"user": gui_user}}
+        if payload.get("operationName") == "pollUserHomepage":
+            data["homepage"] = HOMEPAGE
+        elif payload.get("operationName") == "pollUser":
+            data["grades"] = {"panels": [{"blocks": [{"body": GRADES_HTML}]}]}
+        else:
+            data["getPage"] = {"panels": [{"blocks": [{"body": GRADES_HTML}]}]}
+        return 200, {"data": data}
+
+    api._send = fake_send
+    return api, operations
+
+
+def test_combined_poll_is_one_round_trip_with_cached_terms():
+    api, operations = make_api()
+    first = asyncio.run(api.poll_user("token", telegram_id=1))
+    second = asyncio.run(api.poll_user("token", telegram_id=1))
+    assert operations == ["pollUserHomepage", "getPage", "pollUser"]
+    assert first["token_valid"] and second["token_valid"]
+    assert second["username"] == "ENG2425041"
+    assert second["grades"][0]["code"] == "MATH101"
+    assert second["grades"][0]["term_id"] == "10459"
+
+
+def test_combined_poll_reports_invalid_token():
+    api, _ = make_api(gui_user=None)
+    # A missing user without an auth error is retried before the token counts as rejected
+    assert asyncio.run(api.poll_user("token", telegram_id=1)) is None
+    assert asyncio.run(api.poll_user("token", telegram_id=1)) is None
+    assert asyncio.run(api.poll_user("token", telegram_id=1)) == {"token_valid": False}
+
+
+def test_legacy_mode_uses_separate_calls():
+    api, operations = make_api()
+    api.poll_mode = "legacy"
+    result = asyncio.run(api.poll_user("token", telegram_id=1))
+    assert result["token_valid"]
+    assert len(operations) > 1 and "pollUser" not in operations
+
+
+def test_empty_term_page_costs_no_extra_requests():
+    api, operations = make_api()
+    api.term_cache.put(1, [("الفصل الثاني", "10459")])
+
+    async def empty_page(url, payload, token, operation):
+        operations.append(payload.get("operationName", operation))
+        return 200, {"data": {"getGUI": {"user": USER}, "grades": {"panels": []}}}
+
+    api._send = empty_page
+    result = asyncio.run(api.poll_user("token", telegram_id=1))
+    assert operations == ["pollUser"] and result["grades"] == []
+    # A fresh term list is trusted; one older than the recheck period is read again next poll
+    assert api.term_cache.get(1)
+    api.term_recheck_seconds = 0
+    asyncio.run(api.poll_user("token", telegram_id=1))
+    assert api.term_cache.get(1) is None
+
+
+def test_overlapping_polls_share_one_request():
+    api, operations = make_api()
+    api.term_cache.put(1, [("الفصل الثاني", "10459")])
+    send = api._send
+
+    async def slow_send(url, payload, token, operation):
+        await asyncio.sleep(0.05)
+        return await send(url, payload, token, operation)
+
+    api._send = slow_send
+
+    async def overlap():
+        return await asyncio.gather(*(api.poll_user("token", telegram_id=1, parse=False) for _ in range(3)))
+
+    results = asyncio.run(overlap())
+    assert operations == ["pollUser"]
+    parsed = [asyncio.run(api.finish_poll(result, 1)) for result in results]
+    assert all(result["grades"][0]["code"] == "MATH101" for result in parsed)
@@ -0,0 +1,59 @@
+"""
+Test Minimal GraphQL Queries and Persisted Queries
+"""
+
+import os
+import sys
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from config import UNIVERSITY_QUERIES
+from university.api_client_v2 import UniversityAPIV2
+
+
+def test_minimal_queries_keep_parsed_fields():
+    homepage = UNIVERSITY_QUERIES["GET_HOMEPAGE_MIN"]
+    for field in ("panels", "blocks", "type", "config", "name", "value", "array"):
+        assert field in homepage
+    assert homepage.count("array") == 3
+    assert "body" in UNIVERSITY_QUERIES["GET_GRADES_MIN"]
+    assert len(UNIVERSITY_QUERIES["GET_GRADES_MIN"]) < len(UNIVERSITY_QUERIES["GET_GRADES"])
+
+
+def test_query_set_selection():
+    api = UniversityAPIV2()
+    api.query_set = "minimal"
+    assert api._query("GET_GRADES") == UNIVERSITY_QUERIES["GET_GRADES_MIN"]
+    api.query_set = "full"
+    assert api._query("GET_GRADES") == UNIVERSITY_QUERIES["GET_GRADES"]
+
+
+def test_persisted_query_falls_back_on_miss():
+    api = UniversityAPIV2()
+    api.apq_enabled = True
+    sent = []
+    server_cache = set()
+
+    async def fake_send(url, payload, token, operation):
+        sent.append(payload)
+        query_hash = payload["extensions"]["persistedQuery"]["sha256Hash"]
+        if "query" in payload:
+            server_cache.add(query_hash)
+        elif query_hash not in server_cache:
+            return 200, {"errors": [{"message": "PersistedQueryNotFound"}]}
+        return 200, {"data": {"ok": True}}
+
+    api._send = fake_send
+    payload = {"query": "query { ok }"}
+    asyncio.run(api._post_json("url", payload))
+    asyncio.run(api._post_json("url", payload))
+    assert "query" in sent[0]
+    assert "query" not in sent[1]
+
+    # Server restarted and lost its cache: resend the document once
+    server_cache.clear()
+    status, data = asyncio.run(api._post_json("url", payload))
+    assert data == {"data": {"ok": True}}
+    assert "query" not in sent[2] and "query" in sent[3]
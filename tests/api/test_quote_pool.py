@@ -0,0 +1,138 @@
+"""
+Test Quote Pool
+"""
+
+import os
+import sys
+import asyncio
+
+import aiohttp
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from utils import quote_pool
+from utils.quote_pool import FALLBACK_QUOTES, GENERAL, QuotePool
+
+
+def _no_network(*args, **kwargs):
+    raise AssertionError("quote picked over the network")
+
+
+def test_pick_is_memory_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(aiohttp, "ClientSession", _no_network)
+    pool = QuotePool(path=str(tmp_path / "quote_pool.json"))
+    # Empty pool: built-in quotes
+    assert pool.pick(["excellence"]) in FALLBACK_QUOTES
+
+    pool.add(GENERAL, [{"text": "Keep going.", "author": "A", "philosophy": GENERAL}])
+    pool.add("excellence", [{"text": "Aim high.", "author": "B", "philosophy": "excellence"}])
+    assert pool.pick(["excellence"])["text"] == "Aim high."
+    assert pool.pick("excellence")["text"] == "Aim high."
+    # A category with no quotes falls back to the general bucket
+    assert pool.pick(["perseverance"])["text"] == "Keep going."
+
+
+def test_refresh_merges_and_persists(tmp_path, monkeypatch):
+    path = str(tmp_path / "quote_pool.json")
+
+    async def translate(text, target_lang="ar"):
+        return f"ع {text}"
+
+    monkeypatch.setattr(quote_pool, "translate_text", translate)
+    pool = QuotePool(path=path, per_category=3, api_key="key")
+    calls = []
+
+    async def fetch_general(session):
+        return [{"text": f"general {i}", "author": "", "philosophy": GENERAL} for i in range(5)]
+
+    async def fetch_category(session, category, source):
+        calls.append(source)
+        if source == "failure":
+            raise aiohttp.ClientError("down")
+        return [{"text": f"{category} quote", "author": "", "philosophy": category}]
+
+    pool._fetch_general = fetch_general
+    pool._fetch_category = fetch_category
+    assert asyncio.run(pool.refresh()) == 5 + 5
+    assert "learning" in calls and "failure" in calls
+    # Newest kept, no duplicates
+    assert [q["text"] for q in pool.buckets[GENERAL]] == ["general 2", "general 3", "general 4"]
+    assert len(pool.buckets["achievement"]) == 1
+    # Arabic is precomputed for every pooled quote
+    assert pool.buckets["achievement"][0]["ar"] == "ع achievement quote"
+
+    # A new process starts from the saved pool and does not fetch again yet
+    warm = QuotePool(path=path)
+    assert warm.size() == pool.size() and warm.refreshed_at == pool.refreshed_at
+    refreshes = []
+
+    async def count_refresh():
+        refreshes.append(1)
+        return 0
+
+    warm.refresh = count_refresh
+
+    async def run_briefly():
+        try:
+            await asyncio.wait_for(warm.run(lambda: True), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run_briefly())
+    assert refreshes == []
+
+
+def test_empty_refresh_retries_with_backoff(tmp_path):
+    pool = QuotePool(path=str(tmp_path / "quote_pool.json"), api_key="")
+    pool.retry_seconds = 0.05
+    calls = []
+
+    async def fetch_general(session):
+        calls.append(1)
+        return []
+
+    pool._fetch_general = fetch_general
+
+    async def run_briefly():
+        try:
+            await asyncio.wait_for(pool.run(lambda: True), 0.3)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run_briefly())
+    # Retried after 0.05, 0.1 and 0.2 seconds instead of a full refresh period
+    assert 2 <= len(calls) <= 4
+    assert pool.refreshed_at == 0 and not os.path.exists(pool.path)
+
+
+def test_translation_is_bounded_and_failures_wait(tmp_path, monkeypatch):
+    running = []
+    overlaps = []
+
+    async def translate(text, target_lang="ar"):
+        running.append(text)
+        overlaps.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(text)
+        # translate_text hands back the original text when it fails
+        return text if text.startswith("bad") else f"ع {text}"
+
+    monkeypatch.setattr(quote_pool, "translate_text", translate)
+    pool = QuotePool(path=str(tmp_path / "quote_pool.json"))
+    pool.translate_concurrency = 2
+    pool.add(GENERAL, [{"text": f"{kind} {i}", "author": "", "philosophy": GENERAL} for kind in ("good", "bad") for i in range(3)])
+
+    assert asyncio.run(pool.translate_missing()) == 3
+    assert max(overlaps) == 2
+    assert all(quote.get("ar_failed_at") for quote in pool.buckets[GENERAL] if quote["text"].startswith("bad"))
+    # Failed quotes are not tried again on the next refresh
+    overlaps.clear()
+    assert asyncio.run(pool.translate_missing()) == 0 and overlaps == []
+
+    # Quotes left when the budget runs out stay untranslated and unmarked
+    pool.translate_budget_seconds = 0.01
+    pool.add(GENERAL, [{"text": "late", "author": "", "philosophy": GENERAL}])
+    assert asyncio.run(pool.translate_missing()) == 0
+    late = pool.buckets[GENERAL][-1]
+    assert "ar" not in late and "ar_failed_at" not in late
@@ -0,0 +1,69 @@
+"""
+Test Single-Flight Coalescing
+"""
+
+import os
+import sys
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.singleflight import SingleFlight
+from university.api_client_v2 import UniversityAPIV2
+
+
+def test_concurrent_calls_share_one_fetch():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"grades": []}
+
+    async def run():
+        return await asyncio.gather(*(flight.do(("user_data", 1), fetch) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results[0] is results[1] is results[2]
+    assert flight.get_stats() == {"in_flight": 0, "calls": 1, "saved": 2}
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_get_user_data_is_coalesced_per_user():
+    api = UniversityAPIV2()
+    fetched = []
+
+    async def fake_fetch(token, telegram_id=None):
+        fetched.append(telegram_id)
+        await asyncio.sleep(0.01)
+        return {"username": "u", "grades": []}
+
+    api._fetch_user_data = fake_fetch
+
+    async def run():
+        return await asyncio.gather(
+            api.get_user_data("t1", 1), api.get_user_data("t1", 1), api.get_user_data("t2", 2)
+        )
+
+    asyncio.run(run())
+    assert sorted(fetched) == [1, 2]
+    assert api.single_flight.get_stats()["saved"] == 1
@@ -0,0 +1,116 @@
+"""
+Test Term Catalog Cache
+"""
+
+import os
+import sys
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.term_cache import TermCatalogCache
+from university.api_client_v2 import UniversityAPIV2
+
+TERMS = [("الفصل الثاني 2024-2025", "10459"), ("الفصل الأول 2024-2025", "10458")]
+
+
+@pytest.fixture
+def grade_storage(tmp_path):
+    url = f"sqlite:///{tmp_path / 'terms.db'}"
+    users = UserStorageV2(url)
+    users.save_user(1, "ENG2425041", "token-1", {"fullname": "طالب"})
+    users.save_user(2, "ENG2425042", "token-2", {"fullname": "طالب"})
+    return GradeStorageV2(url)
+
+
+def test_cache_hit_and_shared_catalog():
+    cache = TermCatalogCache(ttl_hours=1)
+    cache.put(1, TERMS)
+    cache.put(2, list(TERMS))
+    assert cache.get(1) == TERMS
+    assert cache.get_stats()["distinct_catalogs"] == 1
+    assert cache._entries[1][0] is cache._entries[2][0]
+
+
+def test_cache_expires_and_invalidates():
+    cache = TermCatalogCache(ttl_hours=1)
+    cache.put(1, TERMS)
+    catalog, _ = cache._entries[1]
+    cache._entries[1] = (catalog, datetime.utcnow() - timedelta(hours=2))
+    assert cache.get(1) is None
+    cache.put(1, TERMS)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_catalog_persists_across_restarts(grade_storage):
+    TermCatalogCache(grade_storage, ttl_hours=1).put(1, TERMS)
+    restarted = TermCatalogCache(grade_storage, ttl_hours=1)
+    assert restarted.get(1) == TERMS
+    restarted.invalidate(1)
+    assert TermCatalogCache(grade_storage, ttl_hours=1).get(1) is None
+
+
+def test_steady_state_poll_skips_homepage():
+    api = UniversityAPIV2()
+    calls = []
+
+    async def fake_homepage(token):
+        calls.append("homepage")
+        return {"panels": []}
+
+    async def fake_term_grades(token, term_id):
+        calls.append(term_id)
+        return [{"name": "Math", "code": "MATH101", "total": "90 %"}]
+
+    api.get_homepage_data = fake_homepage
+    api.extract_terms_from_homepage = lambda data: TERMS
+    api.get_term_grades = fake_term_grades
+
+    asyncio.run(api.get_current_grades("token", telegram_id=1))
+    asyncio.run(api.get_current_grades("token", telegram_id=1))
+    assert calls == ["homepage", "10459", "10459"]
+
+
+def test_new_term_takes_current_flag(grade_storage):
+    from storage.grade_storage_v2 import Term
+    grade_storage.save_term_catalog(1, TERMS[1:])
+    grade_storage.save_term_catalog(1, TERMS)
+    with grade_storage.db_manager.get_session() as session:
+        current = {term.term_id for term in session.query(Term).filter_by(is_current=True)}
+    assert current == {"10459"}
+
+
+def test_unused_catalogs_are_dropped():
+    cache = TermCatalogCache(ttl_hours=1, max_catalogs=2)
+    for term_id in range(5):
+        cache.put(1, [("term", str(term_id))])
+    assert cache.get_stats()["distinct_catalogs"] <= 2
+    assert cache.get(1) == [("term", "4")]
+
+
+def test_empty_term_refetches_list_once_per_period():
+    api = UniversityAPIV2()
+    calls = []
+
+    async def fake_homepage(token):
+        calls.append("homepage")
+        return {"panels": []}
+
+    async def fake_term_grades(token, term_id):
+        calls.append(term_id)
+        return []
+
+    api.get_homepage_data = fake_homepage
+    api.extract_terms_from_homepage = lambda data: TERMS
+    api.get_term_grades = fake_term_grades
+
+    asyncio.run(api.get_current_grades("token", telegram_id=1))
+    asyncio.run(api.get_current_grades("token", telegram_id=1))
+    assert calls.count("homepage") == 1
@@ -0,0 +1,107 @@
+"""
+Test Token Validity Tracking
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from university.token_tracker import TokenTracker, is_auth_failure
+from university.api_client_v2 import UniversityAPIV2
+
+
+def test_auth_failure_detection():
+    assert is_auth_failure(401, None)
+    assert is_auth_failure(200, {"errors": [{"message": "Unauthorized"}], "data": None})
+    assert is_auth_failure(200, {"errors": [{"message": "x", "extensions": {"code": "UNAUTHENTICATED"}}]})
+    assert not is_auth_failure(200, {"data": {"getPage": {}}})
+    assert not is_auth_failure(500, None)
+
+
+def test_probe_only_when_stale():
+    tracker = TokenTracker(stale_minutes=10)
+    assert tracker.needs_probe("t")
+    tracker.mark_verified("t")
+    assert not tracker.needs_probe("t")
+    tracker.stale_seconds = 0
+    assert tracker.needs_probe("t")
+    tracker.mark_invalid("t")
+    assert tracker.is_invalid("t")
+
+
+def test_legacy_poll_skips_test_token_for_recently_verified_token():
+    api = UniversityAPIV2()
+    api.poll_mode = "legacy"
+    operations = []
+
+    async def fake_send(url, payload, token, operation):
+        operations.append(operation)
+        api.token_tracker.mark_verified(token)
+        if operation == "homepage":
+            return 200, {"data": {"getPage": {"panels": []}}}
+        return 200, {"data": {"getGUI": {"user": {"id": "1"}}, "getPage": {"panels": []}}}
+
+    api._send = fake_send
+    asyncio.run(api.poll_user("token", 1))
+    assert operations[0] == "test_token"
+    operations.clear()
+    asyncio.run(api.poll_user("token", 1))
+    assert "test_token" not in operations
+
+
+def test_rejected_token_stops_polling():
+    api = UniversityAPIV2()
+    calls = []
+
+    async def fake_send(url, payload, token, operation):
+        calls.append(operation)
+        api.token_tracker.mark_invalid(token)
+        return 401, None
+
+    api._send = fake_send
+    assert asyncio.run(api.poll_user("token", 1)) == {"token_valid": False}
+    assert asyncio.run(api.poll_user("token", 1)) == {"token_valid": False}
+    assert calls == ["poll"]
+
+
+def test_outage_does_not_look_like_a_rejected_token():
+    api = UniversityAPIV2()
+    api.poll_mode = "legacy"
+    responses = [(503, None), asyncio.TimeoutError()]
+
+    async def fake_send(url, payload, token, operation):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    api._send = fake_send
+    assert asyncio.run(api.test_token("token")) is None
+    assert asyncio.run(api.poll_user("token", 1)) is None
+    assert not api.token_tracker.is_invalid("token")
+
+
+def test_missing_user_needs_a_streak():
+    tracker = TokenTracker(missing_user_limit=3)
+    assert not tracker.record_user("t", False)
+    assert not tracker.record_user("t", False)
+    # A response with the user breaks the streak
+    assert not tracker.record_user("t", True)
+    assert not tracker.record_user("t", False) and not tracker.record_user("t", False)
+    assert not tracker.is_invalid("t")
+    assert tracker.record_user("t", False) and tracker.is_invalid("t")
+
+
+def test_rejected_tokens_expire_and_are_bounded():
+    tracker = TokenTracker(invalid_ttl_hours=1, max_entries=3)
+    for token in ("a", "b", "c", "d"):
+        tracker.mark_invalid(token)
+    assert tracker.get_stats()["invalid"] == 3
+    assert not tracker.is_invalid("a") and tracker.is_invalid("d")
+    tracker._invalid[tracker._key("d")] = time.monotonic() - 3600
+    assert not tracker.is_invalid("d")
+    assert tracker.get_stats()["invalid"] == 2
@@ -0,0 +1,107 @@
+"""
+Test Translation Cache and Worker
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from storage.translation_storage import TranslationStorage
+from utils import analytics
+from utils.analytics import GradeAnalytics
+from utils.translation import TranslationCache, TranslationService, TranslationWorker
+
+
+def _service(calls, result="المعرفة قوة", delay=0.05, **worker_args):
+    worker = TranslationWorker(workers=2, **worker_args)
+
+    def translate_once(text, target_lang):
+        calls.append(text)
+        time.sleep(delay)
+        return result
+
+    worker._translate_once = translate_once
+    return TranslationService(TranslationCache(max_entries=10), worker)
+
+
+def test_same_text_translated_once_and_persisted(tmp_path):
+    storage = TranslationStorage(f"sqlite:///{tmp_path / 'translations.db'}")
+    calls = []
+    service = _service(calls)
+    service.cache.attach_storage(storage)
+
+    async def run():
+        return await asyncio.gather(*(service.translate("Knowledge is power.") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["المعرفة قوة"] * 5
+    assert calls == ["Knowledge is power."]
+    assert asyncio.run(service.translate("Knowledge is power.")) == "المعرفة قوة"
+    assert calls == ["Knowledge is power."]
+
+    # A restarted process finds it in memory without translating again
+    restarted = _service(calls)
+    restarted.cache.attach_storage(storage)
+    assert restarted.lookup("Knowledge is power.") == "المعرفة قوة"
+
+
+def test_failed_translation_stops_at_budget():
+    calls = []
+    service = _service(calls, result=None, delay=0.01, budget_seconds=0.5, max_attempts=50, backoff_seconds=0.05)
+    started = time.monotonic()
+    assert asyncio.run(service.translate("Knowledge is power.")) is None
+    elapsed = time.monotonic() - started
+    # Backoff doubles (0.05, 0.1, 0.2, ...) so the budget allows only a few attempts
+    assert elapsed < 1.0 and 2 <= len(calls) <= 6
+    assert service.lookup("Knowledge is power.") is None
+
+
+def test_quote_render_never_waits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    service = _service(calls, delay=0.3)
+    monkeypatch.setattr(analytics, "translation_service", service)
+    grade_analytics = GradeAnalytics(None)
+    quote = {"text": "Knowledge is power.", "author": "Francis Bacon"}
+
+    async def run():
+        started = time.monotonic()
+        first = await grade_analytics.format_quote_dual_language(quote)
+        elapsed = time.monotonic() - started
+        # The background translation lands in the cache for the next render
+        await asyncio.sleep(0.5)
+        return first, elapsed, await grade_analytics.format_quote_dual_language(quote)
+
+    first, elapsed, second = asyncio.run(run())
+    assert elapsed < 0.1 and "المعرفة قوة" not in first
+    assert '"المعرفة قوة"' in second
+    # Quotes with precomputed Arabic render it directly
+    assert "جاهز" in asyncio.run(grade_analytics.format_quote_dual_language({**quote, "ar": "جاهز"}))
+    assert calls == ["Knowledge is power."]
+
+
+def test_timed_out_call_keeps_its_slot():
+    worker = TranslationWorker(workers=2, max_pending=1, budget_seconds=0.2, max_attempts=1)
+    running = []
+    overlaps = []
+
+    def translate_once(text, target_lang):
+        running.append(text)
+        overlaps.append(len(running))
+        time.sleep(0.3 if text == "slow" else 0.05)
+        running.remove(text)
+        return f"ترجمة {text}"
+
+    worker._translate_once = translate_once
+
+    async def run():
+        return await asyncio.gather(worker.translate("slow", "ar"), worker.translate("fast", "ar"))
+
+    slow, fast = asyncio.run(run())
+    # The second text waits for the stuck thread, then gets its whole budget
+    assert slow is None and fast == "ترجمة fast"
+    assert max(overlaps) == 1
+    worker.shutdown()
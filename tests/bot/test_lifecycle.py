@@ -0,0 +1,92 @@
+"""
+Test User Lifecycle Parking
+"""
+
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import Forbidden
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.core import TelegramBot
+from bot.poll_pipeline import PollJob
+from bot.send_dispatcher import SendDispatcher
+from storage.user_storage_v2 import POLLABLE_STATES, REACHABLE_STATES, UserStorageV2
+
+
+def make_users(tmp_path, count=4):
+    storage = UserStorageV2(f"sqlite:///{tmp_path / 'lifecycle.db'}")
+    for telegram_id in range(1, count + 1):
+        storage.save_user(telegram_id, f"ENG{telegram_id:07d}", f"token-{telegram_id}", {})
+    return storage
+
+
+def test_parked_users_leave_poll_and_fanout_queries(tmp_path):
+    storage = make_users(tmp_path)
+    assert storage.set_lifecycle_state(2, "token_expired")
+    assert storage.set_lifecycle_state(3, "blocked")
+    assert not storage.set_lifecycle_state(3, "blocked")
+
+    assert [u["telegram_id"] for u in storage.iter_users(batch_size=2)] == [1, 4]
+    assert [u["telegram_id"] for u in storage.get_all_users(REACHABLE_STATES)] == [1, 2, 4]
+    assert storage.count_users(POLLABLE_STATES) == 2 and len(storage.get_all_users()) == 4
+    assert storage.count_users_by_state() == {"active": 2, "token_expired": 1, "blocked": 1}
+
+    # Logging in again reactivates
+    storage.save_user(2, "ENG0000002", "token-new", {})
+    assert storage.get_user(2)["lifecycle_state"] == "active"
+
+
+def test_blocked_send_and_dead_token_park_the_user(tmp_path):
+    storage = make_users(tmp_path, 2)
+
+    class FakeTelegram:
+        async def send_message(self, chat_id, text, **kwargs):
+            raise Forbidden("bot was blocked by the user")
+
+    class FakeApi:
+        breaker = SimpleNamespace(is_open=lambda: False)
+
+        async def poll_user(self, token, telegram_id, page_digests, parse=True):
+            return {"token_valid": False}
+
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.user_storage = storage
+    bot.grade_storage = SimpleNamespace(get_grade_snapshots=lambda telegram_id: {})
+    bot.university_api = FakeApi()
+    bot.shard_coordinator = None
+    bot.poll_cycle_stats = {"pages": 0, "unchanged": 0, "paused": 0}
+    dispatcher = SendDispatcher(FakeTelegram, rate=1000, per_chat_interval=0, on_unreachable=bot._park_unreachable)
+
+    assert asyncio.run(dispatcher.send(1, "hi")) == "blocked"
+    assert storage.get_user(1)["lifecycle_state"] == "blocked"
+
+    job = asyncio.run(bot._poll_stage_fetch(PollJob(storage.get_user(2))))
+    assert job.expired
+    assert storage.get_user(2)["lifecycle_state"] == "token_expired"
+    assert storage.count_users(POLLABLE_STATES) == 0
+
+
+def test_unknown_token_state_skips_the_cycle(tmp_path):
+    storage = make_users(tmp_path, 1)
+
+    class FakeApi:
+        breaker = SimpleNamespace(is_open=lambda: False)
+
+        async def poll_user(self, token, telegram_id, page_digests, parse=True):
+            # Timeout or server error: validity unknown
+            return None
+
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.user_storage = storage
+    bot.grade_storage = SimpleNamespace(get_grade_snapshots=lambda telegram_id: {})
+    bot.university_api = FakeApi()
+    bot.shard_coordinator = None
+    bot.poll_cycle_stats = {"pages": 0, "unchanged": 0, "paused": 0}
+
+    assert asyncio.run(bot._poll_stage_fetch(PollJob(storage.get_user(1)))) is None
+    assert storage.get_user(1)["lifecycle_state"] == "active"
@@ -0,0 +1,197 @@
+"""
+Test Notification Outbox and its Delivery Worker
+"""
+
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime
+
+from telegram.error import Forbidden
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.core import TelegramBot
+from bot.outbox_worker import OutboxWorker, notification_key
+from bot.poll_pipeline import PollJob
+from bot.poll_policy import PollPolicy
+from bot.send_dispatcher import SendDispatcher
+from storage.grade_storage_v2 import GradeStorageV2
+from storage.user_storage_v2 import UserStorageV2
+from university.grade_diff import change_entries, diff_grades, format_changes_message, grades_fingerprint
+from university.grade_record import Grade
+
+MATH = Grade(name="رياضيات", code="MATH101", coursework="28", total="80 %", term_id="10459")
+
+
+class FlakyBot:
+    """Fails the first `failures` sends to each chat, then delivers"""
+
+    def __init__(self, failures=0, errors=None):
+        self.failures = failures
+        self.errors = errors or {}
+        self.calls = {}
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls[chat_id] = self.calls.get(chat_id, 0) + 1
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        if self.calls[chat_id] <= self.failures:
+            raise RuntimeError("telegram hiccup")
+        self.sent.append((chat_id, text, kwargs))
+
+
+def _storages(tmp_path, users=(1,)):
+    url = f"sqlite:///{tmp_path / 'outbox.db'}"
+    user_storage = UserStorageV2(url)
+    for telegram_id in users:
+        user_storage.save_user(telegram_id, f"ENG{telegram_id:07d}", f"token-{telegram_id}", {})
+    return user_storage, GradeStorageV2(url)
+
+
+def test_persist_queues_notification_with_snapshot(tmp_path):
+    _, storage = _storages(tmp_path)
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.grade_storage = storage
+    bot.user_storage = None
+    bot.poll_policy = PollPolicy()
+    bot.poll_states = {}
+    bot._propagate_publications = lambda telegram_id, changes: None
+    bot.outbox_worker = OutboxWorker(storage, dispatcher=None)
+
+    fingerprint = grades_fingerprint([MATH])
+    job = PollJob({"telegram_id": 1}, result={"page_digest": "d" * 64}, grades=[MATH], term_id="10459",
+                  fingerprint=fingerprint, changes=[object()], message="🎓 MATH101")
+    assert bot._poll_stage_persist(job) is True
+    assert storage.get_grade_snapshots(1)["10459"]["fingerprint"] == fingerprint
+    assert storage.get_outbox_stats() == {"pending": 1}
+
+    # The same change written again (a retried transaction) queues nothing new
+    notification = {"kind": "grades", "message": "🎓 MATH101",
+                    "idempotency_key": notification_key("grades", 1, "10459", 0, fingerprint)}
+    assert storage.save_grade_snapshot(1, "10459", [MATH], fingerprint, "d" * 64, notification=notification) is None
+    assert storage.enqueue_notification(1, **notification) is False
+    assert storage.get_outbox_stats() == {"pending": 1}
+
+
+def test_returning_to_earlier_grades_is_notified_again(tmp_path):
+    _, storage = _storages(tmp_path)
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.grade_storage = storage
+    bot.user_storage = None
+    bot.poll_policy = PollPolicy()
+    bot.poll_states = {}
+    bot._propagate_publications = lambda telegram_id, changes: None
+    bot.outbox_worker = OutboxWorker(storage, dispatcher=None)
+
+    corrected = Grade(name="رياضيات", code="MATH101", coursework="30", total="82 %", term_id="10459")
+    # A -> B -> A -> B: every change is its own notice
+    for grades in ([MATH], [corrected], [MATH], [corrected]):
+        job = PollJob({"telegram_id": 1}, result={}, grades=grades, term_id="10459",
+                      snapshots=storage.get_grade_snapshots(1), fingerprint=grades_fingerprint(grades),
+                      changes=[object()], message="🎓 MATH101")
+        assert bot._poll_stage_persist(job) is True
+        for item in storage.claim_notifications(10, lease_seconds=60):
+            storage.finish_notification(item["id"], "sent")
+    assert storage.get_outbox_stats() == {"sent": 4}
+
+
+def test_worker_retries_then_delivers_once(tmp_path):
+    _, storage = _storages(tmp_path, users=(1, 2))
+    storage.enqueue_notification(1, "grades", "🎓 update", notification_key("grades", 1, "t", "f"))
+    storage.enqueue_notification(2, "token_expired", "⏰ login again", notification_key("token_expired", 2, "x"))
+    fake = FlakyBot(failures=1, errors={2: Forbidden("bot was blocked by the user")})
+    dispatcher = SendDispatcher(lambda: fake, rate=1000, per_chat_interval=0, workers=2, retries=0)
+    worker = OutboxWorker(storage, dispatcher, reply_markups={"token_expired": "keyboard"}, max_attempts=3)
+    worker._retry_delay = lambda attempts: 0.3
+
+    # First round: user 1 hits a send error and is rescheduled, user 2 blocked the bot
+    assert asyncio.run(worker.drain_once()) == 2
+    assert storage.get_outbox_stats() == {"pending": 1, "undeliverable": 1}
+    assert fake.sent == []
+
+    # Nothing is due until the backoff runs out
+    assert asyncio.run(worker.drain_once()) == 0
+    time.sleep(0.35)
+    assert asyncio.run(worker.drain_once()) == 1
+    assert [chat for chat, _, _ in fake.sent] == [1]
+    assert storage.get_outbox_stats() == {"sent": 1, "undeliverable": 1}
+    assert asyncio.run(worker.drain_once()) == 0
+
+
+def test_claimed_rows_are_hidden_from_other_workers(tmp_path):
+    _, storage = _storages(tmp_path)
+    storage.enqueue_notification(1, "grades", "🎓 update", notification_key("grades", 1, "t", "f"))
+    assert len(storage.claim_notifications(10, lease_seconds=0.2)) == 1
+    assert storage.claim_notifications(10, lease_seconds=0.2) == []
+    # A worker that died mid-send gives the row back when its claim runs out
+    time.sleep(0.25)
+    claimed = storage.claim_notifications(10, lease_seconds=60)
+    assert [item["attempts"] for item in claimed] == [0]
+
+
+def test_changes_within_window_go_out_as_one_message(tmp_path):
+    _, storage = _storages(tmp_path)
+    coursework = Grade(name="رياضيات", code="MATH101", coursework="30", total="لم يتم النشر", term_id="10459")
+    exam = Grade(name="رياضيات", code="MATH101", coursework="30", final_exam="50", total="لم يتم النشر", term_id="10459")
+    published = Grade(name="رياضيات", code="MATH101", coursework="30", final_exam="50", total="80 %", term_id="10459")
+    previous = Grade(name="رياضيات", code="MATH101", coursework="28", total="لم يتم النشر", term_id="10459")
+    for old, new in ((previous, coursework), (coursework, exam), (exam, published)):
+        entries = change_entries(diff_grades([old], [new]))
+        message = format_changes_message(entries, datetime(2026, 1, 1))
+        key = notification_key("grades", 1, "10459", grades_fingerprint([new]))
+        assert storage.enqueue_notification(1, "grades", message, key, changes=entries, hold_seconds=0.3)
+    # Held for the window, then one message with every field
+    assert storage.claim_notifications(10, lease_seconds=60) == []
+    time.sleep(0.35)
+    claimed = storage.claim_notifications(10, lease_seconds=60)
+    assert len(claimed) == 1
+    assert "28 → 30" in claimed[0]["message"] and " → 50" in claimed[0]["message"]
+    assert "لم يتم النشر → 80 %" in claimed[0]["message"]
+
+    # Nothing merges into a notice that is already being sent
+    entries = change_entries(diff_grades([published], [MATH]))
+    assert storage.enqueue_notification(1, "grades", "later", notification_key("grades", 1, "x"), changes=entries)
+    assert storage.get_outbox_stats() == {"sending": 1, "pending": 1}
+
+
+def test_changes_that_cancel_out_send_nothing(tmp_path):
+    _, storage = _storages(tmp_path)
+    corrected = Grade(name="رياضيات", code="MATH101", coursework="30", total="82 %", term_id="10459")
+    for old, new in ((MATH, corrected), (corrected, MATH)):
+        entries = change_entries(diff_grades([old], [new]))
+        key = notification_key("grades", 1, "10459", grades_fingerprint([old]), grades_fingerprint([new]))
+        assert storage.enqueue_notification(1, "grades", "🎓", key, changes=entries, hold_seconds=60)
+    # Changed and changed back within the window: the waiting notice is dropped
+    assert storage.get_outbox_stats() == {}
+
+
+def test_saved_digest_window_is_read_back(tmp_path):
+    user_storage, _ = _storages(tmp_path)
+    assert user_storage.get_user(1)["digest_minutes"] is None
+    assert user_storage.set_digest_minutes(1, 30)
+    # The settings screen reads the user through get_user
+    assert TelegramBot._digest_minutes(user_storage.get_user(1)) == 30
+
+
+def test_new_course_alone_queues_no_notice(tmp_path):
+    _, storage = _storages(tmp_path)
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.grade_storage = storage
+    bot.user_storage = None
+    bot.poll_policy = PollPolicy()
+    bot.poll_states = {}
+    bot._propagate_publications = lambda telegram_id, changes: None
+    bot.outbox_worker = OutboxWorker(storage, dispatcher=None)
+    storage.save_grades(1, [MATH])
+
+    physics = Grade(name="فيزياء", code="PHYS101", total="70 %", term_id="10459")
+    job = PollJob({"telegram_id": 1, "username": "ENG1"}, result={"term_id": "10459"}, grades=[MATH, physics])
+    job = bot._poll_stage_diff(job)
+    # A course seen for the first time is stored without a header-only message
+    assert job.changes and not job.entries and job.message is None
+    assert bot._poll_stage_persist(job) is None
+    assert storage.get_outbox_stats() == {}
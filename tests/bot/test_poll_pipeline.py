@@ -0,0 +1,101 @@
+"""
+Test Staged Poll Pipeline
+"""
+
+import os
+import sys
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.poll_pipeline import Pipeline, PollJob, Stage
+from storage.user_storage_v2 import UserStorageV2
+
+
+def test_items_flow_through_every_stage():
+    seen = []
+
+    async def fetch(n):
+        await asyncio.sleep(0)
+        return None if n % 3 == 0 else n
+
+    def double(n):
+        if n == 4:
+            raise ValueError("bad page")
+        return n * 2
+
+    def record(n):
+        seen.append(n)
+        return n > 10
+
+    pipeline = Pipeline([Stage("fetch", fetch, 3), Stage("double", double, 2), Stage("record", record)], queue_size=2)
+    notified = asyncio.run(pipeline.run(iter(range(10))))
+
+    assert sorted(seen) == [2, 4, 10, 14, 16]
+    assert notified == 2
+    stats = pipeline.get_stats()
+    assert stats["last_fed"] == 10 and stats["last_completed"] == 2
+    assert stats["stages"]["fetch"]["dropped"] == 4
+    assert stats["stages"]["double"]["failed"] == 1
+    assert stats["stages"]["record"]["processed"] == 5
+
+
+def test_slow_stage_bounds_what_is_read_ahead():
+    queue_size = 2
+    pulled = []
+
+    def source():
+        for n in range(50):
+            pulled.append(n)
+            yield n
+
+    async def slow(n):
+        await asyncio.sleep(0.001)
+        # Source can only run ahead by the queues and the workers holding items
+        assert len(pulled) - n <= queue_size * 2 + 3
+        return n
+
+    pipeline = Pipeline([Stage("fetch", lambda n: n), Stage("slow", slow)], queue_size=queue_size)
+    assert asyncio.run(pipeline.run(source())) == 49
+    stats = pipeline.get_stats()["stages"]
+    assert stats["slow"]["max_depth"] <= queue_size
+
+
+def test_overlapping_runs_keep_their_own_queues():
+    seen = []
+
+    async def fetch(n):
+        await asyncio.sleep(0.001)
+        return n
+
+    def record(n):
+        seen.append(n)
+        return True
+
+    pipeline = Pipeline([Stage("fetch", fetch, 2), Stage("diff", lambda n: n, 2, threaded=True), Stage("record", record)], queue_size=1)
+
+    async def overlap():
+        # A manual check started while a scheduled cycle is still running
+        return await asyncio.wait_for(asyncio.gather(pipeline.run(iter(range(20))), pipeline.run(iter(range(100, 110)))), 5)
+
+    assert asyncio.run(overlap()) == [20, 10]
+    assert sorted(seen) == [*range(20), *range(100, 110)]
+    assert all(not stage.queues for stage in pipeline.stages)
+
+
+def test_inline_sync_stage_runs_one_worker():
+    assert Stage("persist", lambda job: job, 4).workers == 1
+    assert Stage("diff", lambda job: job, 4, threaded=True).workers == 4
+    job = PollJob({"telegram_id": 1, "username": "ENG1", "token": "secret"})
+    assert "secret" not in repr(job)
+
+
+def test_iter_users_pages_by_id(tmp_path):
+    storage = UserStorageV2(f"sqlite:///{tmp_path / 'users.db'}")
+    for telegram_id in range(1, 8):
+        storage.save_user(telegram_id, f"ENG{telegram_id:07d}", f"token-{telegram_id}", {})
+    storage.delete_user(3)
+    streamed = [user["telegram_id"] for user in storage.iter_users(batch_size=2)]
+    assert streamed == [user["telegram_id"] for user in storage.get_all_users()]
+    assert 3 not in streamed and len(streamed) == 6
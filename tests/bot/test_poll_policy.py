@@ -0,0 +1,95 @@
+"""
+Test Adaptive Per-User Poll Frequency
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.core import TelegramBot
+from bot.poll_policy import PollPolicy
+from bot.poll_scheduler import PollScheduler
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.grade_record import Grade
+
+NOW = datetime(2025, 6, 1, 12, 0)
+PENDING = [Grade(name="رياضيات", code="MATH101", total="80 %"), Grade(name="برمجة", code="CS202", total="لم يتم النشر")]
+PUBLISHED = [Grade(name="رياضيات", code="MATH101", total="80 %"), Grade(name="برمجة", code="CS202", total="75 %")]
+
+
+def policy():
+    return PollPolicy(hot_minutes=15, idle_minutes=60, settled_minutes=360, dormant_minutes=1440,
+                      hot_window_hours=48, dormant_after_days=14)
+
+
+def test_tiers_follow_publication_state():
+    p = policy()
+    waiting = p.next_state(None, PENDING, changed=False, now=NOW)
+    assert waiting["tier"] == "hot" and waiting["next_check_at"] == NOW + timedelta(minutes=15)
+    assert p.next_state(None, [], changed=False, now=NOW)["tier"] == "idle"
+
+    # Publishing the last grade is a change: stay hot through the window, then settle
+    published = p.next_state(waiting, PUBLISHED, changed=True, now=NOW)
+    assert published["tier"] == "hot" and published["settled_since"] == NOW
+    later = NOW + timedelta(days=3)
+    settled = p.next_state(published, None, changed=False, now=later)
+    assert settled["tier"] == "settled" and settled["next_check_at"] == later + timedelta(hours=6)
+    assert settled["courses"] == 2 and settled["pending_courses"] == 0
+
+    much_later = NOW + timedelta(days=20)
+    assert p.next_state(settled, None, changed=False, now=much_later)["tier"] == "dormant"
+
+
+def test_scheduler_skips_users_not_due():
+    p = policy()
+    states = {1: p.next_state(None, PUBLISHED, changed=False, now=NOW)}
+    scheduler = PollScheduler(interval=900, max_rate=10)
+    start = NOW.timestamp()
+    users = [{"telegram_id": 1}, {"telegram_id": 2}]
+
+    def is_due(user, due):
+        return p.is_due(states.get(user["telegram_id"]), datetime.fromtimestamp(due))
+
+    assert [u["telegram_id"] for _, u in scheduler.plan(users, start, is_due=is_due)] == [2]
+    assert scheduler.last_not_due == 1
+    assert p.checks_per_day({"hot": 10, "settled": 10}) == 10 * 96 + 10 * 4
+
+
+def test_poll_state_round_trip(tmp_path):
+    url = f"sqlite:///{tmp_path / 'poll.db'}"
+    UserStorageV2(url).save_user(5, "ENG2425041", "token-5", {"fullname": "طالب"})
+    storage = GradeStorageV2(url)
+    state = policy().next_state(None, PENDING, changed=True, now=NOW)
+    assert storage.save_poll_state(5, state)
+    assert storage.get_poll_states() == {5: state}
+    storage.clear_poll_state(5)
+    assert storage.get_poll_states() == {}
+
+
+def test_login_elsewhere_makes_user_due(tmp_path):
+    url = f"sqlite:///{tmp_path / 'poll.db'}"
+    users = UserStorageV2(url)
+    users.save_user(5, "ENG2425041", "token-5", {})
+    storage = GradeStorageV2(url)
+    later = {**policy().next_state(None, PUBLISHED, changed=False), "next_check_at": datetime.utcnow() + timedelta(days=1)}
+    storage.save_poll_state(5, later)
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.grade_storage = storage
+    bot.poll_policy = policy()
+    bot.poll_states = None
+    now = datetime.utcnow().timestamp()
+    assert not bot._is_poll_due(users.get_user(5), now)
+
+    # Another replica handles a new login and clears the state only in the database
+    users.save_user(5, "ENG2425041", "token-new", {})
+    storage.clear_poll_state(5)
+    assert bot._is_poll_due(users.get_user(5), now)
+
+    # Shards moving here reload the states from storage
+    storage.save_poll_state(5, {**later, "last_checked_at": datetime.utcnow()})
+    bot._drop_poll_states(frozenset({0}))
+    assert not bot._is_poll_due(users.get_user(5), now)
@@ -0,0 +1,99 @@
+"""
+Test Spread Poll Scheduler and Capacity Planner
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.poll_scheduler import PollScheduler, phase_offset, plan_capacity
+
+
+def test_phase_offset_is_stable_and_spread():
+    assert phase_offset(123456789, 900) == phase_offset("123456789", 900)
+    buckets = [0] * 10
+    for telegram_id in range(1000):
+        offset = phase_offset(telegram_id, 900)
+        assert 0 <= offset < 900
+        buckets[int(offset // 90)] += 1
+    assert min(buckets) > 60 and max(buckets) < 140
+
+
+def test_plan_orders_by_phase_and_skips_passed_slots():
+    scheduler = PollScheduler(interval=100, max_rate=10)
+    users = [{"telegram_id": i} for i in range(50)]
+    plan = scheduler.plan(users, start=1000)
+    dues = [due for due, _ in plan]
+    assert dues == sorted(dues) and len(plan) == 50
+    assert all(due >= 1050 for due, _ in scheduler.plan(users, start=1000, not_before=1050))
+    assert scheduler.cycle_start(1234.5) == 1200
+
+
+def test_run_cycle_dispatches_each_user_near_its_slot():
+    scheduler = PollScheduler(interval=0.3, max_rate=1000)
+    users = [{"telegram_id": i} for i in range(20)]
+    dispatched = {}
+
+    async def check(user):
+        dispatched[user["telegram_id"]] = time.time()
+        return True
+
+    start = time.time()
+    results = asyncio.run(scheduler.run_cycle(users, check, start))
+    assert results == [True] * 20
+    for telegram_id, at in dispatched.items():
+        assert abs(at - (start + phase_offset(telegram_id, 0.3))) < 0.05
+    assert scheduler.get_stats()["checks"] == 20
+
+
+def test_rate_cap_spaces_out_colliding_slots():
+    scheduler = PollScheduler(interval=60, max_rate=50)
+    # Same id -> same slot: all five collide and must be spaced 20 ms apart
+    users = [{"telegram_id": 7} for _ in range(5)]
+    times = []
+
+    async def check(user):
+        times.append(time.time())
+
+    start = time.time() - phase_offset(7, 60)
+    asyncio.run(scheduler.run_cycle(users, check, start))
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert len(times) == 5 and min(gaps) >= 0.018
+
+
+def test_capacity_plan():
+    plan = plan_capacity(users=9000, max_rate=5, interval=900, requests_per_poll=1.5)
+    assert plan["min_interval_seconds"] == 2700
+    assert plan["utilization"] == 3 and not plan["fits"]
+    plan = plan_capacity(users=1000, max_rate=5, interval=900, latency=2.0, max_in_flight=10)
+    assert plan["min_interval_seconds"] == 200 and plan["fits"]
+
+
+def test_dispatch_streams_users_and_loads_them_at_their_slot():
+    scheduler = PollScheduler(interval=0.3, max_rate=1000)
+    scheduler.load_batch_size = 4
+    loads = []
+
+    def users():
+        # A stream: the plan keeps only ids, never these dicts
+        for i in range(10):
+            yield {"telegram_id": i, "token": "stale"}
+
+    def load(ids):
+        loads.append(list(ids))
+        # User 3 was parked since the plan was made
+        return [{"telegram_id": i, "token": "fresh"} for i in ids if i != 3]
+
+    async def run():
+        plan_dispatch = scheduler.dispatch(users(), time.time(), load=load)
+        return [user async for user in plan_dispatch]
+
+    dispatched = asyncio.run(run())
+    assert sorted(u["telegram_id"] for u in dispatched) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert {u["token"] for u in dispatched} == {"fresh"}
+    assert all(len(ids) <= 4 for ids in loads) and len(loads) == 3
+    assert scheduler.last_users == 10 and scheduler.last_dispatched == 9
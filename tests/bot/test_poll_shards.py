@@ -0,0 +1,71 @@
+"""
+Test Sharded Polling Leases
+"""
+
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.poll_shards import ShardCoordinator, shard_of
+from storage.grade_storage_v2 import GradeStorageV2
+
+
+def test_shard_of_is_stable_and_balanced():
+    counts = Counter(shard_of(telegram_id, 8) for telegram_id in range(8000))
+    assert set(counts) == set(range(8))
+    assert min(counts.values()) > 800
+    assert shard_of(123456789, 8) == shard_of("123456789", 8)
+
+
+def test_workers_split_and_take_over_shards(tmp_path):
+    storage = GradeStorageV2(f"sqlite:///{tmp_path / 'shards.db'}")
+    a = ShardCoordinator(storage, shard_count=8, worker_id="a", lease_seconds=60)
+    b = ShardCoordinator(storage, shard_count=8, worker_id="b", lease_seconds=60)
+    now = datetime.utcnow()
+
+    assert len(a.heartbeat(now)) == 8
+    # b joins: a gives back half on its next heartbeat and b takes it
+    assert b.heartbeat(now) == frozenset()
+    a.heartbeat(now + timedelta(seconds=20))
+    b.heartbeat(now + timedelta(seconds=20))
+    assert len(a.owned) == len(b.owned) == 4 and not a.owned & b.owned
+    assert a.owns(next(i for i in range(100) if shard_of(i, 8) in a.owned))
+    assert not b.owns(next(i for i in range(100) if shard_of(i, 8) in a.owned))
+
+    # a stops heartbeating: once its lease expires b polls everything
+    assert len(b.heartbeat(now + timedelta(seconds=100))) == 8
+    assert {lease["owner"] for lease in storage.get_poll_shard_leases()} == {"b"}
+
+
+def test_release_frees_shards_for_the_rest(tmp_path):
+    storage = GradeStorageV2(f"sqlite:///{tmp_path / 'shards.db'}")
+    a = ShardCoordinator(storage, shard_count=4, worker_id="a", lease_seconds=60)
+    b = ShardCoordinator(storage, shard_count=4, worker_id="b", lease_seconds=60)
+    a.heartbeat()
+    b.heartbeat()
+    a.heartbeat()
+    b.heartbeat()
+    a.release()
+    assert not a.owns(0)
+    assert len(b.heartbeat()) == 4
+
+
+def test_acquired_shards_are_reported(tmp_path):
+    storage = GradeStorageV2(f"sqlite:///{tmp_path / 'shards.db'}")
+    acquired = []
+    a = ShardCoordinator(storage, shard_count=4, worker_id="a", lease_seconds=60, on_acquire=acquired.append)
+    b = ShardCoordinator(storage, shard_count=4, worker_id="b", lease_seconds=60)
+    now = datetime.utcnow()
+    b.heartbeat(now)
+    a.heartbeat(now)
+    assert acquired == []
+    b.release()
+    # b's shards move to a, whose poll states for them are stale
+    a.heartbeat(now + timedelta(seconds=20))
+    assert acquired == [frozenset(range(4))]
+    a.heartbeat(now + timedelta(seconds=40))
+    assert len(acquired) == 1
@@ -0,0 +1,65 @@
+"""
+Test Cross-User Publication Propagation
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bot.core import TelegramBot
+from bot.poll_scheduler import PollScheduler, phase_offset
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.grade_diff import diff_grades
+from university.grade_record import Grade
+
+UNPUBLISHED = Grade(name="رياضيات", code="MATH101", total="لم يتم النشر")
+PUBLISHED = Grade(name="رياضيات", code="MATH101", total="80 %")
+
+
+def test_bumped_user_jumps_the_plan_once():
+    interval = 2.0
+    late = [i for i in range(200) if phase_offset(i, interval) > 1.2][:2]
+    users = [{"telegram_id": i} for i in late]
+    scheduler = PollScheduler(interval=interval, max_rate=100)
+    checked = []
+
+    async def check(user):
+        checked.append((user["telegram_id"], time.time()))
+
+    async def run():
+        start = time.time()
+        cycle = asyncio.create_task(scheduler.run_cycle(users, check, start))
+        await asyncio.sleep(0.1)
+        assert scheduler.bump([users[1]]) == 1
+        assert scheduler.bump([users[1]]) == 0  # already queued
+        await cycle
+        return start
+
+    start = asyncio.run(run())
+    assert [telegram_id for telegram_id, _ in checked] == [late[1], late[0]]
+    assert checked[0][1] - start < 0.5
+    stats = scheduler.get_stats()
+    assert stats["bumped"] == 1 and stats["queued"] == 0
+
+
+def test_newly_published_ignores_first_sightings():
+    fresh = [PUBLISHED, Grade(name="برمجة", code="CS202", total="90 %")]
+    assert TelegramBot._newly_published(diff_grades([UNPUBLISHED], fresh)) == ["MATH101"]
+    assert TelegramBot._newly_published(diff_grades([PUBLISHED], [PUBLISHED])) == []
+
+
+def test_course_waiters_come_from_grades_table(tmp_path):
+    url = f"sqlite:///{tmp_path / 'waiters.db'}"
+    users = UserStorageV2(url)
+    storage = GradeStorageV2(url)
+    for telegram_id, grade in ((1, PUBLISHED), (2, UNPUBLISHED), (3, UNPUBLISHED), (4, PUBLISHED)):
+        users.save_user(telegram_id, f"ENG{telegram_id:07d}", f"token-{telegram_id}", {})
+        storage.save_grades(telegram_id, [grade.with_term("الفصل الثاني", "10459")])
+    assert sorted(storage.get_course_waiters(["MATH101"], exclude_telegram_id=2)) == [3]
+    assert sorted(storage.get_course_waiters(["MATH101"])) == [2, 3]
+    assert storage.get_course_waiters(["CS202"]) == []
@@ -0,0 +1,147 @@
+"""
+Test Rate-Limited Send Dispatcher and Broadcast Jobs
+"""
+
+import os
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from admin.broadcast import BroadcastSystem
+from bot.send_dispatcher import SendDispatcher
+from storage.broadcast_storage import BroadcastStorage
+from storage.user_storage_v2 import UserStorageV2
+
+
+class FakeBot:
+    def __init__(self, errors=None):
+        self.sent = []
+        self.edits = []
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        error = self.errors.get(chat_id)
+        if error is not None:
+            if isinstance(error, list):
+                if error:
+                    raise error.pop(0)
+            else:
+                raise error
+        self.sent.append((chat_id, time.monotonic()))
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        self.edits.append((chat_id, message_id, text))
+
+
+def test_global_rate_and_outcomes():
+    bot = FakeBot({2: Forbidden("bot was blocked by the user"), 3: BadRequest("Chat not found")})
+    dispatcher = SendDispatcher(lambda: bot, rate=100, per_chat_interval=0, workers=8)
+
+    async def run():
+        started = time.monotonic()
+        outcomes = await dispatcher.send_many(range(1, 151), "hi")
+        return outcomes, time.monotonic() - started
+
+    outcomes, elapsed = asyncio.run(run())
+    assert outcomes == {"sent": 148, "blocked": 1, "invalid": 1}
+    # 150 sends at 100/s with a 100-token burst: at least half a second
+    assert elapsed >= 0.45
+    assert dispatcher.get_stats()["sent"] == 148
+
+
+def test_retry_after_pauses_and_retries():
+    bot = FakeBot({7: [RetryAfter(1)]})
+    dispatcher = SendDispatcher(lambda: bot, rate=1000, per_chat_interval=0, workers=4)
+    started = time.monotonic()
+    outcomes = asyncio.run(dispatcher.send_many([7, 8, 9], "hi"))
+    assert outcomes == {"sent": 3}
+    assert [chat for chat, _ in bot.sent].count(7) == 1
+    assert max(at for chat, at in bot.sent if chat == 7) - started >= 0.95
+    assert dispatcher.get_stats()["retry_after"] == 1
+
+
+def test_per_chat_gap():
+    bot = FakeBot()
+    dispatcher = SendDispatcher(lambda: bot, rate=1000, per_chat_interval=0.2, workers=4)
+
+    async def run():
+        await asyncio.gather(*(dispatcher.send(5, f"m{i}") for i in range(3)))
+
+    asyncio.run(run())
+    times = [at for _, at in bot.sent]
+    assert times[2] - times[0] >= 0.38
+
+
+def test_broadcast_job_resumes_from_cursor(tmp_path):
+    url = f"sqlite:///{tmp_path / 'broadcast.db'}"
+    users = UserStorageV2(url)
+    for telegram_id in range(1, 8):
+        users.save_user(telegram_id, f"ENG{telegram_id:07d}", f"token-{telegram_id}", {})
+    fake = FakeBot({4: Forbidden("blocked")})
+    bot = SimpleNamespace(
+        user_storage=users,
+        broadcast_storage=BroadcastStorage(url),
+        send_dispatcher=SendDispatcher(lambda: fake, rate=1000, per_chat_interval=0, workers=2),
+    )
+    system = BroadcastSystem(bot)
+    system.page_size = 3
+    system.progress_seconds = 0
+
+    job_id = asyncio.run(system.enqueue("📢 hello", admin_chat_id=99, status_message_id=5))
+    job = bot.broadcast_storage.get_job(job_id)
+    assert job["status"] == "pending" and job["total"] == 7
+
+    # Crash after the first page
+    system.lease_seconds = 0.2
+    claimed = bot.broadcast_storage.claim_job(system.worker_id, system.lease_seconds)
+    assert claimed["id"] == job_id and claimed["owner"] == system.worker_id
+    pages = iter([True, False])
+    assert asyncio.run(system._run_job(claimed, lambda: next(pages, False))) is False
+    interrupted = bot.broadcast_storage.get_active_jobs()
+    assert [j["id"] for j in interrupted] == [job_id] and interrupted[0]["sent"] == 3
+
+    # Another replica waits for the lease, then picks it up where it stopped
+    replica = BroadcastSystem(bot)
+    replica.worker_id = "replica-2"
+    replica.page_size = 3
+    replica.progress_seconds = 0
+    assert bot.broadcast_storage.claim_job(replica.worker_id, lease_seconds=60) is None
+    time.sleep(0.25)
+    resumed = bot.broadcast_storage.claim_job(replica.worker_id, lease_seconds=60)
+    assert resumed["cursor"] == interrupted[0]["cursor"]
+    # The first replica lost the job and cannot record progress on it any more
+    assert not bot.broadcast_storage.record_progress(job_id, 99, 1, 0, 0, worker_id=system.worker_id)
+    assert asyncio.run(replica._run_job(resumed, lambda: True)) is True
+    done = bot.broadcast_storage.get_job(job_id)
+    assert done["status"] == "done"
+    assert (done["sent"], done["blocked"], done["failed"]) == (6, 1, 0)
+    assert sorted(chat for chat, _ in fake.sent) == [1, 2, 3, 5, 6, 7]
+    assert fake.edits[-1][2].startswith("✅ اكتمل البث: 7/7")
+    assert bot.broadcast_storage.get_active_jobs() == []
+
+
+def test_scheduled_broadcast_is_queued_once_across_replicas(tmp_path):
+    url = f"sqlite:///{tmp_path / 'broadcast.db'}"
+    users = UserStorageV2(url)
+    users.save_user(1, "ENG0000001", "token-1", {})
+    replicas = [
+        BroadcastSystem(SimpleNamespace(user_storage=users, broadcast_storage=BroadcastStorage(url), send_dispatcher=None))
+        for _ in range(3)
+    ]
+
+    async def enqueue_everywhere(key):
+        return await asyncio.gather(*(system.enqueue("💬 quote", kind="quote", dedup_key=key) for system in replicas))
+
+    job_ids = asyncio.run(enqueue_everywhere("quote:2026-01-01"))
+    assert len([job_id for job_id in job_ids if job_id is not None]) == 1
+    assert len(replicas[0].job_storage.get_active_jobs()) == 1
+    # The next day queues its own job; keyless broadcasts are never deduplicated
+    assert asyncio.run(replicas[1].enqueue("💬 quote", kind="quote", dedup_key="quote:2026-01-02")) is not None
+    assert asyncio.run(replicas[1].enqueue("📢 hi")) and asyncio.run(replicas[2].enqueue("📢 hi"))
+    assert len(replicas[0].job_storage.get_active_jobs()) == 4
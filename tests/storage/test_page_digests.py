@@ -0,0 +1,54 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from storage.user_storage_v2 import UserStorageV2
+from storage.grade_storage_v2 import GradeStorageV2
+from university.api_client_v2 import UniversityAPIV2
+from university.grade_parser import page_digest
+
+PAGE = {"panels": [{"blocks": [{"body": (
+    "<table><tr><th>المقرر</th><th>الرمز</th></tr>"
+    "<tr><td>رياضيات</td><td>MATH101</td><td>6</td><td>30</td><td>50</td><td>80 %</td></tr></table>"
+)}]}]}
+
+
+@pytest.fixture
+def grade_storage(tmp_path):
+    url = f"sqlite:///{tmp_path / 'digests.db'}"
+    UserStorageV2(url).save_user(1, "ENG2425041", "token-1", {"fullname": "طالب"})
+    return GradeStorageV2(url)
+
+
+def test_save_and_get_page_digest(grade_storage):
+    assert grade_storage.get_page_digests(1) == {}
+    grade_storage.save_page_digest(1, "10459", "a" * 64)
+    grade_storage.save_page_digest(1, "10459", "b" * 64)
+    assert grade_storage.get_page_digests(1) == {"10459": "b" * 64}
+    grade_storage.delete_grades(1)
+    assert grade_storage.get_page_digests(1) == {}
+
+
+def test_unchanged_page_skips_parsing():
+    api = UniversityAPIV2()
+    api.term_cache.put(1, [("الفصل الثاني", "10459")])
+    parsed = []
+
+    async def fake_send(url, payload, token, operation):
+        return 200, {"data": {"getGUI": {"user": {"username": "ENG2425041"}}, "grades": PAGE}}
+
+    async def fake_run(func, *args):
+        parsed.append(args)
+        return func(*args)
+
+    api._send = fake_send
+    api.parse_executor.run = fake_run
+    first = asyncio.run(api.poll_user("token", 1, {}))
+    assert first["grades"] and first["page_digest"] == page_digest(PAGE)
+    second = asyncio.run(api.poll_user("token", 1, {"10459": first["page_digest"]}))
+    assert second["unchanged"] and "grades" not in second
+    assert len(parsed) == 1
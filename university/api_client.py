@@ -11,6 +11,7 @@ from bs4 import BeautifulSoup
 import os
 
 from config import CONFIG, UNIVERSITY_QUERIES, PRINT_HTML_DEBUG
+from university.grade_parser import extract_tables
 
 logger = logging.getLogger(__name__)
 
@@ -420,8 +421,7 @@ class UniversityAPI:
         """Parse grades from a single block's HTML using the order-based method"""
         try:
             grades = []
-            soup = BeautifulSoup(html_content, "html.parser")
-            tables = soup.find_all("table")
+            tables = extract_tables(html_content)
             
             if not tables:
                 return []
@@ -429,18 +429,14 @@ class UniversityAPI:
             for table_idx, table in enumerate(tables):
                 logger.debug(f"[Grade Parse] User {user_id} - Block {block_num}, Table {table_idx + 1}")
                 
-                # Extract headers
-                headers = [th.get_text(strip=True) for th in table.find_all("th")]
-                
                 # Extract ALL rows (no limit)
-                rows = table.find_all("tr")[1:]  # Skip header row
+                rows = table[1:]  # Skip header row
                 
                 if not rows:
                     continue
                 
                 # Process each row as a course - NO LIMIT on number of courses
-                for row_idx, row in enumerate(rows):
-                    cells = [td.get_text(strip=True) for td in row.find_all("td")]
+                for row_idx, cells in enumerate(rows):
                     
                     # Filter: Only process rows with a non-empty course code (usually column 2)
                     if len(cells) < 2 or not cells[1].strip():
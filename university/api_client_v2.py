@@ -4,31 +4,248 @@ Handles authentication and grade fetching for university students
 """
 
 import aiohttp
+import asyncio
+import hashlib
+import json
 import logging
+import random
+import time
+from collections import defaultdict
 from typing import Dict, List, Any, Optional, Tuple
-from bs4 import BeautifulSoup
 import re
 
 from config import CONFIG, UNIVERSITY_QUERIES
+from university.cassette import CassetteReplay, CassetteStore, user_secrets
+from university.grade_parser import get_grade_status, page_digest, parse_grade_html, parse_grade_page
+from university.grade_record import Grade
+from university.limiter import AdaptiveLimiter, CircuitBreaker, UpstreamUnavailable
+from university.parse_executor import ParseExecutor
+from university.singleflight import SingleFlight
+from university.term_cache import TermCatalogCache
+from university.token_tracker import TokenTracker, is_auth_failure
 
 logger = logging.getLogger(__name__)
 
+# Never retried automatically (a repeated login could trip account lockout)
+NO_RETRY_OPERATIONS = {"login"}
+
+# Queries with a trimmed variant used when UNIVERSITY_QUERY_SET is "minimal"
+MINIMAL_QUERIES = {
+    "GET_HOMEPAGE": "GET_HOMEPAGE_MIN",
+    "GET_GRADES": "GET_GRADES_MIN",
+}
+
 
 class UniversityAPIV2:
     """Clean University API Client for grade fetching"""
 
-    def __init__(self):
+    def __init__(self, grade_storage=None):
         self.api_url = CONFIG["UNIVERSITY_API_URL"]
         self.login_url = CONFIG["UNIVERSITY_LOGIN_URL"]
         self.api_headers = CONFIG["API_HEADERS"]
-        self.timeout = aiohttp.ClientTimeout(total=30)
+        self.timeout = aiohttp.ClientTimeout(
+            total=CONFIG.get("REQUEST_TIMEOUT_SECONDS", 30),
+            connect=CONFIG.get("HTTP_CONNECT_TIMEOUT_SECONDS", 10),
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.term_cache = TermCatalogCache(grade_storage)
+        self.term_recheck_seconds = CONFIG.get("TERM_EMPTY_RECHECK_MINUTES", 60) * 60
+        self.parse_executor = ParseExecutor()
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker()
+        self.token_tracker = TokenTracker()
+        self.single_flight = SingleFlight()
+        self.retries = CONFIG.get("UNIVERSITY_RETRIES", 2)
+        self.retry_backoff = CONFIG.get("UNIVERSITY_RETRY_BACKOFF_SECONDS", 0.5)
+        self.query_set = CONFIG.get("UNIVERSITY_QUERY_SET", "minimal")
+        self.apq_enabled = CONFIG.get("UNIVERSITY_APQ_ENABLED", False)
+        self.poll_mode = CONFIG.get("UNIVERSITY_POLL_MODE", "combined")
+        self._apq_registered = set()
+        self.cassette = CassetteStore() if CONFIG.get("CASSETTE_CAPTURE", False) else None
+        self.replay = CassetteReplay(CassetteStore()) if CONFIG.get("CASSETTE_REPLAY", False) else None
+        self.transfer_stats = defaultdict(
+            lambda: {"requests": 0, "bytes_sent": 0, "bytes_received": 0, "seconds": 0.0, "apq_misses": 0, "failures": 0}
+        )
+
+    async def start(self):
+        """Open the shared HTTP session (keep-alive pool, DNS cache)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=CONFIG.get("HTTP_POOL_SIZE", 100),
+                limit_per_host=CONFIG.get("HTTP_POOL_PER_HOST", 20),
+                ttl_dns_cache=CONFIG.get("HTTP_DNS_CACHE_SECONDS", 300),
+                keepalive_timeout=CONFIG.get("HTTP_KEEPALIVE_SECONDS", 30),
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            logger.info("🌐 University API HTTP session opened")
+        return self._session
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("🌐 University API HTTP session closed")
+        self._session = None
+        # Waiting for running parse jobs blocks, so it happens off the event loop
+        await asyncio.to_thread(self.parse_executor.shutdown)
+
+    def _query(self, name: str) -> str:
+        """Pick the minimal or full document for a query"""
+        if self.query_set == "minimal" and name in MINIMAL_QUERIES:
+            return UNIVERSITY_QUERIES[MINIMAL_QUERIES[name]]
+        return UNIVERSITY_QUERIES[name]
+
+    async def _send(
+        self, url: str, payload: Dict[str, Any], token: Optional[str], operation: str
+    ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Send one request through the limiter and breaker, retrying 5xx/timeouts with backoff"""
+        if self.replay is not None:
+            # Replay reads gzipped pages from disk: keep that off the event loop
+            return await asyncio.to_thread(self.replay.respond, payload)
+        if not self.breaker.allow():
+            raise UpstreamUnavailable("University API circuit is open")
+        probe = self.breaker.state == "half_open"
+        try:
+            return await self._send_attempts(url, payload, token, operation)
+        finally:
+            if probe:
+                # A cancelled or crashed probe must not leave the circuit half-open for good
+                self.breaker.release_probe()
+
+    async def _send_attempts(
+        self, url: str, payload: Dict[str, Any], token: Optional[str], operation: str
+    ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        headers = {**self.api_headers}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        stats = self.transfer_stats[operation]
+        # Lazily open the session so scripts that never call start() still work
+        session = await self.start()
+        attempts = 1 if operation in NO_RETRY_OPERATIONS else 1 + self.retries
+        
+        for attempt in range(attempts):
+            error = None
+            status = None
+            async with self.limiter.slot():
+                started = time.monotonic()
+                try:
+                    async with session.post(url, headers=headers, data=body) as response:
+                        raw = await response.read()
+                    status = response.status
+                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                    error = e
+                elapsed = time.monotonic() - started
+                overloaded = error is not None or status >= 500 or status == 429
+                self.limiter.record(elapsed, ok=not overloaded, overloaded=overloaded)
+            
+            stats["requests"] += 1
+            stats["bytes_sent"] += len(body)
+            stats["seconds"] += elapsed
+            if not overloaded:
+                self.breaker.record_success()
+                stats["bytes_received"] += len(raw)
+                data = json.loads(raw) if status == 200 else None
+                if token:
+                    # Every real call doubles as a token check
+                    if is_auth_failure(status, data):
+                        self.token_tracker.mark_invalid(token)
+                    elif data and data.get("data"):
+                        self.token_tracker.mark_verified(token)
+                return status, data
+            
+            self.breaker.record_failure()
+            stats["failures"] += 1
+            if self.breaker.is_open():
+                break
+            if attempt + 1 < attempts:
+                # Exponential backoff with jitter so retries do not arrive in lockstep
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        
+        if error is not None:
+            raise error
+        return status, None
+
+    async def _post_json(
+        self, url: str, payload: Dict[str, Any], token: Optional[str] = None,
+        operation: str = "graphql", persisted: bool = True,
+    ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """POST a GraphQL payload on the shared session, return (status, json)"""
+        query = payload.get("query")
+        if not (self.apq_enabled and persisted and query):
+            return await self._send(url, payload, token, operation)
+        
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+        if query_hash in self._apq_registered:
+            hashed = {k: v for k, v in payload.items() if k != "query"}
+            status, data = await self._send(url, {**hashed, "extensions": extensions}, token, operation)
+            error = self._apq_error(data)
+            if error is None:
+                return status, data
+            self.transfer_stats[operation]["apq_misses"] += 1
+            self._apq_registered.discard(query_hash)
+            if error == "PersistedQueryNotSupported":
+                logger.warning("⚠️ Server does not support persisted queries, sending full documents")
+                self.apq_enabled = False
+                return await self._send(url, payload, token, operation)
+        
+        # Register the document: send hash and full query together
+        status, data = await self._send(url, {**payload, "extensions": extensions}, token, operation)
+        if status == 200 and self._apq_error(data) is None:
+            self._apq_registered.add(query_hash)
+        return status, data
+
+    @staticmethod
+    def _apq_error(data: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Return the persisted-query error name in a response, if any"""
+        for error in (data or {}).get("errors") or []:
+            message = error.get("message", "")
+            code = (error.get("extensions") or {}).get("code", "")
+            if message in ("PersistedQueryNotFound", "PersistedQueryNotSupported"):
+                return message
+            if code == "PERSISTED_QUERY_NOT_FOUND":
+                return "PersistedQueryNotFound"
+            if code == "PERSISTED_QUERY_NOT_SUPPORTED":
+                return "PersistedQueryNotSupported"
+        return None
+
+    @staticmethod
+    def _flight_key(operation: str, token: str, telegram_id: Optional[int]) -> Tuple[str, Any]:
+        # Users are keyed by telegram_id; anonymous calls by their token
+        return (operation, telegram_id if telegram_id is not None else token)
+
+    def get_health_stats(self) -> Dict[str, Any]:
+        """Limiter, breaker, parse pool and term cache state for the admin dashboard"""
+        return {
+            "limiter": self.limiter.get_stats(),
+            "breaker": self.breaker.get_stats(),
+            "parse": self.parse_executor.get_stats(),
+            "term_cache": self.term_cache.get_stats(),
+            "tokens": self.token_tracker.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "cassette": self.cassette.get_stats() if self.cassette else None,
+        }
+
+    def get_transfer_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation request counts, byte sizes and time spent"""
+        return {operation: dict(stats) for operation, stats in self.transfer_stats.items()}
+
+    async def _capture(
+        self, operation: str, page: Optional[Dict[str, Any]], term_id: Optional[str] = None,
+        telegram_id: Optional[int] = None, secrets: Tuple[str, ...] = (),
+    ):
+        """Record a raw page in the cassette store when capture is enabled (in a worker thread)"""
+        if self.cassette is not None and page:
+            await asyncio.to_thread(
+                self.cassette.capture, operation, page, term_id=term_id, telegram_id=telegram_id, secrets=secrets
+            )
 
     async def login(self, username: str, password: str) -> Optional[str]:
         """Login to university system and return token"""
         try:
             logger.info(f"🔐 Attempting login for user: {username}")
             
-            headers = {**self.api_headers}
             payload = {
                 "operationName": "signinUser",
                 "variables": {
@@ -38,62 +255,55 @@ class UniversityAPIV2:
                 "query": UNIVERSITY_QUERIES["LOGIN"]
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    self.login_url, headers=headers, json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("data", {}).get("login"):
-                            token = data["data"]["login"]
-                            logger.info(f"✅ Login successful for user: {username}")
-                            return token
-                        else:
-                            logger.warning(f"❌ Login failed - no token in response for user: {username}")
-                            logger.debug(f"Response data: {data}")
-                            return None
-                    else:
-                        logger.error(f"❌ Login failed with status {response.status} for user: {username}")
-                        return None
+            status, data = await self._post_json(self.login_url, payload, operation="login", persisted=False)
+            if status == 200:
+                if data.get("data", {}).get("login"):
+                    token = data["data"]["login"]
+                    self.token_tracker.mark_verified(token)
+                    logger.info(f"✅ Login successful for user: {username}")
+                    return token
+                else:
+                    logger.warning(f"❌ Login failed - no token in response for user: {username}")
+                    logger.debug(f"Response data: {data}")
+                    return None
+            else:
+                logger.error(f"❌ Login failed with status {status} for user: {username}")
+                return None
         except Exception as e:
             logger.error(f"❌ Login error for user {username}: {e}", exc_info=True)
             return None
 
-    async def test_token(self, token: str) -> bool:
-        """Test if token is valid"""
+    async def test_token(self, token: str) -> Optional[bool]:
+        """
+        Test if token is valid: True or False, or None when the API could not
+        tell (timeout, server error, circuit open), so callers do not mistake
+        an outage for a logged-out user.
+        """
         try:
-            headers = {**self.api_headers, "Authorization": f"Bearer {token}"}
             payload = {"query": UNIVERSITY_QUERIES["TEST_TOKEN"]}
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    self.api_url, headers=headers, json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return (
-                            "data" in data
-                            and data["data"].get("getGUI", {}).get("user") is not None
-                        )
+            status, data = await self._post_json(self.api_url, payload, token, operation="test_token")
+            if is_auth_failure(status, data):
+                return False
+            if status == 200 and data and data.get("data"):
+                present = (data["data"].get("getGUI") or {}).get("user") is not None
+                if self.token_tracker.record_user(token, present):
                     return False
-        except Exception:
-            return False
+                return True if present else None
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Token check failed, validity unknown: {e}")
+            return None
 
     async def get_user_info(self, token: str) -> Optional[Dict[str, Any]]:
         """Get user information from API"""
         try:
-            headers = {**self.api_headers, "Authorization": f"Bearer {token}"}
             payload = {"query": UNIVERSITY_QUERIES["GET_USER_INFO"]}
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    self.api_url, headers=headers, json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("data", {}).get("getGUI"):
-                            return data["data"]["getGUI"]["user"]
-                    return None
+            status, data = await self._post_json(self.api_url, payload, token, operation="user_info")
+            if status == 200 and data.get("data", {}).get("getGUI"):
+                return data["data"]["getGUI"]["user"]
+            return None
         except Exception as e:
             logger.error(f"❌ Error getting user info: {e}", exc_info=True)
             return None
@@ -101,25 +311,20 @@ class UniversityAPIV2:
     async def get_homepage_data(self, token: str) -> Optional[Dict[str, Any]]:
         """Get homepage data to extract available terms"""
         try:
-            headers = {**self.api_headers, "Authorization": f"Bearer {token}"}
             payload = {
                 "operationName": "getPage",
                 "variables": {
                     "name": "homepage",
                     "params": []
                 },
-                "query": UNIVERSITY_QUERIES["GET_HOMEPAGE"]
+                "query": self._query("GET_HOMEPAGE")
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    self.api_url, headers=headers, json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("data", {}).get("getPage"):
-                            return data["data"]["getPage"]
-                    return None
+            status, data = await self._post_json(self.api_url, payload, token, operation="homepage")
+            if status == 200 and data.get("data", {}).get("getPage"):
+                await self._capture("homepage", data["data"]["getPage"])
+                return data["data"]["getPage"]
+            return None
         except Exception as e:
             logger.error(f"❌ Error getting homepage data: {e}", exc_info=True)
             return None
@@ -168,128 +373,96 @@ class UniversityAPIV2:
         
         return terms
 
-    async def get_term_grades(self, token: str, term_id: str) -> List[Dict[str, Any]]:
-        """Get grades for a specific term"""
+    async def fetch_term_page(
+        self, token: str, term_id: str, telegram_id: Optional[int] = None, secrets: Tuple[str, ...] = ()
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch the raw getPage(test_student_tracks) payload for a term"""
         try:
-            headers = {**self.api_headers, "Authorization": f"Bearer {token}"}
             payload = {
                 "operationName": "getPage",
                 "variables": {
                     "name": "test_student_tracks",
                     "params": [{"name": "t_grade_id", "value": term_id}],
                 },
-                "query": UNIVERSITY_QUERIES["GET_GRADES"],
+                "query": self._query("GET_GRADES"),
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    self.api_url, headers=headers, json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("data", {}).get("getPage"):
-                            return self.parse_grades_from_response(data["data"]["getPage"])
-                    return []
+            status, data = await self._post_json(self.api_url, payload, token, operation="term_page")
+            if status == 200 and data.get("data", {}).get("getPage"):
+                await self._capture("term_page", data["data"]["getPage"], term_id, telegram_id, secrets)
+                return data["data"]["getPage"]
+            return None
         except Exception as e:
-            logger.error(f"❌ Error getting term grades for term {term_id}: {e}", exc_info=True)
+            logger.error(f"❌ Error fetching term page for term {term_id}: {e}", exc_info=True)
+            return None
+
+    async def get_term_grades(self, token: str, term_id: str) -> List[Grade]:
+        """Get grades for a specific term"""
+        page_data = await self.fetch_term_page(token, term_id)
+        if not page_data:
             return []
+        return await self.parse_executor.run(parse_grade_page, page_data)
 
-    def parse_grades_from_response(self, page_data: dict) -> List[Dict[str, Any]]:
+    def parse_grades_from_response(self, page_data: dict) -> List[Grade]:
         """Parse grades from API response"""
-        grades = []
-        
-        try:
-            panels = page_data.get("panels", [])
-            if not panels:
-                return grades
-            
-            blocks = panels[0].get("blocks", [])
-            
-            for block_idx, block in enumerate(blocks):
-                html_content = block.get("body", "")
-                if not html_content:
-                    continue
-                
-                block_grades = self.parse_grades_from_html(html_content, block_idx + 1)
-                grades.extend(block_grades)
-                
-                logger.info(f"📊 Block {block_idx + 1}: Found {len(block_grades)} courses")
-            
-            logger.info(f"🎉 Total courses found: {len(grades)}")
-            return grades
-            
-        except Exception as e:
-            logger.error(f"❌ Error parsing grades: {e}", exc_info=True)
-            return []
+        return parse_grade_page(page_data)
 
-    def parse_grades_from_html(self, html_content: str, block_num: int) -> List[Dict[str, Any]]:
+    def parse_grades_from_html(self, html_content: str, block_num: int) -> List[Grade]:
         """Parse grades from HTML content"""
-        grades = []
-        
-        try:
-            soup = BeautifulSoup(html_content, "html.parser")
-            tables = soup.find_all("table")
-            
-            for table_idx, table in enumerate(tables):
-                rows = table.find_all("tr")[1:]  # Skip header row
-                
-                for row_idx, row in enumerate(rows):
-                    cells = [td.get_text(strip=True) for td in row.find_all("td")]
-                    
-                    # Skip rows without course code
-                    if len(cells) < 2 or not cells[1].strip():
-                        continue
-                    
-                    # Skip summary rows
-                    code = cells[1].strip()
-                    name = cells[0].strip()
-                    if code.isdigit() and "term" in name.lower():
-                        continue
-                    
-                    # Create grade object
-                    grade = {
-                        'block': block_num,
-                        'table': table_idx + 1,
-                        'row': row_idx + 1,
-                        'name': cells[0] if len(cells) > 0 else '',
-                        'code': cells[1] if len(cells) > 1 else '',
-                        'ects': cells[2] if len(cells) > 2 else '',
-                        'coursework': cells[3] if len(cells) > 3 else '',
-                        'final_exam': cells[4] if len(cells) > 4 else '',
-                        'total': cells[5] if len(cells) > 5 else '',
-                        'grade_status': self.get_grade_status(cells[5] if len(cells) > 5 else '')
-                    }
-                    
-                    grades.append(grade)
-        
-        except Exception as e:
-            logger.error(f"❌ Error parsing HTML for block {block_num}: {e}", exc_info=True)
-        
-        return grades
+        return parse_grade_html(html_content, block_num)
 
     def get_grade_status(self, grade_text: str) -> str:
         """Determine grade status"""
-        if not grade_text or grade_text.strip() == '':
-            return "Not Published"
-        if 'لم يتم النشر' in grade_text:
-            return "Not Published"
-        if '%' in grade_text:
-            return "Published"
-        return "Unknown"
-
-    async def get_current_grades(self, token: str) -> List[Dict[str, Any]]:
+        return get_grade_status(grade_text)
+
+    async def _load_terms(
+        self, token: str, telegram_id: Optional[int] = None, refresh: bool = False
+    ) -> Tuple[List[Tuple[str, str]], bool]:
+        """Return (terms, from_cache), fetching the homepage only on a cache miss"""
+        if telegram_id is not None and not refresh:
+            cached = self.term_cache.get(telegram_id)
+            if cached:
+                return cached, True
+        
+        homepage_data = await self.get_homepage_data(token)
+        if not homepage_data:
+            logger.warning("❌ No homepage data available")
+            return [], False
+        
+        terms = self.extract_terms_from_homepage(homepage_data)
+        if terms and telegram_id is not None:
+            self.term_cache.put(telegram_id, terms)
+        return terms, False
+
+    def _term_recheck_due(self, telegram_id: Optional[int]) -> bool:
+        """Whether a cached term list that looks outdated may be refetched now"""
+        return telegram_id is None or self.term_cache.expire_if_older(telegram_id, self.term_recheck_seconds)
+
+    async def get_terms(
+        self, token: str, telegram_id: Optional[int] = None, refresh: bool = False
+    ) -> List[Tuple[str, str]]:
+        """Get the user's term list (cached per user when telegram_id is given)"""
+        terms, _ = await self._load_terms(token, telegram_id, refresh)
+        return terms
+
+    async def _get_grades_for_term(self, token: str, term_name: str, term_id: str) -> List[Grade]:
+        """Fetch one term's grades and tag them with the term info"""
+        grades = await self.get_term_grades(token, term_id)
+        return [grade.with_term(term_name, term_id) for grade in grades]
+
+    async def get_current_grades(self, token: str, telegram_id: Optional[int] = None) -> List[Grade]:
+        """Coalesced: concurrent calls for the same user share one fetch"""
+        return await self.single_flight.do(
+            self._flight_key("current_grades", token, telegram_id), lambda: self._fetch_current_grades(token, telegram_id)
+        )
+
+    async def _fetch_current_grades(self, token: str, telegram_id: Optional[int] = None) -> List[Grade]:
         """Get current term grades"""
         try:
             logger.info("🔍 Fetching current grades...")
             
-            # Get homepage data to find terms
-            homepage_data = await self.get_homepage_data(token)
-            if not homepage_data:
-                logger.warning("❌ No homepage data available")
-                return []
-            
-            # Extract terms
-            terms = self.extract_terms_from_homepage(homepage_data)
+            # Get the term list (cached per user, homepage only on a miss)
+            terms, from_cache = await self._load_terms(token, telegram_id)
             if not terms:
                 logger.warning("❌ No terms found in homepage")
                 return []
@@ -297,30 +470,29 @@ class UniversityAPIV2:
             logger.info(f"📊 Found {len(terms)} terms: {[term[0] for term in terms]}")
             
             # Try first term (usually current)
-            if terms:
-                current_term_name, current_term_id = terms[0]
-                logger.info(f"📊 Trying current term: '{current_term_name}' (ID: {current_term_id})")
-                
-                grades = await self.get_term_grades(token, current_term_id)
-                if grades:
-                    logger.info(f"✅ Found {len(grades)} current grades")
-                    # Add term info to grades
-                    for grade in grades:
-                        grade['term_name'] = current_term_name
-                        grade['term_id'] = current_term_id
-                    return grades
+            current_term_name, current_term_id = terms[0]
+            logger.info(f"📊 Trying current term: '{current_term_name}' (ID: {current_term_id})")
+            
+            grades = await self._get_grades_for_term(token, current_term_name, current_term_id)
+            if not grades and from_cache and self._term_recheck_due(telegram_id):
+                # A cached list may miss a newly opened term; refresh it, at most once per recheck period
+                fresh_terms = await self.get_terms(token, telegram_id, refresh=True)
+                if fresh_terms and fresh_terms[0] != terms[0]:
+                    current_term_name, current_term_id = fresh_terms[0]
+                    logger.info(f"🔄 Term list changed, trying '{current_term_name}' (ID: {current_term_id})")
+                    grades = await self._get_grades_for_term(token, current_term_name, current_term_id)
+            if grades:
+                logger.info(f"✅ Found {len(grades)} current grades")
+                return grades
             
             # Fallback: try known current term IDs
             logger.info("🔄 Trying fallback term IDs...")
             fallback_ids = ["10459", "10460", "10461"]
             for term_id in fallback_ids:
                 logger.info(f"🔍 Trying term ID: {term_id}")
-                grades = await self.get_term_grades(token, term_id)
+                grades = await self._get_grades_for_term(token, f"Current Term ({term_id})", term_id)
                 if grades:
                     logger.info(f"✅ Found {len(grades)} grades for term {term_id}")
-                    for grade in grades:
-                        grade['term_name'] = f"Current Term ({term_id})"
-                        grade['term_id'] = term_id
                     return grades
             
             logger.warning("❌ No current grades found")
@@ -330,19 +502,21 @@ class UniversityAPIV2:
             logger.error(f"❌ Error getting current grades: {e}", exc_info=True)
             return []
 
-    async def get_old_grades(self, token: str) -> List[Dict[str, Any]]:
+    async def get_old_grades(self, token: str, telegram_id: Optional[int] = None) -> List[Grade]:
+        """Coalesced: concurrent calls for the same user share one fetch"""
+        return await self.single_flight.do(
+            self._flight_key("old_grades", token, telegram_id), lambda: self._fetch_old_grades(token, telegram_id)
+        )
+
+    async def _fetch_old_grades(self, token: str, telegram_id: Optional[int] = None) -> List[Grade]:
         """Get previous term grades"""
         try:
             logger.info("🔍 Fetching old grades...")
             
-            # Get homepage data to find terms
-            homepage_data = await self.get_homepage_data(token)
-            if not homepage_data:
-                logger.warning("❌ No homepage data available")
-                return []
-            
-            # Extract terms
-            terms = self.extract_terms_from_homepage(homepage_data)
+            # Get the term list (cached per user, homepage only on a miss)
+            terms, from_cache = await self._load_terms(token, telegram_id)
+            if len(terms) < 2 and from_cache and self._term_recheck_due(telegram_id):
+                terms = await self.get_terms(token, telegram_id, refresh=True)
             if len(terms) < 2:
                 logger.warning("❌ Not enough terms found for old grades")
                 return []
@@ -351,13 +525,9 @@ class UniversityAPIV2:
             previous_term_name, previous_term_id = terms[1]
             logger.info(f"📊 Using previous term: '{previous_term_name}' (ID: {previous_term_id})")
             
-            grades = await self.get_term_grades(token, previous_term_id)
+            grades = await self._get_grades_for_term(token, previous_term_name, previous_term_id)
             if grades:
                 logger.info(f"✅ Found {len(grades)} old grades")
-                # Add term info to grades
-                for grade in grades:
-                    grade['term_name'] = previous_term_name
-                    grade['term_id'] = previous_term_id
                 return grades
             
             # Fallback: try known previous term IDs
@@ -365,12 +535,9 @@ class UniversityAPIV2:
             fallback_ids = ["10458", "10457", "10456"]
             for term_id in fallback_ids:
                 logger.info(f"🔍 Trying previous term ID: {term_id}")
-                grades = await self.get_term_grades(token, term_id)
+                grades = await self._get_grades_for_term(token, f"Previous Term ({term_id})", term_id)
                 if grades:
                     logger.info(f"✅ Found {len(grades)} old grades for term {term_id}")
-                    for grade in grades:
-                        grade['term_name'] = f"Previous Term ({term_id})"
-                        grade['term_id'] = term_id
                     return grades
             
             logger.warning("❌ No old grades found")
@@ -380,7 +547,13 @@ class UniversityAPIV2:
             logger.error(f"❌ Error getting old grades: {e}", exc_info=True)
             return []
 
-    async def get_user_data(self, token: str) -> Optional[Dict[str, Any]]:
+    async def get_user_data(self, token: str, telegram_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Coalesced: concurrent calls for the same user share one fetch"""
+        return await self.single_flight.do(
+            self._flight_key("user_data", token, telegram_id), lambda: self._fetch_user_data(token, telegram_id)
+        )
+
+    async def _fetch_user_data(self, token: str, telegram_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """Get complete user data including grades"""
         try:
             # Get user info
@@ -390,7 +563,7 @@ class UniversityAPIV2:
                 return None
             
             # Get current grades
-            grades = await self.get_current_grades(token)
+            grades = await self.get_current_grades(token, telegram_id)
             logger.info(f"📊 Current grades count: {len(grades)}")
             
             # Return combined data
@@ -398,4 +571,133 @@ class UniversityAPIV2:
             
         except Exception as e:
             logger.error(f"❌ Error getting user data: {e}", exc_info=True)
-            return None 
\ No newline at end of file
+            return None 
+
+    async def poll_user(
+        self, token: str, telegram_id: Optional[int] = None, page_digests: Optional[Dict[str, str]] = None,
+        parse: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Token check, identity and current grades for one poll cycle.
+        Returns {"token_valid": False} only for a token the API rejected, None on
+        errors (timeouts, server errors, open circuit) so the user is retried later,
+        otherwise {"token_valid": True, **user_info, "grades": [...]}.
+        page_digests ({term_id: digest}) lets an unchanged term page skip parsing:
+        the result then has "unchanged": True and no "grades".
+        With parse=False a fetched page is returned as "page_data" instead of
+        "grades"; pass the result to finish_poll() to parse it. Every request is
+        made here, so finish_poll() only needs CPU.
+        """
+        if self.breaker.is_open():
+            return None
+        if self.token_tracker.is_invalid(token):
+            # Already rejected by an earlier call; a new login brings a new token
+            return {"token_valid": False}
+        # Coalesced like the single data calls: a user polled again while a poll is
+        # still running (overlapping cycles, shard handover) shares that request
+        result = await self.single_flight.do(
+            self._flight_key("poll" if parse else "poll_unparsed", token, telegram_id),
+            lambda: self._poll_user(token, telegram_id, page_digests, parse),
+        )
+        # Each caller gets its own dict, the shared one stays untouched
+        return dict(result) if result is not None else None
+
+    async def _poll_user(
+        self, token: str, telegram_id: Optional[int], page_digests: Optional[Dict[str, str]], parse: bool
+    ) -> Optional[Dict[str, Any]]:
+        if self.poll_mode == "combined":
+            result = await self._poll_user_combined(token, telegram_id, page_digests or {}, parse)
+            if result is not None or self.breaker.state != "closed" or self.token_tracker.missing_user(token):
+                # While the circuit is open or probing, more calls only add load; an answer
+                # without a user would only be repeated by the separate calls
+                return result
+            logger.info("🔄 Combined poll failed, falling back to separate calls")
+        return await self._poll_user_legacy(token, telegram_id)
+
+    async def finish_poll(self, result: Dict[str, Any], telegram_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Parse the "page_data" of an unparsed poll result into "grades" (CPU
+        only, no requests). A page with no grades is returned as it is, with
+        an empty list; the user's term list is then rechecked on a later poll.
+        """
+        if "grades" in result or "page_data" not in result:
+            return result
+        grades = await self.parse_executor.run(parse_grade_page, result["page_data"])
+        if not grades and telegram_id is not None and self.term_cache.expire_if_older(telegram_id, self.term_recheck_seconds):
+            # A new term may have replaced the cached first one: the next poll reads the
+            # homepage in its combined request instead of refetching everything now
+            logger.info(f"🗂️ Current term page empty for user {telegram_id}, rechecking the term list on the next poll")
+        parsed = {key: value for key, value in result.items() if key != "page_data"}
+        return {**parsed, "grades": [grade.with_term(result["term_name"], result["term_id"]) for grade in grades]}
+
+    async def _poll_user_legacy(self, token: str, telegram_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Separate calls; test_token only when the token was not seen working recently"""
+        if self.token_tracker.needs_probe(token):
+            valid = await self.test_token(token)
+            if valid is None:
+                return None
+            if not valid:
+                return {"token_valid": False}
+        user_data = await self.get_user_data(token, telegram_id)
+        if not user_data:
+            # The data calls themselves report a rejected token
+            return {"token_valid": False} if self.token_tracker.is_invalid(token) else None
+        return {"token_valid": True, **user_data}
+
+    async def _poll_user_combined(
+        self, token: str, telegram_id: Optional[int], page_digests: Dict[str, str], parse: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """One aliased request per user when the term list is cached, two otherwise"""
+        try:
+            cached = self.term_cache.get(telegram_id) if telegram_id is not None else None
+            if cached:
+                term_name, term_id = cached[0]
+                payload = {
+                    "operationName": "pollUser",
+                    "variables": {"params": [{"name": "t_grade_id", "value": term_id}]},
+                    "query": UNIVERSITY_QUERIES["POLL_USER"],
+                }
+            else:
+                payload = {"operationName": "pollUserHomepage", "query": UNIVERSITY_QUERIES["POLL_USER_HOMEPAGE"]}
+            
+            status, data = await self._post_json(self.api_url, payload, token, operation="poll")
+            if is_auth_failure(status, data):
+                return {"token_valid": False}
+            if status != 200 or not data or not data.get("data"):
+                return None
+            
+            user_info = (data["data"].get("getGUI") or {}).get("user")
+            if self.token_tracker.record_user(token, user_info is not None):
+                return {"token_valid": False}
+            if user_info is None:
+                return None
+            
+            page_data = None
+            secrets = user_secrets(user_info) if self.cassette is not None else ()
+            if cached:
+                page_data = data["data"].get("grades")
+                await self._capture("term_page", page_data, term_id, telegram_id, secrets)
+            else:
+                homepage = data["data"].get("homepage") or {}
+                await self._capture("homepage", homepage, telegram_id=telegram_id, secrets=secrets)
+                terms = self.extract_terms_from_homepage(homepage)
+                if terms and telegram_id is not None:
+                    self.term_cache.put(telegram_id, terms)
+                if terms:
+                    term_name, term_id = terms[0]
+                    page_data = await self.fetch_term_page(token, term_id, telegram_id, secrets)
+            
+            result = {"token_valid": True, **user_info}
+            if not page_data:
+                # No term page (no terms listed, or its fetch failed): the full path
+                # refreshes a stale term list and tries the fallback term ids
+                return {**result, "grades": await self.get_current_grades(token, telegram_id)}
+            digest = page_digest(page_data)
+            if page_digests.get(term_id) == digest:
+                return {**result, "unchanged": True, "term_id": term_id, "page_digest": digest}
+            result.update(page_data=page_data, term_name=term_name, term_id=term_id, page_digest=digest)
+            return await self.finish_poll(result, telegram_id) if parse else result
+            
+        except Exception as e:
+            logger.error(f"❌ Error in combined poll: {e}", exc_info=True)
+            return None
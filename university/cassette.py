@@ -0,0 +1,244 @@
+"""
+📼 Cassette Store
+Opt-in capture of raw getPage payloads and a replay transport that serves them back
+"""
+
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+# Student numbers such as ENG2425041 and long national/phone numbers
+STUDENT_ID_RE = re.compile(r"\b[A-Z]{2,5}\d{6,}\b|\b\d{8,}\b")
+
+
+def anonymize(value: Any, secrets: Tuple[str, ...] = ()) -> Any:
+    """Replace personal strings (known secrets, emails, student numbers) in a payload"""
+    if isinstance(value, str):
+        for secret in secrets:
+            if secret:
+                value = value.replace(secret, "«redacted»")
+        value = EMAIL_RE.sub("«email»", value)
+        return STUDENT_ID_RE.sub("«id»", value)
+    if isinstance(value, list):
+        return [anonymize(item, secrets) for item in value]
+    if isinstance(value, dict):
+        return {key: anonymize(item, secrets) for key, item in value.items()}
+    return value
+
+
+def user_secrets(user_info: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+    """Personal strings from a getGUI user record, for anonymize()"""
+    values = []
+    for key in ("username", "name", "fullname", "firstname", "lastname", "email"):
+        value = str((user_info or {}).get(key) or "").strip()
+        # Short or numeric values would also erase marks from the page
+        if len(value) >= 4 and not value.isdigit():
+            values.append(value)
+    # Longest first so a full name is not split by its parts
+    return tuple(sorted(set(values), key=len, reverse=True))
+
+
+class CassetteStore:
+    """
+    Directory archive: pages/<sha256>.json.gz holds each distinct anonymized
+    payload once; index.jsonl records which page a (user, term) last returned.
+    Users are stored as salted hashes only.
+    """
+
+    def __init__(self, directory: Optional[str] = None, salt: Optional[str] = None):
+        self.directory = directory or CONFIG.get("CASSETTE_DIR", os.path.join("data", "cassettes"))
+        self.salt = salt if salt is not None else CONFIG.get("CASSETTE_SALT", "")
+        self.pages_dir = os.path.join(self.directory, "pages")
+        self.index_path = os.path.join(self.directory, "index.jsonl")
+        # (user, operation, term_id) -> (digest, sequence) of the latest capture
+        self._latest: Optional[Dict[Tuple[Optional[str], str, Optional[str]], Tuple[str, int]]] = None
+        self._sequence = 0
+        # capture() runs in worker threads; the index and page files are shared
+        self._lock = threading.Lock()
+        self.captured = 0
+        self.deduplicated = 0
+
+    def user_key(self, telegram_id: Optional[int]) -> Optional[str]:
+        if telegram_id is None:
+            return None
+        return hashlib.sha256(f"{self.salt}:{telegram_id}".encode("utf-8")).hexdigest()[:16]
+
+    def _page_path(self, digest: str) -> str:
+        return os.path.join(self.pages_dir, f"{digest}.json.gz")
+
+    def _load_index(self) -> Dict[Tuple[Optional[str], str, Optional[str]], Tuple[str, int]]:
+        if self._latest is None:
+            self._latest = {}
+            for entry in self.entries():
+                self._sequence += 1
+                self._latest[(entry.get("user"), entry["operation"], entry.get("term_id"))] = (entry["digest"], self._sequence)
+        return self._latest
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Index entries, oldest first"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def capture(
+        self,
+        operation: str,
+        payload: Dict[str, Any],
+        term_id: Optional[str] = None,
+        telegram_id: Optional[int] = None,
+        secrets: Tuple[str, ...] = (),
+    ) -> Optional[str]:
+        """Store an anonymized payload; returns its content hash"""
+        try:
+            clean = anonymize(payload, secrets)
+            raw = json.dumps(clean, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            digest = hashlib.sha256(raw).hexdigest()
+            user = self.user_key(telegram_id)
+            key = (user, operation, term_id)
+            with self._lock:
+                latest = self._load_index()
+                if latest.get(key, (None,))[0] == digest:
+                    self.deduplicated += 1
+                    return digest
+
+                os.makedirs(self.pages_dir, exist_ok=True)
+                path = self._page_path(digest)
+                if os.path.exists(path):
+                    self.deduplicated += 1
+                else:
+                    with gzip.open(path, "wb") as f:
+                        f.write(raw)
+                    self.captured += 1
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({
+                        "digest": digest,
+                        "operation": operation,
+                        "term_id": term_id,
+                        "user": user,
+                        "captured_at": datetime.utcnow().isoformat(),
+                        "bytes": len(raw),
+                    }) + "\n")
+                self._sequence += 1
+                latest[key] = (digest, self._sequence)
+                return digest
+        except Exception as e:
+            logger.error(f"❌ Error capturing {operation} payload: {e}", exc_info=True)
+            return None
+
+    def load(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with gzip.open(self._page_path(digest), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def latest(self, telegram_id: int, operation: str = "term_page", term_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Last captured payload for a user (any term when term_id is None)"""
+        user = self.user_key(telegram_id)
+        with self._lock:
+            matches = [
+                (sequence, digest)
+                for (entry_user, entry_operation, entry_term), (digest, sequence) in self._load_index().items()
+                if entry_user == user and entry_operation == operation and (term_id is None or entry_term == term_id)
+            ]
+        return self.load(max(matches)[1]) if matches else None
+
+    def digests(self, operation: Optional[str] = None) -> List[str]:
+        """Distinct stored payload hashes, optionally for one operation"""
+        seen = {}
+        for entry in self.entries():
+            if operation is None or entry["operation"] == operation:
+                seen.setdefault(entry["digest"], None)
+        return list(seen)
+
+    def iter_payloads(self, operation: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for digest in self.digests(operation):
+            payload = self.load(digest)
+            if payload is not None:
+                yield payload
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "captured": self.captured,
+            "deduplicated": self.deduplicated,
+        }
+
+
+class CassetteReplay:
+    """
+    Transport for UniversityAPIV2 that answers from a CassetteStore instead of
+    the network. Grade pages are served round-robin per term.
+    """
+
+    def __init__(self, store: CassetteStore):
+        self.store = store
+        self._pages: Dict[Optional[str], Iterator[Dict[str, Any]]] = {}
+        self._homepage: Optional[Dict[str, Any]] = None
+        # respond() is called from worker threads
+        self._lock = threading.Lock()
+        self.served = 0
+
+    def _grade_page(self, term_id: Optional[str]) -> Dict[str, Any]:
+        if term_id not in self._pages:
+            entries = [
+                entry["digest"] for entry in self.store.entries()
+                if entry["operation"] == "term_page" and entry.get("term_id") == term_id
+            ] or self.store.digests("term_page")
+            payloads = [payload for payload in (self.store.load(d) for d in dict.fromkeys(entries)) if payload]
+            self._pages[term_id] = itertools.cycle(payloads or [{"panels": []}])
+        return next(self._pages[term_id])
+
+    def _homepage_page(self) -> Dict[str, Any]:
+        if self._homepage is None:
+            self._homepage = next(self.store.iter_payloads("homepage"), {"panels": []})
+        return self._homepage
+
+    @staticmethod
+    def _term_param(variables: Dict[str, Any]) -> Optional[str]:
+        for param in variables.get("params") or []:
+            if param.get("name") == "t_grade_id":
+                return str(param.get("value"))
+        return None
+
+    def respond(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            return self._respond(payload)
+
+    def _respond(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        self.served += 1
+        operation = payload.get("operationName")
+        variables = payload.get("variables") or {}
+        query = payload.get("query") or ""
+        if operation == "signinUser":
+            return 200, {"data": {"login": "replay-token"}}
+
+        data: Dict[str, Any] = {}
+        # Persisted-query requests carry no document, so go by operation name too
+        if "getGUI" in query or operation in ("pollUser", "pollUserHomepage"):
+            data["getGUI"] = {"user": {"id": "0", "username": "replay", "name": "replay", "fullname": "replay"}}
+        if operation == "pollUser":
+            data["grades"] = self._grade_page(self._term_param(variables))
+        elif operation == "pollUserHomepage":
+            data["homepage"] = self._homepage_page()
+        elif operation == "getPage":
+            if variables.get("name") == "homepage":
+                data["getPage"] = self._homepage_page()
+            else:
+                data["getPage"] = self._grade_page(self._term_param(variables))
+        return 200, {"data": data}
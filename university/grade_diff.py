@@ -0,0 +1,123 @@
+"""
+🔍 Grade Diff
+Canonical fingerprints of a term's grades and field-level changes between two polls
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from university.grade_record import Grade, GradeStatus
+
+# Fields a student is notified about, in message order
+DIFF_FIELDS = ("coursework", "final_exam", "total")
+FIELD_LABELS = {"coursework": "الأعمال", "final_exam": "النظري", "total": "النهائي"}
+
+
+def grades_fingerprint(grades: Iterable[Grade]) -> str:
+    """
+    sha256 over the sorted compare keys: equal fingerprints mean diff_grades()
+    would find nothing, whatever the page layout or row order.
+    """
+    keys = sorted((grade.compare_key for grade in grades if grade.key), key=lambda k: tuple(str(v) for v in k))
+    canonical = json.dumps(keys, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class FieldChange:
+    field: str
+    old: Optional[str]
+    new: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class GradeChange:
+    """A course whose notified fields differ from the stored row (previous is None for a new course)"""
+
+    grade: Grade
+    previous: Optional[Grade]
+    fields: Tuple[FieldChange, ...]
+
+    @property
+    def is_new(self) -> bool:
+        return self.previous is None
+
+    @property
+    def newly_published(self) -> bool:
+        return (
+            self.previous is not None
+            and self.grade.grade_status == GradeStatus.PUBLISHED
+            and self.previous.grade_status != GradeStatus.PUBLISHED
+        )
+
+
+def diff_grades(old_grades: Iterable[Grade], new_grades: Iterable[Grade]) -> List[GradeChange]:
+    """Courses of new_grades that are new or changed against old_grades, with the fields that changed"""
+    previous = {grade.key: grade for grade in old_grades if grade.key}
+    changes = []
+    for grade in new_grades:
+        if not grade.key:
+            continue
+        old = previous.get(grade.key)
+        if old is not None and old.compare_key == grade.compare_key:
+            continue
+        fields = () if old is None else tuple(
+            FieldChange(name, getattr(old, name), getattr(grade, name))
+            for name in DIFF_FIELDS
+            if getattr(old, name) != getattr(grade, name)
+        )
+        changes.append(GradeChange(grade, old, fields))
+    return changes
+
+
+def change_entries(changes: Iterable[GradeChange]) -> List[Dict[str, Any]]:
+    """
+    JSON-ready form of the changed fields, as stored with a queued notification:
+    [{"key", "name", "code", "fields": {field: [old, new]}}]
+    """
+    return [
+        {
+            "key": change.grade.key,
+            "name": change.grade.get("name", "N/A"),
+            "code": change.grade.get("code", "-"),
+            "fields": {fc.field: [fc.old, fc.new] for fc in change.fields},
+        }
+        for change in changes
+        if change.fields
+    ]
+
+
+def merge_change_entries(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fold later changes into earlier ones: each field keeps its first old value
+    and takes its latest new value; a field changed back drops out.
+    """
+    merged = {entry["key"]: {**entry, "fields": dict(entry["fields"])} for entry in old}
+    for entry in new:
+        current = merged.setdefault(entry["key"], {**entry, "fields": {}})
+        current["name"], current["code"] = entry["name"], entry["code"]
+        for field, (before, after) in entry["fields"].items():
+            first = current["fields"].get(field, [before])[0]
+            if first == after:
+                current["fields"].pop(field, None)
+            else:
+                current["fields"][field] = [first, after]
+    return [entry for entry in merged.values() if entry["fields"]]
+
+
+def format_changes_message(entries: List[Dict[str, Any]], updated_at: datetime) -> str:
+    """The grade update notification; updated_at is shown as is (UTC+3)"""
+    message = "🎓 تم تحديث درجاتك في المواد التالية:\n\n"
+    for entry in entries:
+        lines = [
+            f"{FIELD_LABELS[field]}: {before} → {after}"
+            for field in DIFF_FIELDS
+            if field in entry["fields"]
+            for before, after in [entry["fields"][field]]
+        ]
+        message += f"📚 {entry['name']} ({entry['code']})\n" + "\n".join(lines) + "\n\n"
+    message += f"🕒 وقت التحديث: {updated_at.strftime('%Y-%m-%d %H:%M')} (UTC+3)"
+    return message
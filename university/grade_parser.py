@@ -0,0 +1,219 @@
+"""
+⚡ Grade Table Parser
+Single-pass extraction of table rows and cell text from the SIS grade HTML
+"""
+
+import hashlib
+import logging
+from html.parser import HTMLParser
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from university.grade_record import Grade, GradeStatus
+
+logger = logging.getLogger(__name__)
+
+# A table is a list of rows, a row is a list of cell strings
+Table = List[List[str]]
+
+# Elements that never hold children (closed as soon as they open)
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+})
+
+# Text inside these is not part of get_text() output
+SKIPPED_TEXT_ELEMENTS = frozenset({"script", "style", "template", "rt", "rp"})
+
+
+class GradeTableParser(HTMLParser):
+    """
+    Streams through the HTML once and collects, for every <table>, its <tr>
+    rows and their <td> texts. Mirrors what BeautifulSoup's html.parser tree
+    gives with find_all("table") / find_all("tr") / find_all("td") and
+    get_text(strip=True), nested tables included, without building a tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables: List[List[List[List[str]]]] = []
+        self._stack: List[str] = []
+        self._open_tables: List[List[List[List[str]]]] = []
+        self._open_rows: List[List[List[str]]] = []
+        self._open_cells: List[List[str]] = []
+        self._skip_depth = 0
+        self._text: List[str] = []
+        # Void elements closed on their start tag; a later stray end tag is swallowed
+        self._closed_void: List[str] = []
+
+    def _flush_text(self):
+        # Adjacent data chunks form one string before stripping, like bs4
+        if self._text:
+            text = "".join(self._text).strip()
+            self._text = []
+            if text and not self._skip_depth:
+                for cell in self._open_cells:
+                    cell.append(text)
+
+    def handle_starttag(self, tag, attrs, close_void=True):
+        self._flush_text()
+        if tag in VOID_ELEMENTS and close_void:
+            self._closed_void.append(tag)
+            return
+        self._stack.append(tag)
+        if tag == "table":
+            table = []
+            self.tables.append(table)
+            self._open_tables.append(table)
+        elif tag == "tr":
+            row = []
+            for table in self._open_tables:
+                table.append(row)
+            self._open_rows.append(row)
+        elif tag == "td":
+            cell = []
+            for row in self._open_rows:
+                row.append(cell)
+            self._open_cells.append(cell)
+        elif tag in SKIPPED_TEXT_ELEMENTS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, close_void=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+            return
+        self._flush_text()
+        if tag not in self._stack:
+            return
+        # Close everything up to the most recent matching open element
+        while self._stack:
+            name = self._stack.pop()
+            if name == "table":
+                self._open_tables.pop()
+            elif name == "tr":
+                self._open_rows.pop()
+            elif name == "td":
+                self._open_cells.pop()
+            elif name in SKIPPED_TEXT_ELEMENTS:
+                self._skip_depth -= 1
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        if self._open_cells:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+
+def extract_tables(html_content: str) -> List[Table]:
+    """Return every table in the HTML as rows of stripped cell texts (header row included)"""
+    parser = GradeTableParser()
+    parser.feed(html_content)
+    parser.close()
+    return [[["".join(cell) for cell in row] for row in table] for table in parser.tables]
+
+
+def extract_tables_bs4(html_content: str) -> List[Table]:
+    """Reference BeautifulSoup implementation, kept for equivalence tests and benchmarks"""
+    soup = BeautifulSoup(html_content, "html.parser")
+    return [
+        [[td.get_text(strip=True) for td in row.find_all("td")] for row in table.find_all("tr")]
+        for table in soup.find_all("table")
+    ]
+
+
+def parse_grade_page(page_data: dict) -> List[Grade]:
+    """Parse every grade block of a getPage payload (picklable, runs in parse workers)"""
+    grades = []
+
+    try:
+        panels = page_data.get("panels", [])
+        if not panels:
+            return grades
+
+        blocks = panels[0].get("blocks", [])
+
+        for block_idx, block in enumerate(blocks):
+            html_content = block.get("body", "")
+            if not html_content:
+                continue
+
+            block_grades = parse_grade_html(html_content, block_idx + 1)
+            grades.extend(block_grades)
+
+            logger.info(f"📊 Block {block_idx + 1}: Found {len(block_grades)} courses")
+
+        logger.info(f"🎉 Total courses found: {len(grades)}")
+        return grades
+
+    except Exception as e:
+        logger.error(f"❌ Error parsing grades: {e}", exc_info=True)
+        return []
+
+
+def parse_grade_html(html_content: str, block_num: int) -> List[Grade]:
+    """Parse grades from HTML content"""
+    grades = []
+
+    try:
+        tables = extract_tables(html_content)
+
+        for table_idx, table in enumerate(tables):
+            rows = table[1:]  # Skip header row
+
+            for row_idx, cells in enumerate(rows):
+                # Skip rows without course code
+                if len(cells) < 2 or not cells[1].strip():
+                    continue
+
+                # Skip summary rows
+                code = cells[1].strip()
+                name = cells[0].strip()
+                if code.isdigit() and "term" in name.lower():
+                    continue
+
+                # Create grade object
+                grade = Grade(
+                    block=block_num,
+                    table=table_idx + 1,
+                    row=row_idx + 1,
+                    name=cells[0] if len(cells) > 0 else '',
+                    code=cells[1] if len(cells) > 1 else '',
+                    ects=cells[2] if len(cells) > 2 else '',
+                    coursework=cells[3] if len(cells) > 3 else '',
+                    final_exam=cells[4] if len(cells) > 4 else '',
+                    total=cells[5] if len(cells) > 5 else '',
+                )
+
+                grades.append(grade)
+
+    except Exception as e:
+        logger.error(f"❌ Error parsing HTML for block {block_num}: {e}", exc_info=True)
+
+    return grades
+
+
+def get_grade_status(grade_text: str) -> str:
+    """Determine grade status"""
+    return GradeStatus.from_total(grade_text).value
+
+
+def page_digest(page_data: dict) -> str:
+    """sha256 of the raw grade block bodies, used to skip unchanged pages"""
+    digest = hashlib.sha256()
+    for panel in (page_data or {}).get("panels") or []:
+        for block in panel.get("blocks") or []:
+            digest.update((block.get("body") or "").encode("utf-8"))
+            digest.update(b"\x1f")
+    return digest.hexdigest()
@@ -0,0 +1,132 @@
+"""
+📄 Grade Record
+Typed, immutable grade row shared by the parser, storage, the diff and analytics
+"""
+
+import re
+from dataclasses import dataclass, field, fields, replace
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+NOT_PUBLISHED_TEXT = "لم يتم النشر"
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# GradeStorageV2.get_user_grades row keys -> record fields
+STORED_FIELDS = {
+    "course_name": "name",
+    "course_code": "code",
+    "ects_credits": "ects",
+    "coursework_grade": "coursework",
+    "final_exam_grade": "final_exam",
+    "total_grade_value": "total",
+}
+
+
+class GradeStatus(str, Enum):
+    PUBLISHED = "Published"
+    NOT_PUBLISHED = "Not Published"
+    UNKNOWN = "Unknown"
+
+    @classmethod
+    def from_total(cls, total: str) -> "GradeStatus":
+        if not total or not total.strip() or NOT_PUBLISHED_TEXT in total:
+            return cls.NOT_PUBLISHED
+        if "%" in total:
+            return cls.PUBLISHED
+        return cls.UNKNOWN
+
+
+def parse_number(text: str) -> Optional[float]:
+    """First number in a cell such as '87 %' or '24 / 30'"""
+    match = NUMBER_RE.search(text) if text else None
+    return float(match.group(0)) if match else None
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Grade:
+    """
+    One course row. numeric_total, grade_status and compare_key are derived
+    from the raw cells once, at construction. get() and [] accept the parser's
+    dict keys so older call sites keep working.
+    """
+
+    name: str
+    code: str
+    ects: str = ""
+    coursework: str = ""
+    final_exam: str = ""
+    total: str = ""
+    term_name: str = ""
+    term_id: str = ""
+    block: int = 0
+    table: int = 0
+    row: int = 0
+    numeric_total: Optional[float] = field(init=False)
+    grade_status: GradeStatus = field(init=False)
+    # (course key, total, coursework, final exam): what a change notification is about
+    compare_key: Tuple[str, str, str, str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "numeric_total", parse_number(self.total))
+        object.__setattr__(self, "grade_status", GradeStatus.from_total(self.total))
+        object.__setattr__(self, "compare_key", (self.code or self.name, self.total, self.coursework, self.final_exam))
+
+    @property
+    def key(self) -> str:
+        """Course identity used to match rows across polls"""
+        return self.code or self.name
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Grade":
+        """Build from a parser-style or GradeStorageV2-style dict"""
+        values = {STORED_FIELDS.get(key, key): value for key, value in data.items()}
+        return cls(
+            name=_text(values.get("name")),
+            code=_text(values.get("code")),
+            ects=_text(values.get("ects")),
+            coursework=_text(values.get("coursework")),
+            final_exam=_text(values.get("final_exam")),
+            total=_text(values.get("total")),
+            term_name=_text(values.get("term_name")),
+            term_id=_text(values.get("term_id")),
+            block=values.get("block") or 0,
+            table=values.get("table") or 0,
+            row=values.get("row") or 0,
+        )
+
+    def with_term(self, term_name: str, term_id: str) -> "Grade":
+        return replace(self, term_name=term_name, term_id=term_id)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELD_NAMES else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_NAMES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in _FIELD_NAMES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict in the parser's historical shape (for JSON and logs)"""
+        data = {name: getattr(self, name) for name in _FIELD_ORDER if name != "compare_key"}
+        data["grade_status"] = self.grade_status.value
+        return data
+
+
+_FIELD_ORDER = tuple(f.name for f in fields(Grade))
+_FIELD_NAMES = frozenset(_FIELD_ORDER)
+
+
+def as_grade(value: Any) -> Grade:
+    """Accept a Grade or any legacy grade dict"""
+    return value if isinstance(value, Grade) else Grade.from_dict(value)
@@ -0,0 +1,189 @@
+"""
+🚦 University API Limiter
+AIMD concurrency control and a circuit breaker for calls to the SIS
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling the SIS while the circuit breaker is open"""
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Every `window` completed requests the limit grows by one when the p95
+    latency is under target and the error rate is low. A 5xx or timeout halves
+    it at once (at most once per window so a burst counts as one signal).
+    """
+
+    def __init__(
+        self,
+        initial: Optional[int] = None,
+        minimum: Optional[int] = None,
+        maximum: Optional[int] = None,
+        latency_target: Optional[float] = None,
+        window: int = 20,
+        max_error_rate: float = 0.05,
+    ):
+        self.minimum = minimum or CONFIG.get("UNIVERSITY_LIMIT_MIN", 2)
+        self.maximum = maximum or CONFIG.get("UNIVERSITY_LIMIT_MAX", 50)
+        self.limit = float(initial or CONFIG.get("MAX_CONCURRENT_REQUESTS", 10))
+        self.latency_target = latency_target or CONFIG.get("UNIVERSITY_LATENCY_TARGET_MS", 2000) / 1000
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window * 5)
+        self._window_count = 0
+        self._window_errors = 0
+        self._last_decrease = 0
+        self._completed = 0
+        self._waiters: deque = deque()
+        self.increases = 0
+        self.decreases = 0
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def p95(self) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[max(0, int(len(ordered) * 0.95) - 1)]
+
+    def record(self, latency: float, ok: bool, overloaded: bool = False):
+        """Feed back one completed request; overloaded means 5xx or timeout"""
+        self._completed += 1
+        self._latencies.append(latency)
+        self._window_count += 1
+        if not ok:
+            self._window_errors += 1
+
+        if overloaded and self._completed - self._last_decrease >= self.window:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = self._completed
+            self.decreases += 1
+            self._window_count = self._window_errors = 0
+            logger.warning(f"🚦 University API overloaded, concurrency limit -> {int(self.limit)}")
+            return
+
+        if self._window_count >= self.window:
+            error_rate = self._window_errors / self._window_count
+            if error_rate <= self.max_error_rate and self.p95() <= self.latency_target and self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1)
+                self.increases += 1
+                self._wake()
+            self._window_count = self._window_errors = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "p95_ms": self.p95() * 1000,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive upstream failures; while open, calls are
+    refused for `cooldown` seconds, then a single probe decides whether to close.
+    """
+
+    def __init__(self, failures: Optional[int] = None, cooldown: Optional[float] = None):
+        self.failure_threshold = failures or CONFIG.get("UNIVERSITY_BREAKER_FAILURES", 10)
+        self.cooldown = cooldown or CONFIG.get("UNIVERSITY_BREAKER_COOLDOWN_SECONDS", 60)
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may go out now"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self):
+        """Free the half-open probe slot when a probe ended without a recorded outcome"""
+        self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("✅ University API recovered, circuit closed")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.error(
+                    f"🔌 University API looks down ({self.consecutive_failures} failures), "
+                    f"pausing calls for {self.cooldown:.0f}s"
+                )
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        remaining = max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": remaining,
+        }
@@ -0,0 +1,109 @@
+"""
+🧵 Parse Executor
+Runs CPU-bound grade HTML parsing off the asyncio event loop
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ParseExecutor:
+    """
+    Bounded worker pool for parse jobs.
+
+    kind is "thread", "process" or "inline" (run on the loop, for tests and
+    debugging). At most max_pending jobs are submitted to the pool at once;
+    further callers wait, and that wait is reported as queue depth.
+    Functions sent to a process pool must be module-level (picklable).
+    """
+
+    def __init__(self, kind: Optional[str] = None, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.kind = kind or CONFIG.get("PARSE_EXECUTOR", "thread")
+        self.workers = workers or CONFIG.get("PARSE_WORKERS", 2)
+        self.max_pending = max_pending or CONFIG.get("PARSE_MAX_PENDING", 32)
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.kind == "inline":
+            return None
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="grade-parse")
+            logger.info(f"🧵 Parse executor started ({self.kind}, {self.workers} workers, {self.max_pending} pending max)")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run func(*args) in the pool and return its result"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            # The semaphore is bound to the loop that created it
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        slots = self._slots
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.monotonic()
+        self.wait_seconds += started - queued_at
+        self.running += 1
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                result = func(*args)
+            else:
+                result = await loop.run_in_executor(executor, func, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.run_seconds += time.monotonic() - started
+            slots.release()
+
+    def shutdown(self):
+        """Stop the worker pool (pending jobs are allowed to finish)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and timing counters for logs and the admin dashboard"""
+        jobs = self.completed + self.failed
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "waiting": self.waiting,
+            "running": self.running,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": (self.wait_seconds / jobs * 1000) if jobs else 0.0,
+            "avg_run_ms": (self.run_seconds / jobs * 1000) if jobs else 0.0,
+        }
@@ -0,0 +1,40 @@
+"""
+🛫 Single-Flight
+Concurrent callers asking for the same thing share one upstream call
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Keyed registry of in-flight calls; later callers await the first call's task"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run call() once per key at a time and return its result to every caller"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.shared += 1
+            logger.debug(f"🛫 Joined in-flight call {key[0] if isinstance(key, tuple) else key}")
+        # Shield so one caller giving up does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "saved": self.shared,
+        }
@@ -0,0 +1,91 @@
+"""
+🗂️ Term Catalog Cache
+Remembers each user's term list so polling does not refetch the homepage
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+TermList = Tuple[Tuple[str, str], ...]
+
+
+class TermCatalogCache:
+    """Per-user term catalog with TTL, explicit invalidation and DB persistence"""
+
+    def __init__(self, storage=None, ttl_hours: Optional[float] = None, max_catalogs: int = 1000):
+        # storage is a GradeStorageV2 (or anything with the term catalog methods)
+        self.storage = storage
+        self.ttl = timedelta(hours=ttl_hours if ttl_hours is not None else CONFIG.get("TERM_CACHE_TTL_HOURS", 24))
+        self._entries: Dict[Any, Tuple[TermList, datetime]] = {}
+        # Identical term lists are interned so thousands of users share one tuple
+        self._catalogs: Dict[TermList, TermList] = {}
+        self.max_catalogs = max_catalogs
+        self.hits = 0
+        self.misses = 0
+
+    def _intern(self, terms: List[Tuple[str, str]]) -> TermList:
+        catalog = tuple((name, term_id) for name, term_id in terms)
+        if catalog not in self._catalogs and len(self._catalogs) >= self.max_catalogs:
+            # Keep only the catalogs some user still holds (old term lists drop out)
+            self._catalogs = {entry[0]: entry[0] for entry in self._entries.values()}
+        return self._catalogs.setdefault(catalog, catalog)
+
+    def _is_fresh(self, fetched_at: datetime) -> bool:
+        return datetime.utcnow() - fetched_at < self.ttl
+
+    def get(self, telegram_id: int) -> Optional[List[Tuple[str, str]]]:
+        """Return the cached term list, or None when missing or expired"""
+        entry = self._entries.get(telegram_id)
+        if entry is None and self.storage is not None:
+            persisted = self.storage.get_term_catalog(telegram_id)
+            if persisted:
+                terms, fetched_at = persisted
+                entry = (self._intern(terms), fetched_at)
+                self._entries[telegram_id] = entry
+        if entry is None or not self._is_fresh(entry[1]):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(entry[0])
+
+    def put(self, telegram_id: int, terms: List[Tuple[str, str]]):
+        """Store a freshly fetched term list"""
+        catalog = self._intern(terms)
+        previous = self._entries.get(telegram_id)
+        self._entries[telegram_id] = (catalog, datetime.utcnow())
+        # Only write through when the list actually changed or the row is stale
+        if self.storage is not None and (previous is None or previous[0] != catalog or not self._is_fresh(previous[1])):
+            self.storage.save_term_catalog(telegram_id, list(catalog))
+
+    def expire_if_older(self, telegram_id: int, seconds: float) -> bool:
+        """Treat a catalog fetched more than seconds ago as expired, so the next get() misses; True if it was"""
+        entry = self._entries.get(telegram_id)
+        if entry is None or datetime.utcnow() - entry[1] < timedelta(seconds=seconds):
+            return False
+        self._entries[telegram_id] = (entry[0], datetime.min)
+        return True
+
+    def invalidate(self, telegram_id: Optional[int] = None):
+        """Drop one user's catalog, or every catalog when telegram_id is None"""
+        if telegram_id is None:
+            self._entries.clear()
+            self._catalogs.clear()
+            logger.info("🗂️ Term catalog cache cleared")
+            return
+        self._entries.pop(telegram_id, None)
+        if self.storage is not None:
+            self.storage.clear_term_catalog(telegram_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache counters for logs and the admin dashboard"""
+        return {
+            "users": len(self._entries),
+            "distinct_catalogs": len(self._catalogs),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,128 @@
+"""
+🔑 Token Tracker
+Infers university token validity from real API calls so polling can skip test_token
+"""
+
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# GraphQL error codes/messages the SIS uses for a rejected or expired token
+AUTH_ERROR_MARKERS = ("unauthenticated", "unauthorized", "not authenticated", "jwt expired", "invalid token", "token expired")
+
+
+def is_auth_failure(status: int, data: Optional[Dict[str, Any]]) -> bool:
+    """True when a response says the bearer token was rejected"""
+    if status in (401, 403):
+        return True
+    for error in (data or {}).get("errors") or []:
+        code = str((error.get("extensions") or {}).get("code", "")).lower()
+        message = str(error.get("message", "")).lower()
+        if any(marker in code or marker in message for marker in AUTH_ERROR_MARKERS):
+            return True
+    return False
+
+
+class TokenTracker:
+    """Last time each token was seen working, and tokens known to be rejected"""
+
+    def __init__(
+        self,
+        stale_minutes: Optional[float] = None,
+        invalid_ttl_hours: Optional[float] = None,
+        missing_user_limit: Optional[int] = None,
+        max_entries: int = 10000,
+    ):
+        minutes = stale_minutes if stale_minutes is not None else CONFIG.get("TOKEN_VERIFY_STALE_MINUTES", 60)
+        self.stale_seconds = minutes * 60
+        hours = invalid_ttl_hours if invalid_ttl_hours is not None else CONFIG.get("TOKEN_INVALID_TTL_HOURS", 24)
+        self.invalid_ttl_seconds = hours * 3600
+        self.missing_user_limit = missing_user_limit or CONFIG.get("TOKEN_MISSING_USER_LIMIT", 3)
+        self.max_entries = max_entries
+        self._verified_at: Dict[str, float] = {}
+        self._invalid: Dict[str, float] = {}
+        self._missing_user: Dict[str, int] = {}
+        self.probes = 0
+        self.probes_skipped = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # Keep digests, not the bearer tokens themselves
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _remember(self, entries: Dict[str, Any], key: str, value: Any):
+        """Set key as the newest entry; past max_entries the oldest ones are dropped"""
+        entries.pop(key, None)
+        entries[key] = value
+        while len(entries) > self.max_entries:
+            del entries[next(iter(entries))]
+
+    def mark_verified(self, token: str):
+        key = self._key(token)
+        self._remember(self._verified_at, key, time.monotonic())
+        self._invalid.pop(key, None)
+
+    def mark_invalid(self, token: str):
+        key = self._key(token)
+        self._verified_at.pop(key, None)
+        self._missing_user.pop(key, None)
+        if key not in self._invalid:
+            logger.info("🔑 University token rejected by the API")
+        self._remember(self._invalid, key, time.monotonic())
+
+    def record_user(self, token: str, present: bool) -> bool:
+        """
+        Note whether a successful response carried the user. A missing user is
+        not an auth error on its own; only missing_user_limit of them in a row
+        mark the token rejected. Returns True when the token counts as rejected.
+        """
+        key = self._key(token)
+        if present:
+            self._missing_user.pop(key, None)
+            return False
+        # Not proof the token works either: check it again on the next legacy poll
+        self._verified_at.pop(key, None)
+        misses = self._missing_user.get(key, 0) + 1
+        if misses < self.missing_user_limit:
+            self._remember(self._missing_user, key, misses)
+            logger.info(f"🔑 Response without a user ({misses}/{self.missing_user_limit}), token kept for now")
+            return False
+        self.mark_invalid(token)
+        return True
+
+    def missing_user(self, token: str) -> bool:
+        """Whether the last response for this token came back without a user"""
+        return self._key(token) in self._missing_user
+
+    def is_invalid(self, token: str) -> bool:
+        key = self._key(token)
+        marked_at = self._invalid.get(key)
+        if marked_at is None:
+            return False
+        if time.monotonic() - marked_at >= self.invalid_ttl_seconds:
+            # Long enough ago to ask the API again instead of trusting it forever
+            del self._invalid[key]
+            return False
+        return True
+
+    def needs_probe(self, token: str) -> bool:
+        """Whether an explicit test_token call is due (unknown or stale token)"""
+        verified_at = self._verified_at.get(self._key(token))
+        if verified_at is not None and time.monotonic() - verified_at < self.stale_seconds:
+            self.probes_skipped += 1
+            return False
+        self.probes += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "verified": len(self._verified_at),
+            "invalid": len(self._invalid),
+            "probes": self.probes,
+            "probes_skipped": self.probes_skipped,
+        }
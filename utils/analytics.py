@@ -6,15 +6,12 @@ Enhanced grade display with motivational quotes and daily wisdom.
 from typing import Dict, List, Any, Optional
 import json
 import os
-import random
 import requests
 import asyncio
 import logging
-import httpx
-import re
-from googletrans import Translator
-import aiohttp
-from utils.translation import translate_text
+from utils.quote_pool import QuotePool
+from utils.translation import translation_service
+from university.grade_record import as_grade
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -29,6 +26,8 @@ class GradeAnalytics:
         self.achievements_file = "data/achievements.json"
         self.daily_quotes_file = "data/daily_quotes.json"
         self._ensure_files()
+        # Refreshed in the background by QuotePool.run()
+        self.quote_pool = QuotePool()
 
     def _ensure_files(self):
         """Ensure analytics and achievements files exist"""
@@ -48,16 +47,14 @@ class GradeAnalytics:
             return ["beginning"]
         numeric_totals = []
         letter_grades = []
-        for grade in grades:
-            total = grade.get("total")
-            if total is None or total == "" or total == "لم يتم النشر":
+        for grade in map(as_grade, grades):
+            total = grade.total
+            if total == "" or total == "لم يتم النشر":
                 continue
-            # Try numeric
-            try:
-                numeric_totals.append(float(total))
+            # Numeric totals ("87", "87 %") were parsed when the record was built
+            if grade.numeric_total is not None:
+                numeric_totals.append(grade.numeric_total)
                 continue
-            except Exception:
-                pass
             # Check for single- and double-letter grades
             t = str(total).strip().upper()
             # Single-letter
@@ -99,54 +96,8 @@ class GradeAnalytics:
         return ["learning"]
 
     async def get_daily_quote(self, categories: list = None) -> dict:
-        """Fetch a daily quote, trying all preferred and general keywords in order."""
-        general_keywords = [
-            "philosophy", "wisdom", "motivation", "learning", "education", "progress", "growth", "Psychology", "Anthropology"
-        ]
-        # If categories is a string, convert to list
-        if categories is None:
-            categories = []
-        elif isinstance(categories, str):
-            categories = [categories]
-        # Remove duplicates, preserve order
-        seen = set()
-        all_keywords = [k for k in categories if not (k in seen or seen.add(k))] + [k for k in general_keywords if k not in categories]
-        # Try each keyword in order
-        for keyword in all_keywords:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    # ZenQuotes API (English)
-                    url = f"https://zenquotes.io/api/random"
-                    async with session.get(url) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            if data and isinstance(data, list):
-                                q = data[0].get("q", "")
-                                a = data[0].get("a", "")
-                                if q:
-                                    return {"text": q, "author": a, "philosophy": keyword}
-                    # API Ninjas fallback
-                    url2 = f"https://api.api-ninjas.com/v1/quotes?category={keyword}"
-                    headers = {"X-Api-Key": "YOUR_API_KEY"}  # Set your API key
-                    async with session.get(url2, headers=headers) as resp2:
-                        if resp2.status == 200:
-                            data2 = await resp2.json()
-                            if data2 and isinstance(data2, list):
-                                q = data2[0].get("quote", "")
-                                a = data2[0].get("author", "")
-                                if q:
-                                    return {"text": q, "author": a, "philosophy": keyword}
-            except Exception as e:
-                logger.warning(f"Quote API failed for keyword '{keyword}': {e}")
-        # Use local fallback quote
-        fallback_quotes = [
-            {"text": "The only way to do great work is to love what you do.", "author": "Steve Jobs", "philosophy": "motivation"},
-            {"text": "Knowledge is power.", "author": "Francis Bacon", "philosophy": "knowledge"},
-            {"text": "To be yourself in a world that is constantly trying to make you something else is the greatest accomplishment.", "author": "Ralph Waldo Emerson", "philosophy": "self-improvement"},
-            {"text": "The unexamined life is not worth living.", "author": "Socrates", "philosophy": "philosophy"},
-            {"text": "Success is not final, failure is not fatal: It is the courage to continue that counts.", "author": "Winston Churchill", "philosophy": "resilience"},
-        ]
-        return random.choice(fallback_quotes)
+        """A quote for the given categories from the in-memory pool (no network I/O)."""
+        return self.quote_pool.pick(categories)
 
     async def get_quote_for_grade(self, grade_value: str) -> dict:
         """Get a quote related to a specific grade value (for update notifications), always including general keywords."""
@@ -164,7 +115,7 @@ class GradeAnalytics:
         return await self.get_daily_quote(categories)
 
     async def format_quote_dual_language(self, quote) -> str:
-        """Format quote: "[EN]"\n"[AR]"\n[AUTHOR]. Only translate from English to Arabic. Always wrap quotes in double quotation marks. Adds a short disclaimer below the quote."""
+        """Format quote: "[EN]"\n"[AR]"\n[AUTHOR]. Only translate from English to Arabic (English alone until the translation is cached). Always wrap quotes in double quotation marks. Adds a short disclaimer below the quote."""
         try:
             if isinstance(quote, dict):
                 text = quote.get('text', '')
@@ -176,7 +127,11 @@ class GradeAnalytics:
                 return ''
             # Only translate if text is English
             if any('a' <= c.lower() <= 'z' for c in text):
-                translated = await translate_text(text, target_lang='ar')
+                # Precomputed by the quote pool or cached; never wait on a translation here
+                translated = (quote.get('ar') if isinstance(quote, dict) else None) or translation_service.lookup(text, 'ar')
+                if translated is None:
+                    translation_service.prefetch(text, 'ar')
+                    translated = ''
                 if translated.strip() and translated.strip() != text.strip():
                     quote_block = f'"{text}"\n"{translated}"' + (f'\n{author}' if author else '')
                 else:
@@ -203,18 +158,14 @@ class GradeAnalytics:
         self, telegram_id: int, old_grades: List[Dict[str, Any]]
     ) -> str:
         """Format old grades with analysis and dual-language quote, using a relevant category."""
-        import re
         try:
+            old_grades = [as_grade(grade) for grade in old_grades]
             category = self.get_quote_category_for_grades(old_grades)
             quote = await self.get_daily_quote(category)
             total_courses = len(old_grades)
             completed_courses = sum(1 for grade in old_grades if grade.get("total"))
             avg_grade = self._calculate_average_grade(old_grades)
-            has_numeric = any(
-                (isinstance(grade.get("total"), (int, float)) and grade.get("total") is not None) or
-                (isinstance(grade.get("total"), str) and grade.get("total") is not None and isinstance(grade.get("total"), str) and re.search(r"\d+(?:\.\d+)?", grade.get("total")))
-                for grade in old_grades
-            )
+            has_numeric = any(grade.numeric_total is not None for grade in old_grades)
             avg_grade_str = (
                 f"{avg_grade:.2f}%" if has_numeric and avg_grade > 0 else "لا يوجد درجات رقمية لحساب المتوسط"
             )
@@ -250,30 +201,17 @@ class GradeAnalytics:
             logger.error(f"Error formatting old grades: {e}")
             return "❌ حدث خطأ أثناء تحليل الدرجات السابقة."
 
-    def _calculate_average_grade(self, grades: List[Dict[str, Any]]) -> float:
+    def _calculate_average_grade(self, grades: List[Any]) -> float:
         """
-        Calculate the average grade from the 'total' field of each grade.
-        - Extracts the first numeric value from each 'total' (e.g., '87 %', '94', etc.)
+        Calculate the average grade from the numeric total of each grade.
+        - Uses the number parsed from 'total' (e.g., '87 %', '94') when the record was built
         - Skips grades with 'لم يتم النشر', empty, or non-numeric values
-        - Ignores letter grades and other non-numeric formats
         Returns the average as a float, or 0.0 if no numeric grades found.
         """
-        import re
         try:
-            total_grades = []
-            for grade in grades:
-                total = grade.get("total")
-                if not total or not isinstance(total, str):
-                    continue
-                if total.strip() == '' or total.strip() == 'لم يتم النشر':
-                    continue
-                # Extract first number (integer or float) from the string
-                match = re.search(r"\d+(?:\.\d+)?", total)
-                if match:
-                    try:
-                        total_grades.append(float(match.group(0)))
-                    except Exception:
-                        continue
+            total_grades = [
+                grade.numeric_total for grade in map(as_grade, grades) if grade.numeric_total is not None
+            ]
             if total_grades:
                 return sum(total_grades) / len(total_grades)
             return 0.0
@@ -285,18 +223,14 @@ class GradeAnalytics:
         self, telegram_id: int, grades: List[Dict[str, Any]]
     ) -> str:
         """Format current term grades and append a dual-language quote, using a relevant category."""
-        import re
         try:
+            grades = [as_grade(grade) for grade in grades]
             category = self.get_quote_category_for_grades(grades)
             quote = await self.get_daily_quote(category)
             total_courses = len(grades)
             completed_courses = sum(1 for grade in grades if grade.get("total"))
             avg_grade = self._calculate_average_grade(grades)
-            has_numeric = any(
-                (isinstance(grade.get("total"), (int, float)) and grade.get("total") is not None) or
-                (isinstance(grade.get("total"), str) and grade.get("total") is not None and isinstance(grade.get("total"), str) and re.search(r"\d+(?:\.\d+)?", grade.get("total")))
-                for grade in grades
-            )
+            has_numeric = any(grade.numeric_total is not None for grade in grades)
             avg_grade_str = (
                 f"{avg_grade:.2f}%" if has_numeric and avg_grade > 0 else "لا يوجد درجات رقمية لحساب المتوسط"
             )
@@ -210,6 +210,24 @@ def get_settings_main_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+# Grade notification windows a user can pick (minutes)
+DIGEST_CHOICES = ((0, "⚡ فوري"), (15, "⏱️ 15 دقيقة"), (60, "🕐 ساعة"))
+
+
+def get_digest_settings_keyboard(current_minutes: float = 0) -> InlineKeyboardMarkup:
+    """Grade notification window: one message per change, or changes merged over a window."""
+    buttons = [
+        [
+            InlineKeyboardButton(
+                f"{'✅ ' if current_minutes == minutes else ''}{label}", callback_data=f"digest_{minutes}"
+            )
+            for minutes, label in DIGEST_CHOICES
+        ],
+        [InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")],
+    ]
+    return InlineKeyboardMarkup(buttons)
+
+
 def get_notification_settings_keyboard() -> InlineKeyboardMarkup:
     """Notification settings keyboard."""
     buttons = [
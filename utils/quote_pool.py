@@ -0,0 +1,232 @@
+"""
+💬 Quote Pool
+Quotes kept in memory by category and refreshed in the background, so
+grade messages pick a quote without any network call
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from config import CONFIG
+from utils.translation import translate_text
+
+logger = logging.getLogger(__name__)
+
+# Categories chosen by GradeAnalytics.get_quote_category_for_grades, and the
+# API Ninjas categories each one is filled from
+CATEGORY_SOURCES = {
+    "excellence": ("success", "great"),
+    "achievement": ("success", "inspirational"),
+    "growth": ("change", "experience"),
+    "perseverance": ("courage", "hope", "failure"),
+    "learning": ("learning", "education", "knowledge"),
+}
+# Uncategorized quotes (ZenQuotes), used when a category has none
+GENERAL = "general"
+
+FALLBACK_QUOTES = [
+    {"text": "The only way to do great work is to love what you do.", "author": "Steve Jobs", "philosophy": "motivation"},
+    {"text": "Knowledge is power.", "author": "Francis Bacon", "philosophy": "knowledge"},
+    {"text": "To be yourself in a world that is constantly trying to make you something else is the greatest accomplishment.", "author": "Ralph Waldo Emerson", "philosophy": "self-improvement"},
+    {"text": "The unexamined life is not worth living.", "author": "Socrates", "philosophy": "philosophy"},
+    {"text": "Success is not final, failure is not fatal: It is the courage to continue that counts.", "author": "Winston Churchill", "philosophy": "resilience"},
+]
+
+
+class QuotePool:
+    """
+    pick() reads from memory only. refresh() fetches new quotes (one ZenQuotes
+    batch, plus API Ninjas per category when a key is configured), merges them
+    into the buckets, precomputes their Arabic ("ar") and saves the pool to
+    disk, so a restart starts warm.
+    """
+
+    def __init__(
+        self,
+        path: str = "data/quote_pool.json",
+        per_category: Optional[int] = None,
+        refresh_hours: Optional[float] = None,
+        api_key: Optional[str] = None,
+    ):
+        self.path = path
+        self.per_category = per_category or CONFIG.get("QUOTE_POOL_PER_CATEGORY", 50)
+        self.refresh_seconds = (refresh_hours or CONFIG.get("QUOTE_POOL_REFRESH_HOURS", 6)) * 3600
+        self.api_key = api_key if api_key is not None else CONFIG.get("QUOTES_API_NINJAS_KEY", "")
+        self.translate_concurrency = CONFIG.get("QUOTE_POOL_TRANSLATE_CONCURRENCY", 4)
+        self.translate_budget_seconds = CONFIG.get("QUOTE_POOL_TRANSLATE_BUDGET_SECONDS", 120)
+        self.translate_retry_seconds = CONFIG.get("QUOTE_POOL_TRANSLATE_RETRY_HOURS", 24) * 3600
+        self.buckets: Dict[str, List[Dict[str, Any]]] = {}
+        self.refreshed_at = 0.0
+        # First retry delay after a refresh that left the pool empty (doubles up to refresh_seconds)
+        self.retry_seconds = 60.0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.buckets = {name: list(quotes) for name, quotes in data.get("buckets", {}).items()}
+            self.refreshed_at = float(data.get("refreshed_at", 0))
+            logger.info(f"💬 Loaded {self.size()} quotes from {self.path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load quote pool {self.path}: {e}")
+
+    def save(self) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"refreshed_at": self.refreshed_at, "buckets": self.buckets}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Could not save quote pool {self.path}: {e}")
+            return False
+
+    def size(self) -> int:
+        return sum(len(quotes) for quotes in self.buckets.values())
+
+    def pick(self, categories: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """A quote from the first given category that has any, else a general one, else a built-in one"""
+        if isinstance(categories, str):
+            categories = [categories]
+        for name in [*(categories or []), GENERAL]:
+            quotes = self.buckets.get(name)
+            if quotes:
+                return random.choice(quotes)
+        return random.choice(FALLBACK_QUOTES)
+
+    def add(self, category: str, quotes: Iterable[Dict[str, Any]]) -> int:
+        """Merge quotes into a bucket (newest kept, no duplicate texts); returns how many were new"""
+        bucket = self.buckets.setdefault(category, [])
+        known = {quote["text"] for quote in bucket}
+        added = 0
+        for quote in quotes:
+            if quote.get("text") and quote["text"] not in known:
+                known.add(quote["text"])
+                bucket.append(quote)
+                added += 1
+        del bucket[:-self.per_category]
+        return added
+
+    async def _fetch_general(self, session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
+        async with session.get("https://zenquotes.io/api/quotes") as resp:
+            if resp.status != 200:
+                return []
+            data = await resp.json(content_type=None)
+        return [
+            {"text": item.get("q", ""), "author": item.get("a", ""), "philosophy": GENERAL}
+            for item in data if isinstance(item, dict) and item.get("q")
+        ] if isinstance(data, list) else []
+
+    async def _fetch_category(self, session: aiohttp.ClientSession, category: str, source: str) -> List[Dict[str, Any]]:
+        url = f"https://api.api-ninjas.com/v1/quotes?category={source}"
+        async with session.get(url, headers={"X-Api-Key": self.api_key}) as resp:
+            if resp.status != 200:
+                return []
+            data = await resp.json(content_type=None)
+        return [
+            {"text": item.get("quote", ""), "author": item.get("author", ""), "philosophy": category}
+            for item in data if isinstance(item, dict) and item.get("quote")
+        ] if isinstance(data, list) else []
+
+    async def refresh(self) -> int:
+        """Fetch and merge new quotes; returns how many were added. Failures keep the current pool."""
+        added = 0
+        timeout = aiohttp.ClientTimeout(total=CONFIG.get("QUOTE_POOL_FETCH_TIMEOUT_SECONDS", 15))
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            try:
+                added += self.add(GENERAL, await self._fetch_general(session))
+            except Exception as e:
+                logger.warning(f"Quote refresh from ZenQuotes failed: {e}")
+            if self.api_key:
+                for category, sources in CATEGORY_SOURCES.items():
+                    for source in sources:
+                        try:
+                            added += self.add(category, await self._fetch_category(session, category, source))
+                        except Exception as e:
+                            logger.warning(f"Quote refresh for '{category}' ({source}) failed: {e}")
+        if not self.size():
+            # Every source failed and there is nothing to serve: leave refreshed_at so run() retries soon
+            logger.warning("⚠️ Quote refresh found no quotes, using the built-in ones for now")
+            return added
+        self.refreshed_at = time.time()
+        # Save the new quotes first: translating can take a while and may not finish
+        self.save()
+        translated = await self.translate_missing()
+        if translated:
+            self.save()
+        logger.info(f"💬 Quote pool refreshed: {added} new, {translated} translated, {self.size()} total")
+        return added
+
+    def _needs_translation(self, quote: Dict[str, Any], now: float) -> bool:
+        text = quote["text"]
+        if quote.get("ar") or not any("a" <= c.lower() <= "z" for c in text):
+            return False
+        # A quote that failed recently waits instead of costing a translation every refresh
+        return quote.get("ar_failed_at", 0) + self.translate_retry_seconds <= now
+
+    async def translate_missing(self) -> int:
+        """
+        Arabic for English quotes that do not have it yet, a few at a time within
+        one overall budget; returns how many were translated. Failures are marked
+        with "ar_failed_at"; quotes left when the budget runs out wait for the next refresh.
+        """
+        now = time.time()
+        pending = [quote for quotes in self.buckets.values() for quote in quotes if self._needs_translation(quote, now)]
+        if not pending:
+            return 0
+        slots = asyncio.Semaphore(self.translate_concurrency)
+        translated = 0
+
+        async def translate(quote: Dict[str, Any]):
+            nonlocal translated
+            async with slots:
+                text = quote["text"]
+                arabic = await translate_text(text, target_lang="ar")
+                if arabic and arabic.strip() != text.strip():
+                    quote["ar"] = arabic
+                    quote.pop("ar_failed_at", None)
+                    translated += 1
+                else:
+                    quote["ar_failed_at"] = time.time()
+
+        tasks = [asyncio.ensure_future(translate(quote)) for quote in pending]
+        _, unfinished = await asyncio.wait(tasks, timeout=self.translate_budget_seconds)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            logger.info(f"💬 Quote translation budget used up, {len(unfinished)} quotes left for the next refresh")
+        return translated
+
+    async def run(self, is_running):
+        """
+        Refresh on a schedule; a pool saved recently by the last process is not
+        fetched again at startup. A refresh that failed or left the pool empty is
+        retried after retry_seconds, doubling up to the normal period.
+        """
+        retry = self.retry_seconds
+        while is_running():
+            wait = self.refreshed_at + self.refresh_seconds - time.time()
+            if wait > 0:
+                retry = self.retry_seconds
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Error refreshing quote pool: {e}", exc_info=True)
+            if self.refreshed_at + self.refresh_seconds <= time.time():
+                # Try again later rather than in a tight loop
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, self.refresh_seconds)
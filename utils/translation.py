@@ -1,80 +1,253 @@
 """
 🌐 Translation Utility
-Provides async translation using googletrans only.
+Provides async translation using googletrans only, behind a content-hash
+cache (in-memory LRU plus database) and a bounded worker pool.
 """
 
-import logging
 import asyncio
-from typing import Optional
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
 
+import httpx
 from googletrans import Translator
 
+from config import CONFIG
+from university.singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
-async def translate_text(text: str, target_lang: str = "ar", max_retries: int = 10) -> str:
+
+def translation_key(text: str, target_lang: str) -> str:
+    return hashlib.sha256(f"{target_lang}\n{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """LRU of translations, written through to a TranslationStorage when one is attached"""
+
+    def __init__(self, max_entries: Optional[int] = None, storage=None):
+        self.max_entries = max_entries or CONFIG.get("TRANSLATION_CACHE_SIZE", 2000)
+        self.storage = storage
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def attach_storage(self, storage):
+        """Persist from now on, and load the newest stored translations so lookups stay in memory"""
+        self.storage = storage
+        for key, translated in storage.get_recent_translations(self.max_entries):
+            self._remember(key, translated)
+        logger.info(f"🌐 Translation cache warmed with {len(self._entries)} entries")
+
+    def _remember(self, key: str, translated: str):
+        self._entries[key] = translated
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        """Memory only: never touches the database or the network"""
+        key = translation_key(text, target_lang)
+        translated = self._entries.get(key)
+        if translated is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return translated
+
+    def load(self, text: str, target_lang: str) -> Optional[str]:
+        """Memory, then the database (for translations evicted from the LRU)"""
+        translated = self.get(text, target_lang)
+        if translated is None and self.storage is not None:
+            key = translation_key(text, target_lang)
+            translated = self.storage.get_translation(key)
+            if translated is not None:
+                self._remember(key, translated)
+        return translated
+
+    def put(self, text: str, target_lang: str, translated: str):
+        key = translation_key(text, target_lang)
+        self._remember(key, translated)
+        if self.storage is not None:
+            self.storage.save_translation(key, target_lang, text, translated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class TranslationWorker:
     """
-    Asynchronously translate text to the target language using googletrans only.
-    Uses official API parameters: service_urls, user_agent, and raise_exception.
-    Adds retry logic with 5 attempts and 200 response checking.
+    googletrans calls on a small dedicated thread pool (one Translator per
+    thread), at most max_pending at a time. Each translation gets a total time
+    budget; failed attempts back off with jitter instead of retrying at once.
     """
-    if not text or not isinstance(text, str):
-        logger.debug("translate_text: input is empty or not a string")
-        return text
-    
-    loop = asyncio.get_running_loop()
-    
-    def do_translate():
-        try:
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+    ):
+        self.workers = workers or CONFIG.get("TRANSLATION_WORKERS", 2)
+        self.max_pending = max_pending or CONFIG.get("TRANSLATION_MAX_PENDING", 8)
+        self.budget_seconds = budget_seconds or CONFIG.get("TRANSLATION_BUDGET_SECONDS", 20)
+        self.max_attempts = max_attempts or CONFIG.get("TRANSLATION_MAX_ATTEMPTS", 4)
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else CONFIG.get("TRANSLATION_BACKOFF_SECONDS", 0.5)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._local = threading.local()
+        self.completed = 0
+        self.failed = 0
+        self.attempts = 0
+
+    def _translator(self) -> Translator:
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
             translator = Translator(
                 service_urls=["translate.googleapis.com", "translate.google.com"],
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                raise_exception=True
+                raise_exception=True,
+                timeout=httpx.Timeout(self.budget_seconds),
             )
-            logger.debug(f"Translating '{text}' to '{target_lang}'")
-            result = translator.translate(text, dest=target_lang)
-            
-            # Validate translation result
-            translated_text = getattr(result, "text", None)
-            if not translated_text:
-                logger.warning("Translation returned None or empty text")
-                return None
-                
-            # Check if translation is actually different from original
-            if translated_text.strip() == text.strip():
-                logger.warning("Translation returned same text as original")
-                return None
-                
-            # Check if translation contains meaningful content
-            if len(translated_text.strip()) < 2:
-                logger.warning("Translation too short, likely failed")
-                return None
-                
-            logger.debug(f"Translation result: {translated_text[:100]}...")
-            return translated_text
-            
+            self._local.translator = translator
+        return translator
+
+    def _translate_once(self, text: str, target_lang: str) -> Optional[str]:
+        """One googletrans call (in a worker thread); None when it failed or changed nothing"""
+        try:
+            result = self._translator().translate(text, dest=target_lang)
         except Exception as e:
-            logger.error(f"googletrans translation failed: {e}", exc_info=True)
+            logger.warning(f"googletrans translation failed: {e}")
+            # The client may be in a bad state: start this thread over with a new one
+            self._local.translator = None
             return None
-    
-    # Retry logic with 10 attempts - all at once without delays
-    for attempt in range(1, max_retries + 1):
+        translated_text = getattr(result, "text", None)
+        if not translated_text or translated_text.strip() == text.strip() or len(translated_text.strip()) < 2:
+            logger.warning("Translation returned empty, unchanged or too short text")
+            return None
+        return translated_text
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="translate")
+        return self._executor
+
+    async def translate(self, text: str, target_lang: str, max_attempts: Optional[int] = None) -> Optional[str]:
+        """The translation, or None once the attempts or the time budget ran out"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            # The semaphore is bound to the loop that created it
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        attempts = max_attempts or self.max_attempts
+        slots = self._slots
+        await slots.acquire()
+        # The budget starts once a slot is ours, not while queued behind other texts
+        deadline = time.monotonic() + self.budget_seconds
+        future: Optional[asyncio.Future] = None
         try:
-            logger.info(f"🔄 Translation attempt {attempt}/{max_retries} for text: '{text[:50]}...'")
-            
-            translated = await loop.run_in_executor(None, do_translate)
-            
-            # Check if translation was successful
-            if translated and translated != text and translated.strip():
-                logger.info(f"✅ Translation successful on attempt {attempt}: '{translated[:50]}...'")
-                return translated
+            for attempt in range(1, attempts + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.attempts += 1
+                future = loop.run_in_executor(self._get_executor(), self._translate_once, text, target_lang)
+                done, _ = await asyncio.wait({future}, timeout=remaining)
+                if not done:
+                    break
+                translated = future.result()
+                if translated:
+                    self.completed += 1
+                    return translated
+                if attempt < attempts:
+                    delay = self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    await asyncio.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+        finally:
+            if future is not None and not future.done():
+                # The thread cannot be stopped: it keeps the slot until its call returns
+                future.add_done_callback(lambda _: slots.release())
             else:
-                logger.warning(f"⚠️ Translation attempt {attempt} failed - returned original text or empty result")
-                # No delay - continue immediately to next attempt
-                    
-        except Exception as e:
-            logger.error(f"❌ Translation attempt {attempt} failed with error: {e}")
-            # No delay - continue immediately to next attempt
-    
-    # All attempts failed - fall back to English version
-    logger.error(f"❌ All {max_retries} translation attempts failed for text: '{text[:50]}...' - falling back to English")
-    return text 
\ No newline at end of file
+                slots.release()
+        self.failed += 1
+        logger.error(f"❌ Translation gave up for text: '{text[:50]}...'")
+        return None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            "attempts": self.attempts,
+        }
+
+
+class TranslationService:
+    """Cache first; misses go to the worker once per text, however many callers ask"""
+
+    def __init__(self, cache: Optional[TranslationCache] = None, worker: Optional[TranslationWorker] = None):
+        self.cache = cache or TranslationCache()
+        self.worker = worker or TranslationWorker()
+        self.flights = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+
+    def lookup(self, text: str, target_lang: str = "ar") -> Optional[str]:
+        """Cached translation or None, without waiting (for render paths)"""
+        return self.cache.get(text, target_lang)
+
+    async def _translate_and_store(self, text: str, target_lang: str, max_attempts: Optional[int]) -> Optional[str]:
+        # load() and put() may hit the database: keep them off the event loop
+        translated = await asyncio.to_thread(self.cache.load, text, target_lang)
+        if translated is None:
+            translated = await self.worker.translate(text, target_lang, max_attempts)
+            if translated is not None:
+                await asyncio.to_thread(self.cache.put, text, target_lang, translated)
+        return translated
+
+    async def translate(self, text: str, target_lang: str = "ar", max_attempts: Optional[int] = None) -> Optional[str]:
+        translated = self.cache.get(text, target_lang)
+        if translated is not None:
+            return translated
+        return await self.flights.do(
+            translation_key(text, target_lang), lambda: self._translate_and_store(text, target_lang, max_attempts)
+        )
+
+    def prefetch(self, text: str, target_lang: str = "ar"):
+        """Translate in the background so a later render finds it cached"""
+        if not text or self.cache.get(text, target_lang) is not None:
+            return
+        task = asyncio.ensure_future(self.translate(text, target_lang))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.cache.get_stats(), **self.worker.get_stats()}
+
+
+translation_service = TranslationService()
+
+
+async def translate_text(text: str, target_lang: str = "ar", max_retries: Optional[int] = None) -> str:
+    """
+    Asynchronously translate text to the target language using googletrans only.
+    Cached translations return at once; otherwise the text is translated on the
+    translation worker. Falls back to the original text on failure.
+    """
+    if not text or not isinstance(text, str):
+        logger.debug("translate_text: input is empty or not a string")
+        return text
+    translated = await translation_service.translate(text, target_lang, max_retries)
+    return translated if translated is not None else text